@@ -3,6 +3,9 @@ ASGI config for api project.
 
 It exposes the ASGI callable as a module-level variable named ``application``.
 
+Serve it with `gunicorn -c gunicorn_asgi.conf.py` (uvicorn workers) so the
+async views run without tying up a thread per request.
+
 For more information on this file, see
 https://docs.djangoproject.com/en/5.2/howto/deployment/asgi/
 """
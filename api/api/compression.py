@@ -0,0 +1,129 @@
+"""
+Response compression for the API.
+
+CompressionMiddleware negotiates Accept-Encoding and compresses large
+responses on the fly. Brotli is used when the optional `brotli` package
+is installed, gzip otherwise. Views that serve cached bodies can store
+the compressed bytes themselves (see genetics.cache.precompressed_response);
+responses that already carry a Content-Encoding are left untouched.
+"""
+import gzip
+import re
+
+from asgiref.sync import iscoroutinefunction, markcoroutinefunction
+from django.conf import settings
+from django.utils.cache import patch_vary_headers
+
+try:
+    import brotli
+except ImportError:  # brotli is optional
+    brotli = None
+
+
+# Responses smaller than this (in bytes) are not worth compressing
+MIN_SIZE = getattr(settings, 'COMPRESSION_MIN_SIZE', 1024)
+
+# HTML is left out on purpose: admin pages carry CSRF tokens (BREACH)
+COMPRESSIBLE_TYPES = getattr(settings, 'COMPRESSION_CONTENT_TYPES', (
+    'application/json',
+    'application/geo+json',
+    'application/javascript',
+    'text/css',
+    'text/csv',
+    'text/javascript',
+    'text/plain',
+))
+
+# Preferred encoding first
+ENCODINGS = ('br', 'gzip') if brotli else ('gzip',)
+
+_accept_re = re.compile(r'\s*([^\s;,]+)\s*(?:;\s*q\s*=\s*([0-9.]+))?')
+
+
+def negotiate(request):
+    """Return the best encoding the client accepts ('br', 'gzip') or None"""
+    header = request.META.get('HTTP_ACCEPT_ENCODING', '')
+    accepted = {}
+    for part in header.split(','):
+        match = _accept_re.match(part)
+        if not match:
+            continue
+        coding, quality = match.group(1).lower(), match.group(2)
+        try:
+            accepted[coding] = float(quality) if quality is not None else 1.0
+        except ValueError:
+            continue
+
+    best, best_quality = None, 0.0
+    for encoding in ENCODINGS:
+        quality = accepted.get(encoding, accepted.get('*', 0.0))
+        if quality > best_quality:
+            best, best_quality = encoding, quality
+    return best
+
+
+def compress(body, encoding, best=False):
+    """
+    Compress bytes with the given encoding. `best` trades speed for size and
+    is meant for bodies that are compressed once and stored.
+    """
+    if encoding == 'br':
+        return brotli.compress(body, quality=11 if best else 5)
+    if encoding == 'gzip':
+        return gzip.compress(body, compresslevel=9 if best else 6, mtime=0)
+    raise ValueError(f'Unsupported encoding: {encoding}')
+
+
+def is_compressible(response):
+    content_type = response.get('Content-Type', '').split(';')[0].strip().lower()
+    return content_type in COMPRESSIBLE_TYPES
+
+
+class CompressionMiddleware:
+    """Compress large responses with the best encoding the client accepts"""
+
+    sync_capable = True
+    async_capable = True
+
+    def __init__(self, get_response):
+        self.get_response = get_response
+        if iscoroutinefunction(self.get_response):
+            markcoroutinefunction(self)
+
+    def __call__(self, request):
+        if iscoroutinefunction(self):
+            return self.__acall__(request)
+        return self.process_response(request, self.get_response(request))
+
+    async def __acall__(self, request):
+        return self.process_response(request, await self.get_response(request))
+
+    def process_response(self, request, response):
+        if response.streaming or response.has_header('Content-Encoding'):
+            return response
+        if response.status_code != 200 or not is_compressible(response):
+            return response
+
+        patch_vary_headers(response, ('Accept-Encoding',))
+
+        if len(response.content) < MIN_SIZE:
+            return response
+
+        encoding = negotiate(request)
+        if encoding is None:
+            return response
+
+        compressed = compress(response.content, encoding)
+        if len(compressed) >= len(response.content):
+            return response
+
+        response.content = compressed
+        response['Content-Length'] = str(len(compressed))
+        response['Content-Encoding'] = encoding
+
+        # The compressed body is a different representation: weaken strong ETags
+        etag = response.get('ETag')
+        if etag and etag.startswith('"'):
+            response['ETag'] = 'W/' + etag
+
+        return response
@@ -0,0 +1,187 @@
+"""
+Sparse fieldsets: ?fields= and ?exclude= for serializer responses.
+
+    /genetics/samples/?fields=name,coordinates,y_dna
+    /genetics/blog/?exclude=content
+
+Serializers with SparseFieldsetMixin drop the fields that were not asked
+for. project() narrows the queryset to the columns and relations the
+remaining fields read, so unrequested columns are neither fetched nor
+encoded: it replaces the query's only()/defer() column list and keeps
+only the select_related and prefetch_related lookups still needed.
+
+Which columns a field reads comes from its `source`, from nested model
+serializers, or from `Meta.field_dependencies` for fields computed in
+Python (SerializerMethodField, `source='*'`). When a requested field's
+columns are unknown, project() leaves the queryset unchanged.
+"""
+from django.core.exceptions import FieldDoesNotExist
+from django.db.models import Prefetch
+from rest_framework import serializers
+
+
+FIELDS_PARAM = 'fields'
+EXCLUDE_PARAM = 'exclude'
+
+
+def _names(value):
+    return [name.strip() for name in value.split(',') if name.strip()]
+
+
+def parse_fieldset(params, available):
+    """
+    Names of the fields selected by the `fields` and `exclude` parameters,
+    in serializer order, or None when neither is given. Unknown names raise
+    a ValidationError.
+    """
+    fields = params.get(FIELDS_PARAM)
+    exclude = params.get(EXCLUDE_PARAM)
+    if fields is None and exclude is None:
+        return None
+
+    errors = {}
+    selected = list(available)
+    for param, value in ((FIELDS_PARAM, fields), (EXCLUDE_PARAM, exclude)):
+        if value is None:
+            continue
+        names = _names(value)
+        unknown = [name for name in names if name not in available]
+        if unknown:
+            errors[param] = [f'Unknown fields: {", ".join(unknown)}. Available: {", ".join(available)}']
+        elif param == FIELDS_PARAM:
+            selected = [name for name in selected if name in names]
+        else:
+            selected = [name for name in selected if name not in names]
+    if errors:
+        raise serializers.ValidationError(errors)
+    return selected
+
+
+def _query_params(request):
+    return getattr(request, 'query_params', None) or getattr(request, 'GET', {})
+
+
+class SparseFieldsetMixin:
+    """
+    Serializer mixin: keep only the fields selected by the request in
+    context['request']. Applies to the top-level serializer only; nested
+    serializers always render in full.
+    """
+
+    def get_fields(self):
+        fields = super().get_fields()
+        request = self.context.get('request')
+        is_root = self.parent is None or (
+            isinstance(self.parent, serializers.ListSerializer) and self.parent.parent is None
+        )
+        if request is None or not is_root:
+            return fields
+
+        selected = parse_fieldset(_query_params(request), list(fields))
+        if selected is None:
+            return fields
+        return {name: fields[name] for name in selected}
+
+
+def field_dependencies(serializer, names=None, prefix=''):
+    """
+    ORM paths read by the named fields of a serializer, or None if any of
+    them is unknown. `serializer` is an unbound instance.
+    """
+    declared = getattr(getattr(serializer, 'Meta', None), 'field_dependencies', {})
+    fields = serializer.fields
+    paths = []
+    for name in names if names is not None else fields:
+        field = fields[name]
+        if name in declared:
+            paths.extend(prefix + path for path in declared[name])
+        elif isinstance(field, serializers.ModelSerializer):
+            nested = field_dependencies(field, prefix=f'{prefix}{field.source.replace(".", "__")}__')
+            if nested is None:
+                return None
+            paths.extend(nested)
+        elif isinstance(field, (serializers.SerializerMethodField, serializers.BaseSerializer)) \
+                or field.source == '*' or field.source.startswith('__'):
+            return None
+        else:
+            paths.append(prefix + field.source.replace('.', '__'))
+    return paths
+
+
+def _plan(model, paths, annotations):
+    """
+    Split ORM paths into the columns to load, the relations to join and
+    the relations to prefetch. Returns None if a path is not a model field.
+    """
+    columns, joins, prefetches = set(), set(), set()
+    for path in paths:
+        parts = path.split('__')
+        current = model
+        for i, part in enumerate(parts):
+            try:
+                field = current._meta.get_field(part)
+            except FieldDoesNotExist:
+                if i == 0 and part in annotations:
+                    break
+                return None
+            head = '__'.join(parts[:i + 1])
+            if field.many_to_many or field.one_to_many:
+                prefetches.add(head)
+                if i:
+                    # Keep the joined parent the prefetch starts from
+                    parent = '__'.join(parts[:i])
+                    columns.add(f'{parent}__{current._meta.pk.name}')
+                break
+            if field.is_relation and i < len(parts) - 1:
+                joins.add(head)
+                current = field.related_model
+                continue
+            columns.add(head)
+            break
+    return columns, joins, prefetches
+
+
+def project(queryset, serializer_class, params):
+    """
+    Narrow a queryset to what the fields selected by `params` read. Raises
+    the ValidationError of parse_fieldset for unknown field names.
+    """
+    serializer = serializer_class()
+    selected = parse_fieldset(params, list(serializer.fields))
+    if selected is None:
+        return queryset
+
+    paths = field_dependencies(serializer, selected)
+    plan = paths is not None and _plan(queryset.model, paths, queryset.query.annotations)
+    if not plan:
+        return queryset
+    columns, joins, prefetches = plan
+
+    # Joins are kept only when their columns are loaded
+    joins = {join for join in joins if any(column.startswith(f'{join}__') for column in columns)}
+    kept = [
+        lookup for lookup in queryset._prefetch_related_lookups
+        if (lookup.prefetch_to if isinstance(lookup, Prefetch) else lookup) in prefetches
+    ]
+    kept_paths = {lookup.prefetch_to if isinstance(lookup, Prefetch) else lookup for lookup in kept}
+
+    deferred, is_defer = queryset.query.deferred_loading
+    queryset = (
+        queryset.select_related(None)
+        .prefetch_related(None)
+        .only(*columns or [queryset.model._meta.pk.name])
+    )
+    if joins:
+        queryset = queryset.select_related(*joins)
+    queryset = queryset.prefetch_related(*kept, *(prefetches - kept_paths))
+    if is_defer and deferred:
+        # Fields the caller deferred stay deferred
+        queryset = queryset.defer(*(set(deferred) & columns))
+    return queryset
+
+
+class SparseFieldsetViewMixin:
+    """Generic view mixin: project the queryset onto the requested fields"""
+
+    def get_queryset(self):
+        return project(super().get_queryset(), self.get_serializer_class(), self.request.query_params)
@@ -0,0 +1,184 @@
+"""
+Per-request performance instrumentation.
+
+QueryInstrumentationMiddleware records, for every request, the number of
+SQL queries and the time spent in them, the time spent rendering the
+response, the total time and the response size. The figures are sent
+back in a Server-Timing header and logged as one JSON line on the
+`api.performance` logger. Requests running more queries than
+INSTRUMENTATION_QUERY_THRESHOLD also log their repeated SQL, which is
+what an N+1 query looks like.
+
+Queries are captured by an execute wrapper installed on every database
+connection, so queries run from worker threads on behalf of the request
+(see genetics.aio.gather_queries) are counted too.
+"""
+import json
+import logging
+import threading
+import time
+from collections import Counter
+from contextlib import contextmanager
+from contextvars import ContextVar
+
+from asgiref.sync import iscoroutinefunction, markcoroutinefunction
+from django.conf import settings
+from django.db.backends.signals import connection_created
+from django.dispatch import receiver
+from django.http import JsonResponse
+from rest_framework.renderers import JSONRenderer
+
+from .metrics import observe_request
+
+
+logger = logging.getLogger('api.performance')
+
+_current = ContextVar('request_metrics', default=None)
+
+
+class RequestMetrics:
+    """Measurements collected while one request is handled"""
+
+    def __init__(self):
+        self.started = time.perf_counter()
+        self.queries = []
+        self.render_time = 0.0
+        self._lock = threading.Lock()
+
+    def add_query(self, sql, duration):
+        with self._lock:
+            self.queries.append((sql, duration))
+
+    @property
+    def query_count(self):
+        return len(self.queries)
+
+    @property
+    def query_time(self):
+        return sum(duration for _, duration in self.queries)
+
+    def duplicated_queries(self, limit=10):
+        """Return the most repeated SQL statements as (sql, count) pairs"""
+        counts = Counter(sql for sql, _ in self.queries)
+        return [(sql, count) for sql, count in counts.most_common(limit) if count > 1]
+
+
+def current_metrics():
+    """Return the RequestMetrics of the request being handled, if any"""
+    return _current.get()
+
+
+def record_query(execute, sql, params, many, context):
+    metrics = _current.get()
+    if metrics is None:
+        return execute(sql, params, many, context)
+
+    start = time.perf_counter()
+    try:
+        return execute(sql, params, many, context)
+    finally:
+        metrics.add_query(sql, time.perf_counter() - start)
+
+
+@receiver(connection_created)
+def install_query_recorder(sender, connection, **kwargs):
+    if record_query not in connection.execute_wrappers:
+        connection.execute_wrappers.append(record_query)
+
+
+@contextmanager
+def timed_render():
+    """Add the time spent in the block to the render time of the current request"""
+    start = time.perf_counter()
+    try:
+        yield
+    finally:
+        metrics = _current.get()
+        if metrics is not None:
+            metrics.render_time += time.perf_counter() - start
+
+
+class TimedJSONRenderer(JSONRenderer):
+    """JSONRenderer that adds its rendering time to the request metrics"""
+
+    def render(self, data, accepted_media_type=None, renderer_context=None):
+        with timed_render():
+            return super().render(data, accepted_media_type, renderer_context)
+
+
+class TimedJsonResponse(JsonResponse):
+    """JsonResponse that adds the time spent encoding its data to the request metrics"""
+
+    def __init__(self, *args, **kwargs):
+        with timed_render():
+            super().__init__(*args, **kwargs)
+
+
+class QueryInstrumentationMiddleware:
+    """Measure every request and report it through Server-Timing and logs"""
+
+    sync_capable = True
+    async_capable = True
+
+    def __init__(self, get_response):
+        self.get_response = get_response
+        if iscoroutinefunction(self.get_response):
+            markcoroutinefunction(self)
+
+    def __call__(self, request):
+        if iscoroutinefunction(self):
+            return self.__acall__(request)
+
+        metrics = RequestMetrics()
+        token = _current.set(metrics)
+        try:
+            response = self.get_response(request)
+        finally:
+            _current.reset(token)
+        self.report(request, response, metrics)
+        return response
+
+    async def __acall__(self, request):
+        metrics = RequestMetrics()
+        token = _current.set(metrics)
+        try:
+            response = await self.get_response(request)
+        finally:
+            _current.reset(token)
+        self.report(request, response, metrics)
+        return response
+
+    def report(self, request, response, metrics):
+        total = time.perf_counter() - metrics.started
+        query_time = metrics.query_time
+        size = None if response.streaming else len(response.content)
+        observe_request(request, response, metrics, total)
+
+        if getattr(settings, 'INSTRUMENTATION_SERVER_TIMING', True):
+            response['Server-Timing'] = ', '.join((
+                f'db;dur={query_time * 1000:.1f};desc="{metrics.query_count} queries"',
+                f'render;dur={metrics.render_time * 1000:.1f}',
+                f'app;dur={max(total - query_time - metrics.render_time, 0) * 1000:.1f}',
+                f'total;dur={total * 1000:.1f}',
+            ))
+
+        match = getattr(request, 'resolver_match', None)
+        record = {
+            'method': request.method,
+            'path': request.path,
+            'view': match.view_name if match else None,
+            'status': response.status_code,
+            'queries': metrics.query_count,
+            'db_ms': round(query_time * 1000, 1),
+            'render_ms': round(metrics.render_time * 1000, 1),
+            'total_ms': round(total * 1000, 1),
+            'bytes': size,
+        }
+        logger.info(json.dumps(record))
+
+        threshold = getattr(settings, 'INSTRUMENTATION_QUERY_THRESHOLD', 50)
+        if threshold is not None and metrics.query_count > threshold:
+            record['duplicated_sql'] = [
+                {'sql': sql, 'count': count} for sql, count in metrics.duplicated_queries()
+            ]
+            logger.warning(json.dumps(record))
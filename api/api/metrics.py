@@ -0,0 +1,131 @@
+"""
+Prometheus metrics for the API.
+
+Per-view request counts, latency and query histograms are recorded from
+the measurements QueryInstrumentationMiddleware already takes. The apps
+record their own metrics through the observe_* helpers below: cache hits
+in genetics.cache, transliteration throughput in converter.views and
+search result sizes in dict.views.
+
+With several worker processes, set PROMETHEUS_MULTIPROC_DIR to an empty
+directory shared by the workers before they start: every process then
+writes its samples to memory-mapped files in it and the /metrics view
+aggregates them (see gunicorn_asgi.conf.py for cleaning up after workers).
+"""
+import hmac
+import os
+
+from django.conf import settings
+from django.http import HttpResponse, HttpResponseForbidden
+from django.views.decorators.http import require_GET
+from prometheus_client import (
+    CONTENT_TYPE_LATEST, REGISTRY, CollectorRegistry, Counter, Histogram, generate_latest,
+    multiprocess,
+)
+
+
+# Requests that did not resolve to a view share one label, so unknown
+# paths cannot grow the number of series
+UNMATCHED_VIEW = '<unmatched>'
+
+REQUESTS = Counter(
+    'api_requests_total',
+    'HTTP requests handled, by view, method and status code',
+    ['view', 'method', 'status'],
+)
+REQUEST_LATENCY = Histogram(
+    'api_request_duration_seconds',
+    'Time spent handling a request',
+    ['view'],
+    buckets=(0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1, 2.5, 5, 10),
+)
+REQUEST_QUERIES = Histogram(
+    'api_request_db_queries',
+    'SQL queries run while handling a request',
+    ['view'],
+    buckets=(0, 1, 2, 3, 5, 10, 20, 50, 100, 200),
+)
+REQUEST_DB_TIME = Histogram(
+    'api_request_db_duration_seconds',
+    'Time spent in SQL queries while handling a request',
+    ['view'],
+    buckets=(0.001, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1, 2.5),
+)
+CACHE_LOOKUPS = Counter(
+    'api_cache_lookups_total',
+    'Lookups of cached results and responses, by cache prefix and result (hit or miss)',
+    ['prefix', 'result'],
+)
+TRANSLITERATED_WORDS = Counter(
+    'converter_transliterated_words_total',
+    'Words transliterated',
+    ['source', 'target'],
+)
+TRANSLITERATED_CHARACTERS = Counter(
+    'converter_transliterated_characters_total',
+    'Characters of input text transliterated',
+    ['source', 'target'],
+)
+TRANSLITERATION_DURATION = Histogram(
+    'converter_transliteration_duration_seconds',
+    'Time spent transliterating the text of one request',
+    ['source', 'target'],
+    buckets=(0.0001, 0.0005, 0.001, 0.005, 0.01, 0.05, 0.1, 0.5, 1),
+)
+DICT_SEARCH_RESULTS = Histogram(
+    'dict_search_results',
+    'Words returned by a dictionary search',
+    buckets=(0, 1, 5, 10, 25, 50, 100, 250, 500, 1000),
+)
+
+
+def observe_request(request, response, metrics, duration):
+    """Record a handled request; `metrics` is its api.instrumentation.RequestMetrics"""
+    match = getattr(request, 'resolver_match', None)
+    view = match.view_name if match else UNMATCHED_VIEW
+
+    REQUESTS.labels(view, request.method, str(response.status_code)).inc()
+    REQUEST_LATENCY.labels(view).observe(duration)
+    REQUEST_QUERIES.labels(view).observe(metrics.query_count)
+    REQUEST_DB_TIME.labels(view).observe(metrics.query_time)
+
+
+def observe_cache(prefix, hit):
+    CACHE_LOOKUPS.labels(prefix, 'hit' if hit else 'miss').inc()
+
+
+def observe_transliteration(source, target, words, characters, duration):
+    TRANSLITERATED_WORDS.labels(source, target).inc(words)
+    TRANSLITERATED_CHARACTERS.labels(source, target).inc(characters)
+    TRANSLITERATION_DURATION.labels(source, target).observe(duration)
+
+
+def observe_search(results):
+    DICT_SEARCH_RESULTS.observe(results)
+
+
+def _registry():
+    if 'PROMETHEUS_MULTIPROC_DIR' in os.environ:
+        registry = CollectorRegistry()
+        multiprocess.MultiProcessCollector(registry)
+        return registry
+    return REGISTRY
+
+
+@require_GET
+def metrics_view(request):
+    """
+    Expose the metrics in the Prometheus text format. When METRICS_TOKEN is
+    set, scrapers must send it as a bearer token; without a token the
+    metrics are only readable with DEBUG on.
+    """
+    token = getattr(settings, 'METRICS_TOKEN', None)
+    if not token:
+        if not settings.DEBUG:
+            return HttpResponseForbidden()
+    else:
+        supplied = request.headers.get('Authorization', '').removeprefix('Bearer ').strip()
+        if not hmac.compare_digest(supplied.encode(), token.encode()):
+            return HttpResponseForbidden()
+
+    return HttpResponse(generate_latest(_registry()), content_type=CONTENT_TYPE_LATEST)
@@ -0,0 +1,105 @@
+"""
+Database routing between the primary database and read replicas.
+
+Reads go to a replica from settings.DATABASE_REPLICAS only while
+ReplicaRoutingMiddleware has marked the current request as replica-safe:
+a GET/HEAD/OPTIONS request outside the admin, from a client that has not
+written anything within the last REPLICA_READ_YOUR_WRITES seconds. The
+middleware picks one replica at random per request, so all reads of a
+request see the same replication lag.
+Everything else (writes, the admin, management commands, shell) uses
+the primary ('default').
+"""
+import random
+from contextvars import ContextVar
+
+from asgiref.sync import iscoroutinefunction, markcoroutinefunction
+from django.conf import settings
+
+
+# Replica alias serving the reads of the current request, if any
+_replica = ContextVar('replica', default=None)
+
+# Cookie marking a client that recently wrote to the primary
+PIN_COOKIE = 'pin_primary'
+
+SAFE_METHODS = ('GET', 'HEAD', 'OPTIONS')
+
+
+class ReadReplicaRouter:
+    def db_for_read(self, model, **hints):
+        return _replica.get() or 'default'
+
+    def db_for_write(self, model, **hints):
+        return 'default'
+
+    def allow_relation(self, obj1, obj2, **hints):
+        # Replicas mirror the primary, so objects from any alias can be related
+        return True
+
+    def allow_migrate(self, db, app_label, model_name=None, **hints):
+        return db == 'default'
+
+
+def use_replicas(request):
+    """Return True if the request's reads may be served by a replica"""
+    if request.method not in SAFE_METHODS:
+        return False
+    if request.path.startswith('/admin/'):
+        return False
+    return PIN_COOKIE not in request.COOKIES
+
+
+def choose_replica(request):
+    """Return the replica alias serving the request's reads, or None for the primary"""
+    replicas = getattr(settings, 'DATABASE_REPLICAS', ())
+    if replicas and use_replicas(request):
+        return random.choice(replicas)
+    return None
+
+
+class ReplicaRoutingMiddleware:
+    """
+    Route the reads of replica-safe requests to the replicas, and pin
+    clients to the primary for a while after a successful write request
+    (read-your-writes).
+    """
+
+    sync_capable = True
+    async_capable = True
+
+    def __init__(self, get_response):
+        self.get_response = get_response
+        if iscoroutinefunction(self.get_response):
+            markcoroutinefunction(self)
+
+    def __call__(self, request):
+        if iscoroutinefunction(self):
+            return self.__acall__(request)
+
+        token = _replica.set(choose_replica(request))
+        try:
+            response = self.get_response(request)
+        finally:
+            _replica.reset(token)
+        return self.process_response(request, response)
+
+    async def __acall__(self, request):
+        token = _replica.set(choose_replica(request))
+        try:
+            response = await self.get_response(request)
+        finally:
+            _replica.reset(token)
+        return self.process_response(request, response)
+
+    def process_response(self, request, response):
+        # Failed requests wrote nothing worth reading back
+        if request.method not in SAFE_METHODS and response.status_code < 400:
+            response.set_cookie(
+                PIN_COOKIE,
+                '1',
+                max_age=getattr(settings, 'REPLICA_READ_YOUR_WRITES', 10),
+                httponly=True,
+                samesite='Lax',
+            )
+        return response
@@ -10,6 +10,7 @@ For the full list of settings and their values, see
 https://docs.djangoproject.com/en/5.2/ref/settings/
 """
 
+import os
 from pathlib import Path
 
 # Build paths inside the project like this: BASE_DIR / 'subdir'.
@@ -47,7 +48,10 @@ INSTALLED_APPS = [
 ]
 
 MIDDLEWARE = [
+    'api.instrumentation.QueryInstrumentationMiddleware',
     'corsheaders.middleware.CorsMiddleware',
+    'api.compression.CompressionMiddleware',
+    'api.routers.ReplicaRoutingMiddleware',
     'django.middleware.security.SecurityMiddleware',
     'django.contrib.sessions.middleware.SessionMiddleware',
     'django.middleware.common.CommonMiddleware',
@@ -88,10 +92,123 @@ DATABASES = {
         'PASSWORD': 'ihateniggers',
         'HOST': 'localhost',
         'PORT': '5432',
+        # Keep connections open between requests and check them before reuse
+        'CONN_MAX_AGE': int(os.environ.get('DB_CONN_MAX_AGE', 60)),
+        'CONN_HEALTH_CHECKS': True,
+        'OPTIONS': {},
     }
 }
 
 
+def database_pool_options():
+    """
+    psycopg connection pool options, sized from the environment.
+    See https://docs.djangoproject.com/en/5.2/ref/databases/#connection-pool
+    """
+    return {
+        'min_size': int(os.environ.get('DB_POOL_MIN_SIZE', 2)),
+        'max_size': int(os.environ.get('DB_POOL_MAX_SIZE', 10)),
+        # Seconds a request waits for a free connection before failing
+        'timeout': float(os.environ.get('DB_POOL_TIMEOUT', 10)),
+        'max_idle': float(os.environ.get('DB_POOL_MAX_IDLE', 600)),
+        'max_lifetime': float(os.environ.get('DB_POOL_MAX_LIFETIME', 3600)),
+    }
+
+
+# Connection pooling (requires psycopg 3). The pool replaces persistent
+# connections, so CONN_MAX_AGE must be 0 when it is enabled.
+if os.environ.get('DB_POOL', '').lower() in ('1', 'true', 'yes'):
+    DATABASES['default']['CONN_MAX_AGE'] = 0
+    DATABASES['default']['OPTIONS']['pool'] = database_pool_options()
+
+
+# Read replicas: one alias per host in DB_REPLICA_HOSTS (comma-separated,
+# optionally host:port), with the primary's credentials. Public API reads
+# are routed to them by api.routers; the admin and all writes use 'default'.
+# In tests every replica mirrors the test database.
+DATABASE_REPLICAS = []
+for number, address in enumerate(
+    (a.strip() for a in os.environ.get('DB_REPLICA_HOSTS', '').split(',') if a.strip()),
+    start=1,
+):
+    host, _, port = address.partition(':')
+    alias = f'replica_{number}'
+    DATABASES[alias] = {
+        **DATABASES['default'],
+        'OPTIONS': dict(DATABASES['default']['OPTIONS']),
+        'HOST': host,
+        'PORT': port or DATABASES['default']['PORT'],
+        'TEST': {'MIRROR': 'default'},
+    }
+    DATABASE_REPLICAS.append(alias)
+
+DATABASE_ROUTERS = ['api.routers.ReadReplicaRouter']
+
+# Seconds a client keeps reading from the primary after a write
+REPLICA_READ_YOUR_WRITES = 10
+
+
+# Cache
+# https://docs.djangoproject.com/en/5.2/topics/cache/
+# Use a shared backend (e.g. Redis) when running several worker processes,
+# so that cache invalidation after data changes reaches all of them.
+
+CACHES = {
+    'default': {
+        'BACKEND': 'django.core.cache.backends.locmem.LocMemCache',
+    }
+}
+
+# Lifetime of cached genetics analytics, in seconds
+GENETICS_CACHE_TIMEOUT = 60 * 60
+
+# Sample exports (/genetics/samples/export/) are built here, one file per
+# format and version of the data
+GENETICS_EXPORT_DIR = BASE_DIR / 'exports'
+
+# Run independent queries of the async genetics views concurrently,
+# each on its own database connection
+GENETICS_PARALLEL_QUERIES = True
+
+# Blog post views are counted in the cache and written to the database
+# every BLOG_VIEW_COUNT_FLUSH_INTERVAL seconds by a background thread (None:
+# only by `manage.py flush_view_counts`). A visitor is counted once per post
+# within BLOG_VIEW_COUNT_DEDUPE seconds (None: every view counts).
+BLOG_VIEW_COUNT_FLUSH_INTERVAL = 60
+BLOG_VIEW_COUNT_DEDUPE = 30 * 60
+
+# Responses smaller than this (in bytes) are sent uncompressed
+COMPRESSION_MIN_SIZE = 1024
+
+# Per-request instrumentation (api.instrumentation): report query count and
+# timings in a Server-Timing header, and log the repeated SQL of requests
+# running more queries than the threshold (None to disable)
+INSTRUMENTATION_SERVER_TIMING = True
+INSTRUMENTATION_QUERY_THRESHOLD = 50
+
+# Bearer token required to scrape /metrics (unset: readable with DEBUG only)
+METRICS_TOKEN = os.environ.get('METRICS_TOKEN')
+
+# Logging
+# https://docs.djangoproject.com/en/5.2/topics/logging/
+
+LOGGING = {
+    'version': 1,
+    'disable_existing_loggers': False,
+    'handlers': {
+        'console': {
+            'class': 'logging.StreamHandler',
+        },
+    },
+    'loggers': {
+        'api.performance': {
+            'handlers': ['console'],
+            'level': os.environ.get('PERFORMANCE_LOG_LEVEL', 'INFO'),
+            'propagate': False,
+        },
+    },
+}
+
 # Password validation
 # https://docs.djangoproject.com/en/5.2/ref/settings/#auth-password-validators
 
@@ -112,7 +229,11 @@ AUTH_PASSWORD_VALIDATORS = [
 
 REST_FRAMEWORK = {
     'DEFAULT_PAGINATION_CLASS': 'rest_framework.pagination.PageNumberPagination',
-    'PAGE_SIZE': 50
+    'PAGE_SIZE': 50,
+    'DEFAULT_RENDERER_CLASSES': [
+        'api.instrumentation.TimedJSONRenderer',
+        'rest_framework.renderers.BrowsableAPIRenderer',
+    ],
 }
 
 CORS_ALLOW_ALL_ORIGINS = True
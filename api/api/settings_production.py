@@ -0,0 +1,60 @@
+"""
+Production settings for api project.
+
+Use with DJANGO_SETTINGS_MODULE=api.settings_production. Everything
+deployment-specific comes from the environment:
+
+- DJANGO_SECRET_KEY (required), DJANGO_ALLOWED_HOSTS (comma-separated)
+- METRICS_TOKEN (required, bearer token for scraping /metrics)
+- DB_NAME, DB_USER, DB_PASSWORD, DB_HOST, DB_PORT
+- DB_REPLICA_HOSTS (comma-separated read replicas, see api.routers)
+- DB_POOL_MIN_SIZE, DB_POOL_MAX_SIZE, DB_POOL_TIMEOUT, DB_POOL_MAX_IDLE,
+  DB_POOL_MAX_LIFETIME; DB_POOL=0 falls back to persistent connections
+"""
+
+from .settings import *  # noqa: F401,F403
+from .settings import DATABASES, database_pool_options
+from django.core.exceptions import ImproperlyConfigured
+import os
+
+DEBUG = False
+
+SECRET_KEY = os.environ['DJANGO_SECRET_KEY']
+
+ALLOWED_HOSTS = [
+    host.strip()
+    for host in os.environ.get('DJANGO_ALLOWED_HOSTS', 'qizilbash.ir,www.qizilbash.ir').split(',')
+    if host.strip()
+]
+
+CORS_ALLOW_ALL_ORIGINS = False
+
+METRICS_TOKEN = os.environ.get('METRICS_TOKEN')
+if not METRICS_TOKEN:
+    raise ImproperlyConfigured('Set METRICS_TOKEN: /metrics exposes traffic, latency and cache internals')
+
+
+# Database
+
+for alias in DATABASES:
+    for setting, variable in (
+        ('NAME', 'DB_NAME'),
+        ('USER', 'DB_USER'),
+        ('PASSWORD', 'DB_PASSWORD'),
+    ):
+        if variable in os.environ:
+            DATABASES[alias][setting] = os.environ[variable]
+
+# Replicas keep the host and port from DB_REPLICA_HOSTS
+for setting, variable in (('HOST', 'DB_HOST'), ('PORT', 'DB_PORT')):
+    if variable in os.environ:
+        DATABASES['default'][setting] = os.environ[variable]
+
+# Pool connections unless explicitly disabled
+for alias in DATABASES:
+    if os.environ.get('DB_POOL', '1').lower() in ('1', 'true', 'yes'):
+        DATABASES[alias]['CONN_MAX_AGE'] = 0
+        DATABASES[alias]['OPTIONS']['pool'] = database_pool_options()
+    else:
+        DATABASES[alias]['OPTIONS'].pop('pool', None)
+        DATABASES[alias]['CONN_MAX_AGE'] = int(os.environ.get('DB_CONN_MAX_AGE', 600))
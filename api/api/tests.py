@@ -0,0 +1,238 @@
+from django.contrib.gis.db.models.functions import Centroid
+from django.http import HttpResponse, QueryDict
+from django.test import RequestFactory, SimpleTestCase, override_settings
+from prometheus_client import REGISTRY
+from rest_framework.exceptions import ValidationError
+from rest_framework.request import Request
+
+from genetics.models import BlogPost, Clan, GeneticSample
+from genetics.serializers import BlogPostSerializer, ClanSerializer, GeneticSampleSerializer
+from genetics.views import ClanListView, ProvinceListView, TribeListView
+
+from .fieldsets import parse_fieldset, project
+from .instrumentation import (
+    QueryInstrumentationMiddleware, TimedJsonResponse, current_metrics, record_query
+)
+from .metrics import UNMATCHED_VIEW, metrics_view
+from .routers import PIN_COOKIE, ReadReplicaRouter, ReplicaRoutingMiddleware
+
+
+@override_settings(DATABASE_REPLICAS=['replica_1', 'replica_2'], REPLICA_READ_YOUR_WRITES=30)
+class ReadReplicaRoutingTests(SimpleTestCase):
+    def setUp(self):
+        self.factory = RequestFactory()
+        self.router = ReadReplicaRouter()
+
+    def read_alias(self, request):
+        """Return the alias a read would use while the middleware handles the request"""
+        aliases = []
+
+        def view(request):
+            aliases.append(self.router.db_for_read(GeneticSample))
+            return HttpResponse()
+
+        response = ReplicaRoutingMiddleware(view)(request)
+        return aliases[0], response
+
+    def test_api_reads_use_a_replica(self):
+        alias, _ = self.read_alias(self.factory.get('/genetics/samples/'))
+        self.assertIn(alias, ['replica_1', 'replica_2'])
+
+    def test_reads_of_a_request_use_one_replica(self):
+        aliases = []
+
+        def view(request):
+            aliases.extend(self.router.db_for_read(GeneticSample) for _ in range(20))
+            return HttpResponse()
+
+        ReplicaRoutingMiddleware(view)(self.factory.get('/genetics/samples/'))
+        self.assertEqual(len(set(aliases)), 1)
+
+    def test_writes_always_use_the_primary(self):
+        self.assertEqual(self.router.db_for_write(GeneticSample), 'default')
+
+    def test_reads_outside_requests_use_the_primary(self):
+        # Management commands and the shell never see the middleware
+        self.assertEqual(self.router.db_for_read(GeneticSample), 'default')
+
+    def test_admin_reads_use_the_primary(self):
+        alias, _ = self.read_alias(self.factory.get('/admin/genetics/geneticsample/'))
+        self.assertEqual(alias, 'default')
+
+    def test_write_pins_the_client_to_the_primary(self):
+        alias, response = self.read_alias(self.factory.post('/admin/genetics/geneticsample/add/'))
+        self.assertEqual(alias, 'default')
+        self.assertEqual(response.cookies[PIN_COOKIE]['max-age'], 30)
+
+        request = self.factory.get('/genetics/samples/')
+        request.COOKIES[PIN_COOKIE] = '1'
+        alias, _ = self.read_alias(request)
+        self.assertEqual(alias, 'default')
+
+    def test_failed_writes_do_not_pin_the_client(self):
+        def view(request):
+            return HttpResponse(status=400)
+
+        response = ReplicaRoutingMiddleware(view)(self.factory.post('/genetics/samples/'))
+        self.assertNotIn(PIN_COOKIE, response.cookies)
+
+    @override_settings(DATABASE_REPLICAS=[])
+    def test_without_replicas_reads_use_the_primary(self):
+        alias, _ = self.read_alias(self.factory.get('/genetics/samples/'))
+        self.assertEqual(alias, 'default')
+
+    def test_migrations_only_run_on_the_primary(self):
+        self.assertTrue(self.router.allow_migrate('default', 'genetics'))
+        self.assertFalse(self.router.allow_migrate('replica_1', 'genetics'))
+
+
+class QueryInstrumentationTests(SimpleTestCase):
+    def setUp(self):
+        self.factory = RequestFactory()
+
+    def run_queries(self, *statements):
+        """Record fake queries through the execute wrapper while handling a request"""
+        def execute(sql, params, many, context):
+            return None
+
+        def view(request):
+            for sql in statements:
+                record_query(execute, sql, (), False, {})
+            return HttpResponse(b'x' * 10)
+
+        return QueryInstrumentationMiddleware(view)(self.factory.get('/genetics/samples/'))
+
+    def test_server_timing_reports_queries(self):
+        response = self.run_queries('SELECT 1', 'SELECT 2')
+        self.assertIn('desc="2 queries"', response['Server-Timing'])
+        self.assertIn('total;dur=', response['Server-Timing'])
+
+    def test_metrics_only_exist_during_a_request(self):
+        self.run_queries('SELECT 1')
+        self.assertIsNone(current_metrics())
+
+    @override_settings(INSTRUMENTATION_QUERY_THRESHOLD=2)
+    def test_duplicated_sql_is_logged_above_the_threshold(self):
+        with self.assertLogs('api.performance', 'WARNING') as logs:
+            self.run_queries('SELECT 1', *['SELECT * FROM tribe WHERE id = %s'] * 3)
+        self.assertIn('"count": 3', logs.output[0])
+
+    def test_json_responses_count_as_render_time(self):
+        render_times = []
+
+        def view(request):
+            response = TimedJsonResponse(list(range(10000)), safe=False)
+            render_times.append(current_metrics().render_time)
+            return response
+
+        QueryInstrumentationMiddleware(view)(self.factory.get('/genetics/samples/'))
+        self.assertGreater(render_times[0], 0)
+
+    @override_settings(INSTRUMENTATION_SERVER_TIMING=False)
+    def test_server_timing_can_be_disabled(self):
+        self.assertFalse(self.run_queries('SELECT 1').has_header('Server-Timing'))
+
+
+class MetricsTests(SimpleTestCase):
+    def setUp(self):
+        self.factory = RequestFactory()
+
+    def test_requests_are_counted_per_view(self):
+        labels = {'view': UNMATCHED_VIEW, 'method': 'GET', 'status': '200'}
+        before = REGISTRY.get_sample_value('api_requests_total', labels) or 0
+        QueryInstrumentationMiddleware(lambda request: HttpResponse())(self.factory.get('/nowhere/'))
+        self.assertEqual(REGISTRY.get_sample_value('api_requests_total', labels), before + 1)
+
+    @override_settings(DEBUG=True, METRICS_TOKEN=None)
+    def test_metrics_are_exposed_in_text_format(self):
+        response = metrics_view(self.factory.get('/metrics'))
+        self.assertEqual(response.status_code, 200)
+        self.assertIn(b'api_requests_total', response.content)
+
+    @override_settings(DEBUG=False, METRICS_TOKEN=None)
+    def test_metrics_are_closed_without_a_token_outside_debug(self):
+        self.assertEqual(metrics_view(self.factory.get('/metrics')).status_code, 403)
+
+    @override_settings(METRICS_TOKEN='secret')
+    def test_metrics_token_is_required_when_set(self):
+        self.assertEqual(metrics_view(self.factory.get('/metrics')).status_code, 403)
+        request = self.factory.get('/metrics', HTTP_AUTHORIZATION='Bearer secret')
+        self.assertEqual(metrics_view(request).status_code, 200)
+        request = self.factory.get('/metrics', HTTP_AUTHORIZATION='Bearer sécret')
+        self.assertEqual(metrics_view(request).status_code, 403)
+
+
+class SparseFieldsetTests(SimpleTestCase):
+    def sql(self, queryset, serializer_class, query_string):
+        return str(project(queryset, serializer_class, QueryDict(query_string)).query)
+
+    def test_selection(self):
+        available = ['id', 'name', 'description', 'count']
+        self.assertIsNone(parse_fieldset(QueryDict(''), available))
+        self.assertEqual(parse_fieldset(QueryDict('fields=count,name'), available), ['name', 'count'])
+        self.assertEqual(parse_fieldset(QueryDict('exclude=description'), available), ['id', 'name', 'count'])
+        with self.assertRaises(ValidationError):
+            parse_fieldset(QueryDict('fields=name,size'), available)
+
+    def test_unrequested_columns_and_joins_are_dropped(self):
+        queryset = GeneticSample.objects.select_related(
+            'country', 'province', 'historical_period', 'y_dna'
+        ).annotate(province_centroid=Centroid('province__geom'))
+        sql = self.sql(queryset, GeneticSampleSerializer, 'fields=name,coordinates,y_dna')
+        self.assertIn('ST_Centroid("genetics_province"."geom")', sql)
+        self.assertNotIn('"genetics_province"."name"', sql)
+        self.assertIn('"genetics_ydnatree"."parent_id"', sql)
+        self.assertNotIn('description', sql)
+        self.assertNotIn('genetics_country', sql)
+        self.assertNotIn('genetics_historicalperiod', sql)
+
+    def test_nested_serializers_and_prefetches(self):
+        sql = self.sql(GeneticSample.objects.all(), GeneticSampleSerializer, 'fields=historical_period')
+        self.assertIn('"genetics_historicalperiod"."start_year"', sql)
+
+        queryset = Clan.objects.select_related('tribe').prefetch_related('tribe__ethnicities')
+        self.assertEqual(
+            project(queryset, ClanSerializer, QueryDict('fields=name'))._prefetch_related_lookups, ()
+        )
+
+    def test_deferred_columns_stay_deferred(self):
+        queryset = BlogPost.objects.prefetch_related('tags').defer('content_html')
+        sql = self.sql(queryset, BlogPostSerializer, 'fields=title,content')
+        self.assertIn('"genetics_blogpost"."content"', sql)
+        self.assertNotIn('content_html', sql)
+        self.assertNotIn('search_vector', sql)
+
+    def test_unrequested_province_geometry_is_not_computed(self):
+        def sql(query_string):
+            view = ProvinceListView(request=Request(RequestFactory().get(f'/?{query_string}')))
+            view.geometry, view.bounds = view.request.query_params.get('geometry', 'full'), {}
+            return str(view.get_queryset().query)
+
+        self.assertIn('ST_AsGeoJSON', sql(''))
+        self.assertIn('ST_Centroid', sql('fields=name,latitude'))
+        for query_string in ('fields=name,country', 'exclude=geometry,latitude,longitude'):
+            self.assertNotIn('ST_AsGeoJSON', sql(query_string))
+            self.assertNotIn('ST_Centroid', sql(query_string))
+            self.assertNotIn('"geom"', sql(query_string))
+        self.assertNotIn('ST_AsGeoJSON', sql('exclude=geometry'))
+        self.assertNotIn('ST_AsGeoJSON', sql('geometry=none'))
+
+    def test_list_views_project_their_queryset(self):
+        def queryset(view_class, query_string):
+            return view_class(request=Request(RequestFactory().get(f'/?{query_string}'))).get_queryset()
+
+        self.assertEqual(queryset(TribeListView, 'fields=name')._prefetch_related_lookups, ())
+        self.assertEqual(queryset(TribeListView, '')._prefetch_related_lookups, ('ethnicities',))
+        clans = queryset(ClanListView, 'fields=name')
+        self.assertEqual(clans._prefetch_related_lookups, ())
+        self.assertNotIn('genetics_tribe', str(clans.query))
+        self.assertNotIn('common_ancestor', str(clans.query))
+        self.assertIn('genetics_tribe', str(queryset(ClanListView, 'fields=name,tribe').query))
+
+    def test_fields_computed_in_python_need_declared_columns(self):
+        class UndeclaredSerializer(GeneticSampleSerializer):
+            class Meta(GeneticSampleSerializer.Meta):
+                field_dependencies = {}
+
+        queryset = GeneticSample.objects.all()
+        self.assertIs(project(queryset, UndeclaredSerializer, QueryDict('fields=coordinates')), queryset)
@@ -17,9 +17,14 @@ Including another URLconf
 from django.contrib import admin
 from django.urls import path, include
 
+from . import views
+from .metrics import metrics_view
+
 urlpatterns = [
     path('admin/', admin.site.urls),
     path('api/dict/', include('dict.urls')),
     path('api/convert/', include('converter.urls')),
     path('genetics/', include('genetics.urls')),
+    path('health/db/', views.database_health, name='database-health'),
+    path('metrics', metrics_view, name='metrics'),
 ]
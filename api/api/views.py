@@ -0,0 +1,22 @@
+"""
+Operational endpoints for the api project.
+"""
+from django.db import connections
+from django.http import JsonResponse
+
+
+def pool_stats():
+    """Return psycopg connection pool statistics per database alias (empty without pooling)"""
+    stats = {}
+    for alias in connections:
+        pool = getattr(connections[alias], 'pool', None)
+        if pool is not None:
+            stats[alias] = pool.get_stats()
+    return stats
+
+
+def database_health(request):
+    """Connection pool metrics of this worker process. Staff only."""
+    if not request.user.is_staff:
+        return JsonResponse({'error': 'Staff access required'}, status=403)
+    return JsonResponse({'pools': pool_stats()})
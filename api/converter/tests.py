@@ -1,3 +1,12 @@
-from django.test import TestCase
+from django.test import SimpleTestCase
+from django.urls import reverse
 
-# Create your tests here.
+
+class QueryCountTests(SimpleTestCase):
+    # SimpleTestCase refuses database queries, so any query fails the test
+
+    def test_convert_text_runs_no_queries(self):
+        response = self.client.get(reverse('convert-text'), {
+            'text': 'salam dünya ' * 200, 'source': 'latin', 'target': 'arabic',
+        })
+        self.assertEqual(response.status_code, 200)
@@ -1,7 +1,10 @@
 # transliterator/views.py
+import time
+
 from django.http import JsonResponse
 from django.views.decorators.http import require_GET
 from urllib.parse import unquote
+from api.metrics import observe_transliteration
 from .converter import AzerbaijaniTransliteration
 
 # Initialize once
@@ -27,9 +30,11 @@ def convert_text(request):
 
     # Only support Latin → Arabic for now
     if source == 'latin' and target == 'arabic':
+        start = time.perf_counter()
         words = text.split()
         arabic_words = [transliterator.transliterate(word) for word in words]
         result = ' '.join(arabic_words)
+        observe_transliteration(source, target, len(words), len(text), time.perf_counter() - start)
     else:
         return JsonResponse({
             'error': f'Conversion from "{source}" to "{target}" is not supported yet.'
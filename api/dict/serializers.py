@@ -1,7 +1,8 @@
 from rest_framework import serializers
+from api.fieldsets import SparseFieldsetMixin
 from .models import Word
 
-class WordSerializer(serializers.ModelSerializer):
+class WordSerializer(SparseFieldsetMixin, serializers.ModelSerializer):
     class Meta:
         model = Word
         fields = [
@@ -1,3 +1,43 @@
-from django.test import TestCase
+from django.db import connection
+from django.test import TestCase, override_settings
+from django.test.utils import CaptureQueriesContext
+from django.urls import reverse
 
-# Create your tests here.
+from .models import Word
+
+
+@override_settings(DATABASE_REPLICAS=[])
+class QueryCountTests(TestCase):
+    """Every dictionary endpoint answers with a single query, whatever the number of words"""
+
+    @classmethod
+    def setUpTestData(cls):
+        Word.objects.bulk_create([
+            Word(word=f'söz{i}', english_translation=f'word {i}', word_type='noun')
+            for i in range(2000)
+        ])
+
+    def assertMaxQueries(self, max_queries, url, params=None):
+        with CaptureQueriesContext(connection) as context:
+            response = self.client.get(url, params or {})
+        self.assertEqual(response.status_code, 200)
+        self.assertLessEqual(len(context), max_queries)
+        return response
+
+    def test_all_words(self):
+        response = self.assertMaxQueries(1, reverse('all-words'))
+        self.assertEqual(len(response.json()), 2000)
+
+    def test_search_words(self):
+        response = self.assertMaxQueries(1, reverse('search-words'), {'text': 'söz1'})
+        self.assertEqual(len(response.json()), 1111)
+
+    def test_word_detail(self):
+        self.assertMaxQueries(1, reverse('word-detail', kwargs={'word': 'SÖZ42'}))
+
+    def test_sparse_fields(self):
+        response = self.assertMaxQueries(1, reverse('search-words'), {'text': 'söz1', 'fields': 'word'})
+        self.assertEqual(response.json()[0], {'word': 'söz1'})
+        response = self.client.get(reverse('word-detail', kwargs={'word': 'söz1'}), {'exclude': 'id,created_at'})
+        self.assertNotIn('created_at', response.json())
+        self.assertEqual(self.client.get(reverse('all-words'), {'fields': 'spelling'}).status_code, 400)
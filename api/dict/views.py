@@ -2,20 +2,23 @@ from rest_framework.decorators import api_view
 from rest_framework.response import Response
 from rest_framework import status
 from django.shortcuts import get_object_or_404
+from api.fieldsets import project
+from api.metrics import observe_search
 from .models import Word
 from .serializers import WordSerializer
 
 @api_view(['GET'])
 def all_words(request):
-    words = Word.objects.all()
-    serializer = WordSerializer(words, many=True)
+    words = project(Word.objects.all(), WordSerializer, request.query_params)
+    serializer = WordSerializer(words, many=True, context={'request': request})
     return Response(serializer.data)
 
 @api_view(['GET'])
 def word_detail(request, word):
     """Get word by Azerbaijani spelling: /api/dictionary/salam"""
-    word_obj = get_object_or_404(Word, word__iexact=word)
-    serializer = WordSerializer(word_obj)
+    words = project(Word.objects.all(), WordSerializer, request.query_params)
+    word_obj = get_object_or_404(words, word__iexact=word)
+    serializer = WordSerializer(word_obj, context={'request': request})
     return Response(serializer.data)
 
 @api_view(['GET'])
@@ -25,7 +28,9 @@ def search_words(request):
     if not query:
         return Response({"error": "Missing 'text' parameter"}, status=status.HTTP_400_BAD_REQUEST)
 
-    words = Word.objects.filter(word__icontains=query)
-    serializer = WordSerializer(words, many=True)
+    words = project(Word.objects.all(), WordSerializer, request.query_params)
+    words = words.filter(word__icontains=query)
+    serializer = WordSerializer(words, many=True, context={'request': request})
+    observe_search(len(serializer.data))
     return Response(serializer.data)
 
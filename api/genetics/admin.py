@@ -1,12 +1,260 @@
 # admin.py
-from django.contrib import admin
+from django.contrib import admin, messages
+from django.contrib.admin import helpers
+from django.contrib.admin.options import IncorrectLookupParameters
+from django.contrib.admin.widgets import AutocompleteSelect
 from django import forms
 from django.db import models
+from django.template.response import TemplateResponse
 from leaflet.admin import LeafletGeoAdmin
 from .models import (
     HistoricalPeriod, Country, Province, City, YDNATree, MTDNATree, 
-    GeneticSample, Ethnicity, Tribe, Clan, BlogPost
+    GeneticSample, Ethnicity, Tribe, Clan, BlogPost, Tag
 )
+from . import bulk, cache
+from .haplogroups import HaplogroupIndex
+
+
+# Several __str__ methods follow relations (Province -> country, City ->
+# province, Clan -> tribe, Tribe -> ethnicities). Every admin's get_queryset
+# loads what its model's __str__ reads, and the helpers below make filter
+# widgets and editable changelist rows go through those querysets, so
+# changelists and autocomplete lookups run a fixed number of queries.
+# Filters on large related tables are autocomplete boxes rather than one
+# link per related row.
+
+class AutocompleteListFilter(admin.FieldListFilter):
+    """
+    Related-object filter with an autocomplete box instead of one link per
+    related row. Options are loaded as the user types from the admin
+    autocomplete endpoint, so the related model's admin needs
+    search_fields, and the admin using the filter needs
+    AutocompleteFilterMixin for the scripts.
+    """
+    template = 'admin/genetics/autocomplete_filter.html'
+    
+    def __init__(self, field, request, params, model, model_admin, field_path):
+        self.lookup_kwarg = self.get_lookup_kwarg(field, field_path)
+        super().__init__(field, request, params, model, model_admin, field_path)
+        self.request = request
+        self.model_admin = model_admin
+    
+    def get_lookup_kwarg(self, field, field_path):
+        return f'{field_path}__{field.target_field.name}__exact'
+    
+    def expected_parameters(self):
+        return [self.lookup_kwarg]
+    
+    def value(self):
+        values = self.used_parameters.get(self.lookup_kwarg)
+        return values[-1] if values else None
+    
+    def choices(self, changelist):
+        # Read by the template: the changelist URL without this filter
+        self.query_string = changelist.get_query_string(remove=[self.lookup_kwarg, 'p'])
+        yield {
+            'selected': self.value() is None,
+            'query_string': self.query_string,
+            'display': 'All',
+        }
+    
+    def get_facet_counts(self, pk_attname, filtered_qs):
+        return {}
+    
+    def widget(self):
+        """The select box, labelled through the related admin's queryset"""
+        related_admin = self.model_admin.admin_site.get_model_admin(self.field.remote_field.model)
+        formfield = self.field.formfield(
+            queryset=related_admin.get_queryset(self.request),
+            widget=AutocompleteSelect(self.field, self.model_admin.admin_site),
+            required=False,
+        )
+        return formfield.widget.render(
+            f'filter-{self.field_path}', self.value(), attrs={'id': f'id_filter_{self.field_path}'}
+        )
+
+
+class HaplogroupSubtreeFilter(AutocompleteListFilter):
+    """
+    Autocomplete filter on a haplogroup field that matches the picked
+    haplogroup and all its subclades ("R1b and subclades"), using the
+    tree's HaplogroupIndex.
+    """
+    
+    def __init__(self, field, request, params, model, model_admin, field_path):
+        super().__init__(field, request, params, model, model_admin, field_path)
+        self.title = f'{self.title} and subclades'
+    
+    def get_lookup_kwarg(self, field, field_path):
+        return f'{field_path}__subtree'
+    
+    def queryset(self, request, queryset):
+        value = self.value()
+        if value is None:
+            return queryset
+        try:
+            node_id = int(value)
+        except ValueError:
+            raise IncorrectLookupParameters(f'Invalid haplogroup id: {value}')
+        index = HaplogroupIndex.load(self.field.remote_field.model)
+        return queryset.filter(**{f'{self.field_path}__in': index.descendant_ids(node_id)})
+
+
+class AutocompleteFilterMixin:
+    """Adds the scripts of AutocompleteListFilter to the changelist"""
+    
+    @property
+    def media(self):
+        # The widget's media does not depend on its field
+        widget_media = AutocompleteSelect(None, self.admin_site).media
+        return super().media + widget_media + forms.Media(js=['admin/js/autocomplete_filter.js'])
+
+
+class PreloadedAutocompleteSelect(AutocompleteSelect):
+    """
+    Autocomplete select that labels its selected option with `preloaded`,
+    the related object already loaded on the row, instead of querying it.
+    """
+    preloaded = None
+    
+    def optgroups(self, name, value, attr=None):
+        selected = {str(v) for v in value if str(v) not in self.choices.field.empty_values}
+        if self.preloaded is None or not selected <= set(self.preloaded):
+            return super().optgroups(name, value, attr)
+        
+        default = (None, [], 0)
+        if not self.is_required:
+            default[1].append(self.create_option(name, '', '', False, 0))
+        for key in sorted(selected):
+            obj = self.preloaded[key]
+            label = self.choices.field.label_from_instance(obj)
+            default[1].append(self.create_option(name, obj.pk, label, selected, len(default[1])))
+        return [default]
+
+
+class PreloadedAutocompleteMixin:
+    """
+    For list_editable autocomplete fields: render each row's selected
+    option from the row's own related object (load it with
+    list_select_related) rather than with one query per row and field.
+    """
+    
+    def formfield_for_foreignkey(self, db_field, request, **kwargs):
+        if 'widget' not in kwargs and db_field.name in self.get_autocomplete_fields(request):
+            kwargs['widget'] = PreloadedAutocompleteSelect(db_field, self.admin_site, using=kwargs.get('using'))
+        return super().formfield_for_foreignkey(db_field, request, **kwargs)
+    
+    def get_changelist_form(self, request, **kwargs):
+        form = super().get_changelist_form(request, **kwargs)
+        fields = [
+            name for name in self.list_editable
+            if name in self.get_autocomplete_fields(request)
+        ]
+        
+        class ChangeListForm(form):
+            def __init__(self, *args, **kwargs):
+                super().__init__(*args, **kwargs)
+                for name in fields:
+                    widget = self.fields[name].widget
+                    # Unwrap RelatedFieldWidgetWrapper
+                    widget = getattr(widget, 'widget', widget)
+                    related = getattr(self.instance, name)
+                    widget.preloaded = {str(related.pk): related} if related is not None else {}
+        
+        return ChangeListForm
+
+
+# Bulk actions change every selected row with set-based queries (see
+# bulk.py). Their intermediate page posts the action back to the
+# changelist URL with the posted selection: with select_across the
+# changelist's filters pick the rows, so selecting all of thousands of
+# rows posts only the ids of one page.
+
+def action_form_response(model_admin, request, queryset, form, title, description):
+    """Intermediate page of a bulk action: the form and the selection to re-post"""
+    context = {
+        **model_admin.admin_site.each_context(request),
+        'title': title,
+        'description': description,
+        'opts': model_admin.model._meta,
+        'form': form,
+        'count': queryset.count(),
+        'media': model_admin.media + form.media,
+        'action': request.POST.get('action', ''),
+        'select_across': request.POST.get('select_across', '0'),
+        'selected': request.POST.getlist(helpers.ACTION_CHECKBOX_NAME),
+        'action_checkbox_name': helpers.ACTION_CHECKBOX_NAME,
+    }
+    return TemplateResponse(request, 'admin/genetics/action_form.html', context)
+
+
+class SampleReassignForm(forms.Form):
+    """Values the reassign action sets; fields left empty are not changed"""
+    
+    def __init__(self, *args, admin_site, **kwargs):
+        super().__init__(*args, **kwargs)
+        for name in bulk.REASSIGNABLE_FIELDS:
+            field = GeneticSample._meta.get_field(name)
+            self.fields[name] = field.formfield(required=False, widget=AutocompleteSelect(field, admin_site))
+    
+    def changes(self):
+        return {name: value for name, value in self.cleaned_data.items() if value is not None}
+
+
+class MergeForm(forms.Form):
+    target = forms.ModelChoiceField(queryset=None, widget=forms.RadioSelect, empty_label=None, label='Keep')
+    
+    def __init__(self, *args, queryset, **kwargs):
+        super().__init__(*args, **kwargs)
+        self.fields['target'].queryset = queryset
+
+
+class MergeActionMixin:
+    """
+    Adds a 'Merge selected' action: the selected rows are folded into the
+    one the user keeps and deleted. Subclasses set `merge_function`, a
+    function(target, others) returning the number of samples moved.
+    """
+    actions = ['merge_selected']
+    
+    def __init_subclass__(cls, **kwargs):
+        super().__init_subclass__(**kwargs)
+        if not callable(getattr(cls, 'merge_function', None)):
+            raise TypeError(f'{cls.__name__} must set merge_function')
+    
+    def get_actions(self, request):
+        actions = super().get_actions(request)
+        # Django offers an action for any of its permissions; merging needs both
+        if not (self.has_change_permission(request) and self.has_delete_permission(request)):
+            actions.pop('merge_selected', None)
+        return actions
+    
+    @admin.action(permissions=['change', 'delete'], description='Merge selected %(verbose_name_plural)s')
+    def merge_selected(self, request, queryset):
+        opts = self.model._meta
+        if queryset.count() < 2:
+            self.message_user(request, f'Select at least two {opts.verbose_name_plural} to merge.', messages.WARNING)
+            return None
+        
+        form = MergeForm(request.POST if 'apply' in request.POST else None, queryset=queryset)
+        if form.is_valid():
+            target = form.cleaned_data['target']
+            others = [obj for obj in queryset if obj.pk != target.pk]
+            moved = self.merge_function(target, others)
+            self.message_user(
+                request,
+                f'Merged {len(others)} {opts.verbose_name_plural} into {target} and moved {moved} samples.',
+                messages.SUCCESS,
+            )
+            return None
+        return action_form_response(
+            self, request, queryset, form,
+            title=f'Merge {opts.verbose_name_plural}',
+            description=(
+                f'Samples and links of the selected {opts.verbose_name_plural} move to the one kept; '
+                'the others are deleted.'
+            ),
+        )
 
 
 @admin.register(Country)
@@ -24,9 +272,13 @@ class ProvinceInline(admin.TabularInline):
 class ProvinceAdmin(LeafletGeoAdmin):
     list_display = ('name', 'code', 'country')
     list_filter = ('country',)
+    list_select_related = ('country',)
     search_fields = ('name', 'code', 'country__name')
     autocomplete_fields = ('country',)
     
+    def get_queryset(self, request):
+        return super().get_queryset(request).select_related('country')
+    
     # This enables the Leaflet map widget
     settings_overrides = {
         'DEFAULT_CENTER': (32.0, 53.0),
@@ -40,11 +292,15 @@ class CityInline(admin.TabularInline):
 
 
 @admin.register(City)
-class CityAdmin(admin.ModelAdmin):
+class CityAdmin(AutocompleteFilterMixin, admin.ModelAdmin):
     list_display = ('name', 'province', 'province_country')
-    list_filter = ('province__country', 'province')
+    list_filter = ('province__country', ('province', AutocompleteListFilter))
+    list_select_related = ('province__country',)
     search_fields = ('name', 'province__name', 'province__country__name')
     autocomplete_fields = ('province',)
+    
+    def get_queryset(self, request):
+        return super().get_queryset(request).select_related('province__country')
 
     def province_country(self, obj):
         return obj.province.country.name
@@ -52,21 +308,26 @@ class CityAdmin(admin.ModelAdmin):
 
 
 @admin.register(Ethnicity)
-class EthnicityAdmin(admin.ModelAdmin):
+class EthnicityAdmin(MergeActionMixin, admin.ModelAdmin):
     list_display = ('name',)
     search_fields = ('name',)
     filter_horizontal = ('provinces',)
+    merge_function = staticmethod(bulk.merge_ethnicities)
 
 
 # --- NEW ADMIN CLASSES: TRIBE and CLAN ---
 
 @admin.register(Tribe)
-class TribeAdmin(admin.ModelAdmin):
+class TribeAdmin(MergeActionMixin, admin.ModelAdmin):
     list_display = ('name', 'get_ethnicities')
     list_filter = ('ethnicities',)
     search_fields = ('name', 'ethnicities__name')
     filter_horizontal = ('ethnicities',)
     fields = ('name', 'ethnicities', 'historical_note')
+    merge_function = staticmethod(bulk.merge_tribes)
+    
+    def get_queryset(self, request):
+        return super().get_queryset(request).prefetch_related('ethnicities')
     
     def get_ethnicities(self, obj):
         return ", ".join([e.name for e in obj.ethnicities.all()])
@@ -74,12 +335,16 @@ class TribeAdmin(admin.ModelAdmin):
 
 
 @admin.register(Clan)
-class ClanAdmin(admin.ModelAdmin):
+class ClanAdmin(AutocompleteFilterMixin, admin.ModelAdmin):
     list_display = ('name', 'tribe', 'common_ancestor_display')
-    list_filter = ('tribe__ethnicities', 'tribe',)
+    list_filter = ('tribe__ethnicities', ('tribe', AutocompleteListFilter))
+    list_select_related = ('tribe',)
     search_fields = ('name', 'tribe__name', 'common_ancestor')
     autocomplete_fields = ('tribe',)
     fields = ('name', 'tribe', 'common_ancestor')
+    
+    def get_queryset(self, request):
+        return super().get_queryset(request).select_related('tribe').prefetch_related('tribe__ethnicities')
 
     def common_ancestor_display(self, obj):
         return obj.common_ancestor if obj.common_ancestor else '-'
@@ -89,17 +354,19 @@ class ClanAdmin(admin.ModelAdmin):
 
 
 @admin.register(YDNATree)
-class YDNATreeAdmin(admin.ModelAdmin):
+class YDNATreeAdmin(AutocompleteFilterMixin, admin.ModelAdmin):
     list_display = ('name', 'parent')
-    list_filter = ('parent',)
+    list_filter = (('parent', HaplogroupSubtreeFilter),)
+    list_select_related = ('parent',)
     search_fields = ('name',)
     autocomplete_fields = ('parent',)
 
 
 @admin.register(MTDNATree)
-class MTDNATreeAdmin(admin.ModelAdmin):
+class MTDNATreeAdmin(AutocompleteFilterMixin, admin.ModelAdmin):
     list_display = ('name', 'parent')
-    list_filter = ('parent',)
+    list_filter = (('parent', HaplogroupSubtreeFilter),)
+    list_select_related = ('parent',)
     search_fields = ('name',)
     autocomplete_fields = ('parent',)
 
@@ -116,19 +383,21 @@ class HistoricalPeriodAdmin(admin.ModelAdmin):
 
 
 @admin.register(GeneticSample)
-class GeneticSampleAdmin(admin.ModelAdmin):
+class GeneticSampleAdmin(AutocompleteFilterMixin, PreloadedAutocompleteMixin, admin.ModelAdmin):
     list_display = ('name', 'ethnicity', 'tribe', 'clan', 'y_dna', 'mt_dna', 'historical_period', 'count')
     
     list_editable = ('ethnicity', 'count', 'tribe')
+    list_select_related = ('ethnicity', 'tribe', 'clan__tribe', 'y_dna', 'mt_dna', 'historical_period')
+    actions = ['reassign_selected']
 
     list_filter = (
         'city__province__country',
-        'city__province',
+        ('city__province', AutocompleteListFilter),
         'ethnicity',
-        'tribe', # Added
-        'clan', # Added
-        'y_dna',
-        'mt_dna',
+        ('tribe', AutocompleteListFilter), # Added
+        ('clan', AutocompleteListFilter), # Added
+        ('y_dna', HaplogroupSubtreeFilter),
+        ('mt_dna', HaplogroupSubtreeFilter),
         'historical_period',
     )
     search_fields = (
@@ -156,6 +425,34 @@ class GeneticSampleAdmin(admin.ModelAdmin):
         'count',
         'description'
     )
+    
+    def get_queryset(self, request):
+        # Tribe names list their ethnicities, in the rows and in the editable tribe column
+        return super().get_queryset(request).prefetch_related('tribe__ethnicities')
+    
+    def delete_queryset(self, request, queryset):
+        # One cache invalidation for the selection rather than one per sample
+        with cache.deferred_invalidation():
+            super().delete_queryset(request, queryset)
+    
+    @admin.action(permissions=['change'], description='Reassign selected samples')
+    def reassign_selected(self, request, queryset):
+        form = SampleReassignForm(request.POST if 'apply' in request.POST else None, admin_site=self.admin_site)
+        if form.is_valid():
+            changes = form.changes()
+            if changes:
+                count = bulk.reassign_samples(queryset, **changes)
+                self.message_user(request, f'Reassigned {count} samples.', messages.SUCCESS)
+                return None
+            form.add_error(None, 'Choose at least one value to set.')
+        return action_form_response(
+            self, request, queryset, form,
+            title='Reassign samples',
+            description=(
+                'Set the chosen values on the selected samples. A new province also sets the country '
+                'and clears cities outside it; a new tribe clears clans outside it.'
+            ),
+        )
 
 
 class BlogPostAdminForm(forms.ModelForm):
@@ -184,12 +481,27 @@ class BlogPostAdminForm(forms.ModelForm):
         return content
 
 
+@admin.register(Tag)
+class TagAdmin(admin.ModelAdmin):
+    list_display = ('name', 'slug', 'post_count')
+    search_fields = ('name', 'slug')
+    prepopulated_fields = {'slug': ('name',)}
+    
+    def get_queryset(self, request):
+        return super().get_queryset(request).annotate(post_count=models.Count('posts'))
+    
+    @admin.display(description='Posts', ordering='post_count')
+    def post_count(self, obj):
+        return obj.post_count
+
+
 @admin.register(BlogPost)
 class BlogPostAdmin(admin.ModelAdmin):
     form = BlogPostAdminForm
     list_display = ['title', 'author', 'status', 'published_at', 'view_count', 'created_at']
     list_filter = ['status', 'created_at', 'published_at']
-    search_fields = ['title', 'content', 'tags']
+    search_fields = ['title', 'content', 'tags__name']
+    autocomplete_fields = ['tags']
     prepopulated_fields = {'slug': ('title',)}
     date_hierarchy = 'created_at'
     ordering = ['-created_at']
@@ -207,11 +519,11 @@ class BlogPostAdmin(admin.ModelAdmin):
             'classes': ('collapse',)
         }),
         ('Statistics', {
-            'fields': ('view_count',),
+            'fields': ('view_count', 'reading_time'),
             'classes': ('collapse',)
         }),
     )
-    readonly_fields = ['created_at', 'updated_at', 'view_count']
+    readonly_fields = ['created_at', 'updated_at', 'view_count', 'reading_time']
     
     class Media:
         css = {
@@ -0,0 +1,45 @@
+# aio.py
+import asyncio
+
+from asgiref.sync import sync_to_async
+from django.conf import settings
+from django.db import close_old_connections
+
+
+def _with_own_connection(func):
+    """Run func and release the worker thread's connection per CONN_MAX_AGE"""
+    def run():
+        try:
+            return func()
+        finally:
+            close_old_connections()
+    return run
+
+
+async def gather_queries(*funcs):
+    """
+    Run independent blocking ORM calls concurrently and return their results in order.
+
+    Django's async ORM runs every query on one shared thread, so queries
+    awaited together still execute one after another. Here each call gets
+    a pool thread, and with it its own database connection.
+
+    Set GENETICS_PARALLEL_QUERIES = False to run them sequentially on the
+    request's connection instead (e.g. inside test transactions, which
+    other connections cannot see).
+    """
+    if not getattr(settings, 'GENETICS_PARALLEL_QUERIES', True):
+        return [await sync_to_async(func)() for func in funcs]
+
+    return await asyncio.gather(*(
+        sync_to_async(_with_own_connection(func), thread_sensitive=False)()
+        for func in funcs
+    ))
+
+
+async def run_in_thread(func):
+    """
+    Run blocking Python work, such as serializing a large response, on a
+    pool thread so the event loop keeps serving other requests meanwhile.
+    """
+    return await sync_to_async(_with_own_connection(func), thread_sensitive=False)()
@@ -0,0 +1,322 @@
+# analytics.py
+from statistics import NormalDist
+
+import numpy as np
+from django.db.models import Sum
+
+
+# Region groupings: (id lookup, label lookup) on GeneticSample
+GROUP_FIELDS = {
+    'province': ('province_id', 'province__name'),
+    'country': ('country_id', 'country__name'),
+    'ethnicity': ('ethnicity_id', 'ethnicity__name'),
+    'tribe': ('tribe_id', 'tribe__name'),
+}
+
+
+class FrequencyMatrix:
+    """
+    Haplogroup counts per region as a dense (regions x haplogroups) matrix.
+
+    Built from a single grouped query; every derived value (shares,
+    confidence intervals) is computed on the whole matrix at once.
+    """
+
+    def __init__(self, regions, haplogroups, counts, totals=None):
+        self.regions = regions
+        self.haplogroups = haplogroups
+        self.counts = counts
+        self._totals = totals
+
+    @property
+    def totals(self):
+        """Row totals; defaults to the row sums when the columns partition the samples"""
+        if self._totals is not None:
+            return self._totals
+        return self.counts.sum(axis=1)
+
+    def shares(self):
+        totals = self.totals[:, None]
+        with np.errstate(divide='ignore', invalid='ignore'):
+            return np.where(totals > 0, self.counts / totals, 0.0)
+
+    def confidence_intervals(self, confidence=0.95):
+        """Wilson score interval for every cell of the share matrix"""
+        z = NormalDist().inv_cdf(0.5 + confidence / 2)
+        n = self.totals[:, None].astype(float)
+        p = self.shares()
+
+        with np.errstate(divide='ignore', invalid='ignore'):
+            denominator = 1 + z ** 2 / n
+            centre = (p + z ** 2 / (2 * n)) / denominator
+            margin = z * np.sqrt(p * (1 - p) / n + z ** 2 / (4 * n ** 2)) / denominator
+
+        lower = np.where(n > 0, np.clip(centre - margin, 0.0, 1.0), 0.0)
+        upper = np.where(n > 0, np.clip(centre + margin, 0.0, 1.0), 0.0)
+        return lower, upper
+
+
+def frequency_matrix(queryset, group_by, dna_field, index, depth=0):
+    """
+    Aggregate samples into a FrequencyMatrix.
+
+    Haplogroups are collapsed onto their ancestor at `depth` (0 = top-level
+    haplogroup) using the in-memory tree index, so the database only has
+    to group by (region, haplogroup) once.
+    """
+    id_field, label_field = GROUP_FIELDS[group_by]
+
+    rows = list(
+        queryset.filter(**{f'{id_field}__isnull': False, f'{dna_field}__isnull': False})
+        .order_by()
+        .values(id_field, label_field, dna_field)
+        .annotate(total=Sum('count'))
+        .values_list(id_field, label_field, dna_field, 'total')
+    )
+
+    if not rows:
+        return FrequencyMatrix([], [], np.zeros((0, 0), dtype=np.int64))
+
+    region_ids = np.fromiter((row[0] for row in rows), dtype=np.int64, count=len(rows))
+    haplogroup_ids = np.fromiter(
+        (index.ancestor_at_depth(row[2], depth) for row in rows),
+        dtype=np.int64,
+        count=len(rows),
+    )
+    totals = np.fromiter((row[3] for row in rows), dtype=np.int64, count=len(rows))
+
+    unique_regions, region_idx = np.unique(region_ids, return_inverse=True)
+    unique_haplogroups, haplogroup_idx = np.unique(haplogroup_ids, return_inverse=True)
+
+    counts = np.zeros((len(unique_regions), len(unique_haplogroups)), dtype=np.int64)
+    np.add.at(counts, (region_idx, haplogroup_idx), totals)
+
+    labels = {row[0]: row[1] for row in rows}
+    regions = [labels[region_id] for region_id in unique_regions.tolist()]
+    haplogroups = [index.names[node_id] for node_id in unique_haplogroups.tolist()]
+
+    # Present regions alphabetically and haplogroups by overall frequency
+    region_order = np.argsort(np.array(regions, dtype=object), kind='stable')
+    haplogroup_order = np.argsort(-counts.sum(axis=0), kind='stable')
+
+    return FrequencyMatrix(
+        [regions[i] for i in region_order],
+        [haplogroups[i] for i in haplogroup_order],
+        counts[np.ix_(region_order, haplogroup_order)],
+    )
+
+
+def timeline_matrix(queryset, dna_field, index, depth=0, series=None, bin_width=None):
+    """
+    Aggregate samples into a FrequencyMatrix with one row per time bin.
+
+    Bins are historical periods, or fixed-width year buckets when `bin_width`
+    is given (a period falls into the bucket containing its midpoint).
+    Columns are haplogroups collapsed at `depth`, or the given `series`
+    (list of (name, descendant id set)); series may overlap, so row totals
+    are the number of samples in the bin, not the sum of the series.
+    The regions of the returned matrix are bin dicts with label and years.
+    """
+    rows = list(
+        queryset.filter(historical_period__isnull=False, **{f'{dna_field}__isnull': False})
+        .order_by()
+        .values(
+            'historical_period_id',
+            'historical_period__name',
+            'historical_period__start_year',
+            'historical_period__end_year',
+            dna_field,
+        )
+        .annotate(total=Sum('count'))
+        .values_list(
+            'historical_period_id',
+            'historical_period__name',
+            'historical_period__start_year',
+            'historical_period__end_year',
+            dna_field,
+            'total',
+        )
+    )
+
+    bins = {}
+    bin_keys = []
+    for period_id, name, start_year, end_year, _, _ in rows:
+        if bin_width:
+            bucket_start = ((start_year + end_year) // 2) // bin_width * bin_width
+            key = bucket_start
+            if key not in bins:
+                bucket_end = bucket_start + bin_width - 1
+                bins[key] = {
+                    'label': f'{bucket_start} – {bucket_end}',
+                    'start_year': bucket_start,
+                    'end_year': bucket_end,
+                }
+        else:
+            key = period_id
+            bins.setdefault(key, {'label': name, 'start_year': start_year, 'end_year': end_year})
+        bin_keys.append(key)
+
+    ordered_keys = sorted(bins, key=lambda k: (bins[k]['start_year'], bins[k]['end_year']))
+    position = {key: i for i, key in enumerate(ordered_keys)}
+    bin_idx = np.fromiter((position[key] for key in bin_keys), dtype=np.int64, count=len(rows))
+    totals = np.fromiter((row[5] for row in rows), dtype=np.int64, count=len(rows))
+    bin_totals = np.bincount(bin_idx, weights=totals, minlength=len(ordered_keys)).astype(np.int64)
+
+    if series is not None:
+        # Membership of every grouped row in every series, summed per bin in one step
+        membership = np.array(
+            [[row[4] in ids for _, ids in series] for row in rows], dtype=np.int64
+        ).reshape(len(rows), len(series))
+        counts = np.zeros((len(ordered_keys), len(series)), dtype=np.int64)
+        np.add.at(counts, bin_idx, membership * totals[:, None])
+        columns = [name for name, _ in series]
+    else:
+        haplogroup_ids = np.fromiter(
+            (index.ancestor_at_depth(row[4], depth) for row in rows),
+            dtype=np.int64,
+            count=len(rows),
+        )
+        unique_haplogroups, haplogroup_idx = np.unique(haplogroup_ids, return_inverse=True)
+        counts = np.zeros((len(ordered_keys), len(unique_haplogroups)), dtype=np.int64)
+        np.add.at(counts, (bin_idx, haplogroup_idx), totals)
+
+        # Haplogroups by overall frequency
+        order = np.argsort(-counts.sum(axis=0), kind='stable')
+        counts = counts[:, order]
+        columns = [index.names[node_id] for node_id in unique_haplogroups[order].tolist()]
+
+    return FrequencyMatrix([bins[key] for key in ordered_keys], columns, counts, totals=bin_totals)
+
+
+# --- Population comparison ---
+
+DISTANCE_METRICS = ('fst', 'euclidean', 'braycurtis')
+
+# Upper bound on the (rows x populations x haplogroups) block held in memory for Bray-Curtis
+_BLOCK_SIZE = 4_000_000
+
+
+def pairwise_distances(frequencies, metric='fst'):
+    """
+    Return the (n x n) distance matrix between the rows of a frequency matrix.
+
+    - fst: Fst-like differentiation (Ht - Hs) / Ht from haplogroup diversities
+    - euclidean: Euclidean distance between frequency vectors
+    - braycurtis: Bray-Curtis dissimilarity
+    """
+    p = np.asarray(frequencies, dtype=float)
+    n = p.shape[0]
+
+    if metric == 'braycurtis':
+        distances = np.empty((n, n))
+        step = max(1, _BLOCK_SIZE // max(1, n * p.shape[1]))
+        for start in range(0, n, step):
+            block = p[start:start + step, None, :]
+            numerator = np.abs(block - p[None, :, :]).sum(axis=2)
+            denominator = (block + p[None, :, :]).sum(axis=2)
+            with np.errstate(divide='ignore', invalid='ignore'):
+                distances[start:start + step] = np.where(
+                    denominator > 0, numerator / denominator, 0.0
+                )
+    else:
+        squares = (p ** 2).sum(axis=1)
+        gram = p @ p.T
+        pair_squares = squares[:, None] + squares[None, :]
+
+        if metric == 'euclidean':
+            distances = np.sqrt(np.clip(pair_squares - 2 * gram, 0.0, None))
+        elif metric == 'fst':
+            # Expected heterozygosity within each pair (Hs) and of the pooled pair (Ht)
+            hs = 1 - pair_squares / 2
+            ht = 1 - (pair_squares + 2 * gram) / 4
+            with np.errstate(divide='ignore', invalid='ignore'):
+                distances = np.where(ht > 0, (ht - hs) / ht, 0.0)
+            distances = np.clip(distances, 0.0, None)
+        else:
+            raise ValueError(f'Unknown metric: {metric}')
+
+    np.fill_diagonal(distances, 0.0)
+    return distances
+
+
+def upgma(distances):
+    """
+    Average-linkage (UPGMA) hierarchical clustering.
+
+    Returns a linkage matrix in SciPy's format: one row per merge holding
+    the two merged cluster ids, their distance and the new cluster size.
+    Leaves are numbered 0..n-1 and merged clusters n, n+1, ...
+    """
+    d = np.array(distances, dtype=float)
+    n = d.shape[0]
+    if n < 2:
+        return np.zeros((0, 4))
+
+    np.fill_diagonal(d, np.inf)
+    sizes = np.ones(n)
+    cluster_ids = np.arange(n)
+    linkage = np.zeros((n - 1, 4))
+
+    for step in range(n - 1):
+        i, j = divmod(int(np.argmin(d)), n)
+        if i > j:
+            i, j = j, i
+
+        linkage[step] = (cluster_ids[i], cluster_ids[j], d[i, j], sizes[i] + sizes[j])
+
+        # Merge j into i: the new row is the size-weighted mean of both rows
+        merged = (d[i] * sizes[i] + d[j] * sizes[j]) / (sizes[i] + sizes[j])
+        d[i, :] = merged
+        d[:, i] = merged
+        d[i, i] = np.inf
+        d[j, :] = np.inf
+        d[:, j] = np.inf
+
+        sizes[i] += sizes[j]
+        cluster_ids[i] = n + step
+
+    return linkage
+
+
+def leaf_order(linkage, n):
+    """Return the leaves of a linkage matrix in dendrogram order"""
+    if n == 0:
+        return []
+    if n == 1:
+        return [0]
+
+    children = {n + step: (int(row[0]), int(row[1])) for step, row in enumerate(linkage)}
+    order = []
+    stack = [n + len(linkage) - 1]
+    while stack:
+        node = stack.pop()
+        if node < n:
+            order.append(node)
+        else:
+            left, right = children[node]
+            stack.extend((right, left))
+    return order
+
+
+def principal_components(frequencies, n_components=2):
+    """
+    PCA of the frequency vectors through SVD.
+
+    Returns (coordinates, explained_variance_ratio); missing components
+    (fewer populations or haplogroups than requested) are zero-filled.
+    """
+    p = np.asarray(frequencies, dtype=float)
+    coordinates = np.zeros((p.shape[0], n_components))
+    explained = np.zeros(n_components)
+    if p.shape[0] < 2 or p.shape[1] == 0:
+        return coordinates, explained
+
+    centered = p - p.mean(axis=0)
+    u, s, _ = np.linalg.svd(centered, full_matrices=False)
+    k = min(n_components, len(s))
+    coordinates[:, :k] = u[:, :k] * s[:k]
+
+    variance = s ** 2
+    if variance.sum() > 0:
+        explained[:k] = variance[:k] / variance.sum()
+    return coordinates, explained
@@ -3,3 +3,6 @@ from django.apps import AppConfig
 
 class GeneticsConfig(AppConfig):
     name = 'genetics'
+
+    def ready(self):
+        from . import signals  # noqa: F401
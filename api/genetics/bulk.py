@@ -0,0 +1,111 @@
+# bulk.py
+"""
+Set-based edits of many rows at once, used by the admin bulk actions.
+
+Each function runs in one transaction and invalidates the dependent
+caches once however many rows it changes: updates go through
+QuerySet.update(), and the per-row signals of the deletes it makes are
+folded into the same invalidation (cache.deferred_invalidation).
+"""
+from django.db import transaction
+from django.db.models import Case, F, Value, When
+
+from . import cache
+from .models import City, Clan, Ethnicity, GeneticSample, Tribe
+
+
+REASSIGNABLE_FIELDS = ('province', 'ethnicity', 'tribe', 'y_dna', 'mt_dna')
+
+
+def reassign_samples(queryset, **values):
+    """
+    Set the given fields (see REASSIGNABLE_FIELDS) on every sample of the
+    queryset with a single UPDATE and return the number of samples.
+
+    A new province also sets the country and clears cities outside the
+    province; a new tribe clears clans outside the tribe.
+    """
+    unknown = set(values) - set(REASSIGNABLE_FIELDS)
+    if unknown:
+        raise ValueError(f'Cannot reassign {", ".join(sorted(unknown))}')
+
+    changes = dict(values)
+    province = values.get('province')
+    if province is not None:
+        changes['country_id'] = province.country_id
+        changes['city'] = Case(
+            When(city__in=City.objects.filter(province=province).values('pk'), then=F('city')),
+            default=Value(None),
+        )
+    tribe = values.get('tribe')
+    if tribe is not None:
+        changes['clan'] = Case(
+            When(clan__in=Clan.objects.filter(tribe=tribe).values('pk'), then=F('clan')),
+            default=Value(None),
+        )
+
+    # The admin's queryset may carry joins and distinct(); update through its ids
+    samples = GeneticSample.objects.filter(pk__in=queryset.order_by().values('pk'))
+    with cache.deferred_invalidation(), transaction.atomic():
+        count = samples.update(**changes)
+        cache.invalidate(cache.SAMPLES)
+    return count
+
+
+def _merge_links(through, field, ids, target_id, other):
+    """Give the target every many-to-many link of the merged rows"""
+    linked = (
+        through.objects.filter(**{f'{field}_id__in': ids})
+        .values_list(f'{other}_id', flat=True)
+        .distinct()
+    )
+    through.objects.bulk_create(
+        [through(**{f'{field}_id': target_id, f'{other}_id': other_id}) for other_id in linked],
+        ignore_conflicts=True,
+    )
+
+
+def merge_ethnicities(target, others):
+    """
+    Fold the other ethnicities into the target: move their samples, tribe
+    and province links to it, then delete them. Returns the number of
+    samples moved.
+    """
+    ids = [ethnicity.pk for ethnicity in others if ethnicity.pk != target.pk]
+    with cache.deferred_invalidation(), transaction.atomic():
+        moved = GeneticSample.objects.filter(ethnicity__in=ids).update(ethnicity=target)
+        _merge_links(Tribe.ethnicities.through, 'ethnicity', ids, target.pk, 'tribe')
+        _merge_links(Ethnicity.provinces.through, 'ethnicity', ids, target.pk, 'province')
+        Ethnicity.objects.filter(pk__in=ids).delete()
+        cache.invalidate(cache.SAMPLES, cache.REFERENCE)
+    return moved
+
+
+def merge_tribes(target, others):
+    """
+    Fold the other tribes into the target: move their samples, clans and
+    ethnicity links to it, then delete them. Clans sharing a name end up
+    as one clan of the target. Returns the number of samples moved.
+    """
+    ids = [tribe.pk for tribe in others if tribe.pk != target.pk]
+    with cache.deferred_invalidation(), transaction.atomic():
+        # Clan names are unique per tribe: keep one clan per name and fold the rest into it
+        keep = dict(Clan.objects.filter(tribe=target).values_list('name', 'pk'))
+        duplicates = {}
+        for clan_id, name in Clan.objects.filter(tribe__in=ids).order_by('pk').values_list('pk', 'name'):
+            if name in keep:
+                duplicates[clan_id] = keep[name]
+            else:
+                keep[name] = clan_id
+        if duplicates:
+            GeneticSample.objects.filter(clan__in=duplicates).update(clan=Case(
+                *(When(clan=clan_id, then=Value(kept)) for clan_id, kept in duplicates.items())
+            ))
+            Clan.objects.filter(pk__in=duplicates).delete()
+        Clan.objects.filter(tribe__in=ids).update(tribe=target)
+
+        moved = GeneticSample.objects.filter(tribe__in=ids).update(tribe=target)
+        _merge_links(Tribe.ethnicities.through, 'tribe', ids, target.pk, 'ethnicity')
+        Tribe.objects.filter(pk__in=ids).delete()
+        cache.invalidate(cache.SAMPLES, cache.REFERENCE)
+    return moved
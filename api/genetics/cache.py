@@ -0,0 +1,174 @@
+# cache.py
+import hashlib
+import json
+import time
+from contextlib import contextmanager
+from contextvars import ContextVar
+from functools import wraps
+
+from asgiref.sync import sync_to_async
+
+from django.conf import settings
+from django.core.cache import cache
+from django.http import HttpResponse
+from django.utils.cache import patch_vary_headers
+
+from api.compression import MIN_SIZE, compress, negotiate
+from api.instrumentation import TimedJSONRenderer
+from api.metrics import observe_cache
+
+
+# Default lifetime of cached results; entries are also invalidated on data changes
+CACHE_TIMEOUT = getattr(settings, 'GENETICS_CACHE_TIMEOUT', 60 * 60)
+
+# Cached data is grouped in namespaces. Every namespace has a version number
+# stored in the cache itself; bumping it makes all keys built on the old
+# version unreachable, so invalidation is a single cache write.
+SAMPLES = 'samples'
+HAPLOGROUPS = 'haplogroups'
+REFERENCE = 'reference'
+BLOG = 'blog'
+
+# Namespaces invalidated inside a deferred_invalidation() block
+_deferred = ContextVar('genetics_deferred_invalidation', default=None)
+
+
+def _version_key(namespace):
+    return f'genetics:version:{namespace}'
+
+
+def get_version(namespace):
+    key = _version_key(namespace)
+    version = cache.get(key)
+    if version is None:
+        # Start from a time-based value so a lost version never reuses old keys
+        cache.add(key, time.time_ns(), timeout=None)
+        version = cache.get(key)
+    return version
+
+
+def invalidate(*namespaces):
+    """Invalidate every cached entry built on the given namespaces"""
+    pending = _deferred.get()
+    if pending is not None:
+        pending.update(namespaces)
+        return
+    for namespace in namespaces:
+        try:
+            cache.incr(_version_key(namespace))
+        except ValueError:
+            cache.set(_version_key(namespace), time.time_ns(), timeout=None)
+
+
+@contextmanager
+def deferred_invalidation():
+    """
+    Collect the invalidations made inside the block, e.g. by the signals of
+    a bulk delete, and invalidate each namespace once when it ends. Open it
+    outside transaction.atomic() so caches are invalidated after the commit.
+    """
+    if _deferred.get() is not None:
+        # Nested: the outer block invalidates
+        yield
+        return
+    pending = set()
+    token = _deferred.set(pending)
+    try:
+        yield
+    finally:
+        _deferred.reset(token)
+        invalidate(*pending)
+
+
+def make_key(prefix, params, namespaces):
+    """Build a cache key from a prefix, the request parameters and the namespace versions"""
+    versions = '.'.join(str(get_version(namespace)) for namespace in namespaces)
+    digest = hashlib.md5(
+        json.dumps(params, sort_keys=True, default=str).encode('utf-8')
+    ).hexdigest()
+    return f'genetics:{prefix}:{versions}:{digest}'
+
+
+def get_or_compute(prefix, params, namespaces, compute, timeout=None):
+    """Return the cached value for these parameters, computing and storing it on a miss"""
+    key = make_key(prefix, params, namespaces)
+    value = cache.get(key)
+    observe_cache(prefix, value is not None)
+    if value is None:
+        value = compute()
+        cache.set(key, value, timeout if timeout is not None else CACHE_TIMEOUT)
+    return value
+
+
+def precompressed_response(request, key, body, timeout=None, content_type='application/json'):
+    """
+    Build a response for a cached body. The compressed form for the negotiated
+    encoding is stored beside the body under the same key, so each version
+    is compressed once instead of on every hit.
+    """
+    encoding = negotiate(request) if len(body) >= MIN_SIZE else None
+
+    if encoding:
+        compressed_key = f'{key}:{encoding}'
+        compressed = cache.get(compressed_key)
+        if compressed is None:
+            compressed = compress(body, encoding, best=True)
+            cache.set(compressed_key, compressed, timeout if timeout is not None else CACHE_TIMEOUT)
+        response = HttpResponse(compressed, content_type=content_type)
+        response['Content-Encoding'] = encoding
+    else:
+        response = HttpResponse(body, content_type=content_type)
+
+    patch_vary_headers(response, ('Accept-Encoding',))
+    return response
+
+
+def cached_response(prefix, namespaces):
+    """
+    Decorator for the `get` method of read-only DRF views: cache the rendered
+    JSON body per query string until one of the namespaces is invalidated.
+    Only successful responses are cached.
+    """
+    def decorator(get):
+        @wraps(get)
+        def wrapper(self, request, *args, **kwargs):
+            params = sorted(request.query_params.lists())
+            key = make_key(prefix, [params, kwargs], namespaces)
+
+            body = cache.get(key)
+            observe_cache(prefix, body is not None)
+            if body is None:
+                response = get(self, request, *args, **kwargs)
+                if response.status_code != 200 or not hasattr(response, 'data'):
+                    return response
+                body = TimedJSONRenderer().render(response.data)
+                cache.set(key, body, CACHE_TIMEOUT)
+
+            return precompressed_response(request, key, body)
+        return wrapper
+    return decorator
+
+
+def acached_response(prefix, namespaces):
+    """
+    Async counterpart of cached_response for `async def get` methods of plain
+    Django views returning JSON responses.
+    """
+    def decorator(get):
+        @wraps(get)
+        async def wrapper(self, request, *args, **kwargs):
+            params = sorted(request.GET.lists())
+            key = await sync_to_async(make_key)(prefix, [params, kwargs], namespaces)
+
+            body = await cache.aget(key)
+            observe_cache(prefix, body is not None)
+            if body is None:
+                response = await get(self, request, *args, **kwargs)
+                if response.status_code != 200:
+                    return response
+                body = response.content
+                await cache.aset(key, body, CACHE_TIMEOUT)
+
+            return await sync_to_async(precompressed_response)(request, key, body)
+        return wrapper
+    return decorator
@@ -0,0 +1,179 @@
+# export.py
+"""
+Denormalized export of the sample table for bulk downloads.
+
+Every sample is one row of names rather than ids: its location,
+ethnicity, tribe and clan, its haplogroups with their paths from the
+root of the tree, and its historical period with the period's years.
+Rows are read with a server-side cursor (QuerySet.iterator) and written
+as they arrive, as gzipped CSV or, when the optional pyarrow package is
+installed, as Parquet.
+
+Exports are files in GENETICS_EXPORT_DIR named after the versions of the
+cache namespaces they were built from, so a file is built once and
+served until samples, reference data or haplogroup trees change. Files
+of older versions are removed after a grace period rather than at once.
+"""
+import csv
+import gzip
+import io
+import os
+import tempfile
+import time
+from itertools import islice
+from pathlib import Path
+
+from django.conf import settings
+
+try:
+    import pyarrow
+    import pyarrow.parquet
+except ImportError:  # pyarrow is optional
+    pyarrow = None
+
+from api.metrics import observe_cache
+from . import cache
+from .haplogroups import HAPLOGROUP_TREES, HaplogroupIndex
+from .models import GeneticSample
+
+
+NAMESPACES = (cache.SAMPLES, cache.REFERENCE, cache.HAPLOGROUPS)
+
+# Rows fetched per round trip of the cursor and written per Parquet batch
+BATCH_SIZE = 5000
+
+# Seconds an export built from an older version is kept
+STALE_EXPORT_AGE = 15 * 60
+
+# Joins the haplogroup names of a path, e.g. R/R-M269/R-L23
+PATH_SEPARATOR = '/'
+
+COLUMNS = (
+    'name', 'country', 'province', 'city', 'ethnicity', 'tribe', 'clan',
+    'y_dna', 'y_dna_path', 'mt_dna', 'mt_dna_path',
+    'historical_period', 'period_start_year', 'period_end_year', 'count',
+)
+
+# Columns that are not strings, for the Parquet schema
+INTEGER_COLUMNS = {'period_start_year': 'int32', 'period_end_year': 'int32', 'count': 'int64'}
+
+
+def export_dir():
+    return Path(getattr(settings, 'GENETICS_EXPORT_DIR', Path(settings.BASE_DIR) / 'exports'))
+
+
+def version():
+    """Version of the data an export is built from"""
+    return '-'.join(str(cache.get_version(namespace)) for namespace in NAMESPACES)
+
+
+def rows():
+    """Yield one tuple per sample, in COLUMNS order"""
+    indexes = [HaplogroupIndex.load(model) for model in HAPLOGROUP_TREES.values()]
+
+    def haplogroup(index, node_id):
+        if node_id is None:
+            return None, None
+        return index.names[node_id], PATH_SEPARATOR.join(index.path_names(node_id))
+
+    queryset = GeneticSample.objects.order_by('pk').values_list(
+        'name', 'country__name', 'province__name', 'city__name', 'ethnicity__name',
+        'tribe__name', 'clan__name', 'y_dna_id', 'mt_dna_id', 'historical_period__name',
+        'historical_period__start_year', 'historical_period__end_year', 'count',
+    )
+    for row in queryset.iterator(chunk_size=BATCH_SIZE):
+        *names, y_dna_id, mt_dna_id, period, start_year, end_year, count = row
+        yield (
+            *names,
+            *haplogroup(indexes[0], y_dna_id),
+            *haplogroup(indexes[1], mt_dna_id),
+            period, start_year, end_year, count,
+        )
+
+
+def write_csv(records, fileobj):
+    """Write rows as gzipped CSV with a header line"""
+    # mtime=0: the same data always gives the same bytes
+    with gzip.GzipFile(fileobj=fileobj, mode='wb', mtime=0) as compressed:
+        text = io.TextIOWrapper(compressed, encoding='utf-8', newline='')
+        writer = csv.writer(text)
+        writer.writerow(COLUMNS)
+        writer.writerows(records)
+        text.flush()
+        text.detach()
+
+
+def write_parquet(records, fileobj):
+    """Write rows as a Parquet file, one row group per BATCH_SIZE rows"""
+    schema = pyarrow.schema([
+        (column, getattr(pyarrow, INTEGER_COLUMNS.get(column, 'string'))()) for column in COLUMNS
+    ])
+    records = iter(records)
+    with pyarrow.parquet.ParquetWriter(fileobj, schema, compression='zstd') as writer:
+        while batch := list(islice(records, BATCH_SIZE)):
+            columns = [pyarrow.array(values, type=field.type) for values, field in zip(zip(*batch), schema)]
+            writer.write_batch(pyarrow.record_batch(columns, schema=schema))
+
+
+# Format -> (file extension, content type, writer)
+FORMATS = {
+    'csv': ('csv.gz', 'application/gzip', write_csv),
+    'parquet': ('parquet', 'application/vnd.apache.parquet', write_parquet),
+}
+
+
+def available_formats():
+    return [name for name in FORMATS if name != 'parquet' or pyarrow is not None]
+
+
+def write_export(file_format, path):
+    """Write the export to `path`, replacing the file only once it is complete"""
+    path = Path(path)
+    path.parent.mkdir(parents=True, exist_ok=True)
+    fd, partial = tempfile.mkstemp(dir=path.parent, prefix=f'.{path.name}.')
+    try:
+        with os.fdopen(fd, 'wb') as fileobj:
+            FORMATS[file_format][2](rows(), fileobj)
+        os.replace(partial, path)
+    except BaseException:
+        os.unlink(partial)
+        raise
+    return path
+
+
+def remove_stale_exports(extension, keep):
+    """
+    Remove exports built from other versions once they are older than
+    STALE_EXPORT_AGE. The delay leaves time to responses still streaming
+    them, and to worker processes whose cache versions differ (e.g. with
+    a per-process cache backend) and still serve them.
+    """
+    cutoff = time.time() - STALE_EXPORT_AGE
+    for stale in export_dir().glob(f'samples-*.{extension}'):
+        try:
+            if stale != keep and stale.stat().st_mtime < cutoff:
+                stale.unlink()
+        except FileNotFoundError:
+            pass
+
+
+def get_export(file_format, data_version=None):
+    """
+    Open the export of the current data for reading, building it on first
+    use. The file is opened before any cleanup, so the caller always gets
+    a readable handle.
+    """
+    extension = FORMATS[file_format][0]
+    path = export_dir() / f'samples-{data_version or version()}.{extension}'
+    try:
+        fileobj = open(path, 'rb')
+    except FileNotFoundError:
+        observe_cache('sample-export', False)
+    else:
+        observe_cache('sample-export', True)
+        return fileobj
+
+    write_export(file_format, path)
+    fileobj = open(path, 'rb')
+    remove_stale_exports(extension, keep=path)
+    return fileobj
@@ -0,0 +1,78 @@
+# geo.py
+"""
+Spatial options of the province endpoints.
+
+Centroids and GeoJSON are computed by PostGIS in the query that loads
+the provinces, and the raw geometry column is not fetched, so responses
+are built without GEOS operations in Python. The bbox and within
+filters compile to the && and ST_Within operators, which PostGIS answers
+from the GiST index Django creates on Province.geom (spatial_index).
+
+    /provinces/?bbox=44,25,52,32&geometry=simplified
+"""
+import math
+
+from django.contrib.gis.db.models.functions import AsGeoJSON, Centroid, GeomOutputGeoFunc
+from django.contrib.gis.geos import Polygon
+
+
+GEOMETRY_DETAILS = ('none', 'simplified', 'full')
+
+# Tolerance of geometry=simplified in degrees (about 1 km), and the
+# coordinate decimals kept, which is ample at that tolerance
+SIMPLIFY_TOLERANCE = 0.01
+SIMPLIFIED_PRECISION = 5
+
+# Query parameter -> lookup on Province.geom
+BOUNDS_FILTERS = {
+    'bbox': 'geom__bboverlaps',  # bounding boxes overlap: everything on screen
+    'within': 'geom__within',    # entirely inside the box
+}
+
+
+class SimplifyPreserveTopology(GeomOutputGeoFunc):
+    """ST_SimplifyPreserveTopology: fewer vertices, without invalid geometries"""
+    function = 'ST_SimplifyPreserveTopology'
+
+
+def parse_bbox(value, name='bbox'):
+    """Polygon of 'minx,miny,maxx,maxy' in WGS84 degrees; raises ValueError"""
+    try:
+        coords = [float(part) for part in value.split(',')]
+    except ValueError:
+        coords = []
+    if len(coords) != 4 or not all(math.isfinite(coord) for coord in coords):
+        raise ValueError(f'{name} must be minx,miny,maxx,maxy')
+    minx, miny, maxx, maxy = coords
+    if minx >= maxx or miny >= maxy:
+        raise ValueError(f'{name} must have minx < maxx and miny < maxy')
+    polygon = Polygon.from_bbox(coords)
+    polygon.srid = 4326
+    return polygon
+
+
+def bounds_filters(params):
+    """Filter kwargs for the bbox and within parameters; raises ValueError"""
+    return {
+        lookup: parse_bbox(params[name], name)
+        for name, lookup in BOUNDS_FILTERS.items()
+        if params.get(name)
+    }
+
+
+def annotate_geometry(queryset, detail='full', centroid=True):
+    """
+    Annotate `centroid` (unless centroid is False) and, unless detail is
+    'none', `geojson` on a Province queryset, and leave the geometry column
+    itself unloaded.
+    """
+    queryset = queryset.defer('geom')
+    if centroid:
+        queryset = queryset.annotate(centroid=Centroid('geom'))
+    if detail == 'full':
+        queryset = queryset.annotate(geojson=AsGeoJSON('geom'))
+    elif detail == 'simplified':
+        queryset = queryset.annotate(geojson=AsGeoJSON(
+            SimplifyPreserveTopology('geom', SIMPLIFY_TOLERANCE), precision=SIMPLIFIED_PRECISION
+        ))
+    return queryset
@@ -0,0 +1,117 @@
+# haplogroups.py
+from collections import defaultdict
+
+from .models import YDNATree, MTDNATree
+
+
+# Maps the GeneticSample haplogroup field to the tree model it points at
+HAPLOGROUP_TREES = {
+    'y_dna': YDNATree,
+    'mt_dna': MTDNATree,
+}
+
+
+class HaplogroupIndex:
+    """
+    In-memory index over a haplogroup tree (YDNATree or MTDNATree).
+
+    The trees are stored as adjacency lists, so walking them through
+    `node.children.all()` or `node.parent` costs one query per node.
+    The index loads the whole tree with a single query and answers
+    descendant, path and depth lookups from memory.
+    """
+
+    def __init__(self, rows):
+        self.names = {}
+        self.parents = {}
+        self.children = defaultdict(list)
+        self.ids_by_name = {}
+
+        for node_id, name, parent_id in rows:
+            self.names[node_id] = name
+            self.parents[node_id] = parent_id
+            self.ids_by_name[name] = node_id
+            if parent_id is not None:
+                self.children[parent_id].append(node_id)
+
+        self._paths = {}
+
+    @classmethod
+    def load(cls, model):
+        """Build the index for a tree model with one query"""
+        return cls(model.objects.values_list('id', 'name', 'parent_id'))
+
+    @classmethod
+    async def aload(cls, model):
+        """Async version of load()"""
+        return cls([row async for row in model.objects.values_list('id', 'name', 'parent_id')])
+
+    def get_id(self, name):
+        return self.ids_by_name.get(name)
+
+    def descendant_ids(self, node_id):
+        """Return the node id followed by the ids of all its subclades"""
+        result = []
+        stack = [node_id]
+        seen = set()
+        while stack:
+            current = stack.pop()
+            if current in seen:
+                continue
+            seen.add(current)
+            result.append(current)
+            stack.extend(reversed(self.children.get(current, ())))
+        return result
+
+    def path(self, node_id):
+        """Return the ids from the root down to the node, e.g. Q -> Q-M242 -> Q-L245"""
+        if node_id in self._paths:
+            return self._paths[node_id]
+
+        path = []
+        seen = set()
+        current = node_id
+        while current is not None and current not in seen:
+            seen.add(current)
+            path.append(current)
+            current = self.parents.get(current)
+        path.reverse()
+
+        self._paths[node_id] = path
+        return path
+
+    def path_names(self, node_id):
+        return [self.names[i] for i in self.path(node_id)]
+
+    def depth(self, node_id):
+        return len(self.path(node_id)) - 1
+
+    def root(self, node_id):
+        return self.path(node_id)[0]
+
+    def ancestor_at_depth(self, node_id, depth):
+        """
+        Return the ancestor of the node at the given depth (0 = top-level).
+        Nodes shallower than the requested depth map to themselves.
+        """
+        path = self.path(node_id)
+        return path[min(depth, len(path) - 1)]
+
+    def tree(self):
+        """
+        Return the tree as nested dicts, shaped like YDNATreeSerializer output:
+        {'name', 'root_haplogroup', 'children'} with children sorted by name.
+        """
+        def build(node_id, root_name):
+            children = sorted(self.children.get(node_id, ()), key=lambda i: self.names[i])
+            return {
+                'name': self.names[node_id],
+                'root_haplogroup': root_name if self.parents[node_id] is not None else None,
+                'children': [build(child, root_name) for child in children],
+            }
+
+        roots = sorted(
+            (node_id for node_id, parent_id in self.parents.items() if parent_id is None),
+            key=lambda i: self.names[i],
+        )
+        return [build(root, self.names[root]) for root in roots]
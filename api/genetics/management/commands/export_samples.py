@@ -0,0 +1,26 @@
+from django.core.management.base import BaseCommand, CommandError
+
+from genetics import export
+
+
+class Command(BaseCommand):
+    help = (
+        'Build the sample export served by /genetics/samples/export/ for the current data, '
+        'or write it to --output.'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--format', choices=list(export.FORMATS), default='csv')
+        parser.add_argument('--output', help='File to write instead of the served export')
+
+    def handle(self, *args, **options):
+        file_format = options['format']
+        if file_format not in export.available_formats():
+            raise CommandError(f'The {file_format} export needs the optional pyarrow package')
+
+        if options['output']:
+            path = export.write_export(file_format, options['output'])
+        else:
+            with export.get_export(file_format) as fileobj:
+                path = fileobj.name
+        self.stdout.write(self.style.SUCCESS(f'Wrote {path}'))
@@ -0,0 +1,14 @@
+from django.core.management.base import BaseCommand
+
+from genetics.viewcounts import flush_view_counts
+
+
+class Command(BaseCommand):
+    help = (
+        'Write the blog post view counts buffered in the cache to the database. '
+        'Requires a cache shared with the web workers (e.g. Redis or Memcached).'
+    )
+
+    def handle(self, *args, **options):
+        flushed = flush_view_counts()
+        self.stdout.write(self.style.SUCCESS(f'Flushed {flushed} views'))
@@ -0,0 +1,26 @@
+from django.core.management.base import BaseCommand
+
+from genetics import cache, rendering
+from genetics.models import BlogPost
+
+
+class Command(BaseCommand):
+    help = (
+        'Re-render the HTML, excerpt and reading time of blog posts whose content '
+        'changed outside of save() or was rendered by an older renderer version.'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--all', action='store_true', help='Re-render every post')
+
+    def handle(self, *args, **options):
+        posts = list(BlogPost.objects.only('id', 'content', 'content_hash'))
+        if options['all']:
+            for post in posts:
+                post.content_hash = ''
+        stale = [post for post in posts if post.render_content()]
+        # bulk_update leaves updated_at and the search vector alone
+        BlogPost.objects.bulk_update(stale, rendering.DERIVED_FIELDS, batch_size=100)
+        if stale:
+            cache.invalidate(cache.BLOG)
+        self.stdout.write(self.style.SUCCESS(f'Rendered {len(stale)} posts'))
@@ -0,0 +1,247 @@
+import json
+import logging
+import random
+import statistics
+import time
+
+from django.core.cache import cache
+from django.core.management import call_command
+from django.core.management.base import BaseCommand, CommandError
+from django.db import connection
+from django.test import Client, override_settings
+from django.test.utils import CaptureQueriesContext, setup_test_environment, teardown_test_environment
+from django.urls import reverse
+from django.utils import timezone
+
+from converter.converter import AzerbaijaniTransliteration
+from genetics.management.commands.seed_benchmark_data import make_words
+
+
+# (name, URL name, query parameters)
+ENDPOINTS = (
+    ('samples', 'sample-list', {}),
+    ('samples-filtered', 'sample-list', {'country': 'Iran', 'haplogroup': 'R-1'}),
+    ('sample-facets', 'sample-facets', {'haplogroup': 'R'}),
+    ('countries', 'country-list', {}),
+    ('provinces', 'province-list', {}),
+    ('cities', 'city-list', {}),
+    ('tribes', 'tribe-list', {}),
+    ('clans', 'clan-list', {}),
+    ('bootstrap', 'bootstrap', {}),
+    ('haplogroup-count', 'haplogroup-count', {'name': 'R'}),
+    ('haplogroup-tree', 'haplogroup-list', {}),
+    ('heatmap', 'haplogroup-heatmap', {'haplogroup': 'R'}),
+    ('heatmap-series', 'haplogroup-heatmap', {'haplogroup': 'R-1,J', 'mt_dna': 'H'}),
+    ('frequencies', 'haplogroup-frequencies', {'group_by': 'ethnicity', 'depth': 2}),
+    ('timeline', 'haplogroup-timeline', {'bin': 500}),
+    ('population-distances', 'population-distances', {'group_by': 'tribe', 'analysis': 'cluster,pca'}),
+    ('blog', 'blog-list', {}),
+    ('dict-all', 'all-words', {}),
+    ('dict-search', 'search-words', {'text': 'qa'}),
+    ('convert', 'convert-text', {'text': ' '.join(make_words(200, random.Random(0))),
+                                 'source': 'latin', 'target': 'arabic'}),
+)
+
+# Input sizes (in words) for the transliterator benchmark
+TRANSLITERATION_SIZES = (10, 100, 1000, 10000)
+
+
+def summarize(timings):
+    """Timing statistics in milliseconds"""
+    timings = sorted(timings)
+    p95 = statistics.quantiles(timings, n=20)[-1] if len(timings) > 1 else timings[0]
+    return {
+        'min_ms': round(timings[0] * 1000, 3),
+        'median_ms': round(statistics.median(timings) * 1000, 3),
+        'p95_ms': round(p95 * 1000, 3),
+    }
+
+
+class Command(BaseCommand):
+    help = (
+        'Time every API endpoint and the transliterator on synthetic datasets of '
+        'several sizes, write the results as JSON and compare them with a baseline'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--scales',
+            type=str,
+            default='1000,10000,50000',
+            help='Comma-separated dataset sizes, in samples and words (default: 1000,10000,50000)'
+        )
+        parser.add_argument('--repeat', type=int, default=10, help='Timed requests per endpoint (default: 10)')
+        parser.add_argument(
+            '--warm',
+            action='store_true',
+            help='Keep the cache between requests (default: clear it, timing the uncached work)'
+        )
+        parser.add_argument('--output', type=str, help='Write the results to this JSON file')
+        parser.add_argument('--baseline', type=str, help='Compare the median timings with this results file')
+        parser.add_argument(
+            '--tolerance',
+            type=float,
+            default=0.2,
+            help='Relative slowdown over the baseline reported as a regression (default: 0.2)'
+        )
+        parser.add_argument(
+            '--existing',
+            action='store_true',
+            help='Benchmark the current database as it is, instead of seeding a test database'
+        )
+        parser.add_argument('--keepdb', action='store_true', help='Keep the benchmark database afterwards')
+
+    def handle(self, *args, **options):
+        try:
+            scales = [int(scale) for scale in options['scales'].split(',') if scale.strip()]
+        except ValueError:
+            raise CommandError('--scales must be a comma-separated list of integers')
+        if options['repeat'] < 1:
+            raise CommandError('--repeat must be at least 1')
+
+        baseline = None
+        if options['baseline']:
+            try:
+                with open(options['baseline'], encoding='utf-8') as f:
+                    baseline = json.load(f)
+            except (OSError, json.JSONDecodeError) as e:
+                raise CommandError(f'Cannot read baseline {options["baseline"]}: {e}')
+
+        results = {
+            'created': timezone.now().isoformat(),
+            'repeat': options['repeat'],
+            'warm': options['warm'],
+            'scales': {},
+            'transliterator': self.benchmark_transliterator(options['repeat']),
+        }
+
+        # Per-request logging would dominate the output and skew the timings
+        performance_logger = logging.getLogger('api.performance')
+        log_level = performance_logger.level
+        performance_logger.setLevel(logging.WARNING)
+        setup_test_environment()
+        try:
+            with override_settings(DATABASE_REPLICAS=[]):
+                if options['existing']:
+                    results['scales']['existing'] = self.benchmark_endpoints(options)
+                else:
+                    results['scales'].update(self.benchmark_scales(scales, options))
+        finally:
+            teardown_test_environment()
+            performance_logger.setLevel(log_level)
+
+        self.report(results)
+
+        if options['output']:
+            with open(options['output'], 'w', encoding='utf-8') as f:
+                json.dump(results, f, indent=2)
+            self.stdout.write(self.style.SUCCESS(f'Results written to {options["output"]}'))
+
+        if baseline is not None:
+            regressions = self.compare(results, baseline, options['tolerance'])
+            if regressions:
+                raise CommandError(f'{regressions} benchmark(s) slower than the baseline')
+
+    def benchmark_scales(self, scales, options):
+        """Seed a separate test database at every scale and benchmark it"""
+        old_name = connection.settings_dict['NAME']
+        connection.creation.create_test_db(verbosity=0, autoclobber=True, keepdb=options['keepdb'])
+        try:
+            results = {}
+            for scale in scales:
+                self.stdout.write(f'Seeding {scale} samples and words...')
+                call_command(
+                    'seed_benchmark_data', samples=scale, words=scale, flush=True, verbosity=0,
+                    stdout=self.stdout,
+                )
+                results[str(scale)] = self.benchmark_endpoints(options)
+            return results
+        finally:
+            connection.creation.destroy_test_db(old_name, verbosity=0, keepdb=options['keepdb'])
+
+    def benchmark_endpoints(self, options):
+        client = Client()
+        results = {}
+        for name, url_name, params in ENDPOINTS:
+            url = reverse(url_name)
+
+            # One untimed request counts the queries (and warms up the code path)
+            cache.clear()
+            with CaptureQueriesContext(connection) as queries:
+                response = client.get(url, params)
+            if response.status_code != 200:
+                self.stdout.write(self.style.WARNING(f'{name}: HTTP {response.status_code}, skipped'))
+                continue
+
+            timings = []
+            for _ in range(options['repeat']):
+                if not options['warm']:
+                    cache.clear()
+                start = time.perf_counter()
+                client.get(url, params)
+                timings.append(time.perf_counter() - start)
+
+            results[name] = {
+                **summarize(timings),
+                'queries': len(queries),
+                'bytes': len(response.content),
+            }
+        return results
+
+    def benchmark_transliterator(self, repeat):
+        transliterator = AzerbaijaniTransliteration()
+        results = {}
+        for size in TRANSLITERATION_SIZES:
+            words = make_words(size, random.Random(size))
+            timings = []
+            for _ in range(repeat):
+                start = time.perf_counter()
+                for word in words:
+                    transliterator.transliterate(word)
+                timings.append(time.perf_counter() - start)
+            stats = summarize(timings)
+            stats['words_per_second'] = round(size / (stats['median_ms'] / 1000)) if stats['median_ms'] else None
+            results[str(size)] = stats
+        return results
+
+    def report(self, results):
+        for scale, endpoints in results['scales'].items():
+            self.stdout.write(self.style.MIGRATE_HEADING(f'Scale: {scale}'))
+            for name, stats in endpoints.items():
+                self.stdout.write(
+                    f'  {name:<22} median {stats["median_ms"]:>10.2f} ms  '
+                    f'p95 {stats["p95_ms"]:>10.2f} ms  {stats["queries"]:>3} queries  {stats["bytes"]:>10} bytes'
+                )
+        self.stdout.write(self.style.MIGRATE_HEADING('Transliterator'))
+        for size, stats in results['transliterator'].items():
+            self.stdout.write(
+                f'  {size:>6} words   median {stats["median_ms"]:>10.2f} ms  '
+                f'{stats["words_per_second"] or 0:>10} words/s'
+            )
+
+    def compare(self, results, baseline, tolerance):
+        """Print the change of every median against the baseline; return the number of regressions"""
+        self.stdout.write(self.style.MIGRATE_HEADING('Against the baseline'))
+        pairs = [
+            (f'{scale}/{name}', stats, baseline.get('scales', {}).get(scale, {}).get(name))
+            for scale, endpoints in results['scales'].items()
+            for name, stats in endpoints.items()
+        ] + [
+            (f'transliterator/{size}', stats, baseline.get('transliterator', {}).get(size))
+            for size, stats in results['transliterator'].items()
+        ]
+
+        regressions = 0
+        for label, stats, previous in pairs:
+            if not previous or not previous.get('median_ms'):
+                continue
+            ratio = stats['median_ms'] / previous['median_ms']
+            line = f'  {label:<36} {previous["median_ms"]:>10.2f} -> {stats["median_ms"]:>10.2f} ms ({ratio - 1:+.0%})'
+            if ratio > 1 + tolerance:
+                regressions += 1
+                self.stdout.write(self.style.ERROR(line))
+            elif ratio < 1 - tolerance:
+                self.stdout.write(self.style.SUCCESS(line))
+            else:
+                self.stdout.write(line)
+        return regressions
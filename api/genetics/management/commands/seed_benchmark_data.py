@@ -0,0 +1,80 @@
+import random
+
+from django.core.management.base import BaseCommand, CommandError
+from django.db import transaction
+
+from dict.models import Word
+from genetics import cache
+from genetics.models import (
+    BlogPost, City, Clan, Country, Ethnicity, GeneticSample, HistoricalPeriod,
+    MTDNATree, Province, Tag, Tribe, YDNATree,
+)
+from genetics.seed import seed_dataset
+
+
+SYLLABLES = (
+    'a', 'ba', 'çə', 'da', 'el', 'gö', 'xan', 'ıl', 'qa', 'lar', 'mə', 'nü',
+    'ol', 'sa', 'şə', 'ta', 'ür', 'va', 'yol', 'zə', 'ğı', 'kö', 'ün', 'dir',
+)
+
+
+def make_words(count, rng):
+    """Return `count` distinct pseudo-Azerbaijani words"""
+    words = set()
+    while len(words) < count:
+        words.add(''.join(rng.choice(SYLLABLES) for _ in range(rng.randint(2, 5))))
+    return sorted(words)
+
+
+class Command(BaseCommand):
+    help = 'Fill the database with a synthetic dataset of configurable size for benchmarking'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--samples', type=int, default=10000, help='Number of genetic samples (default: 10000)')
+        parser.add_argument('--tree-depth', type=int, default=6, help='Levels below each haplogroup root (default: 6)')
+        parser.add_argument('--fan-out', type=int, default=3, help='Subclades per haplogroup (default: 3)')
+        parser.add_argument('--provinces', type=int, default=31, help='Number of provinces (default: 31)')
+        parser.add_argument('--vertices', type=int, default=400, help='Vertices per province polygon (default: 400)')
+        parser.add_argument('--words', type=int, default=10000, help='Number of dictionary words (default: 10000)')
+        parser.add_argument('--seed', type=int, default=0, help='Random seed (default: 0)')
+        parser.add_argument(
+            '--flush',
+            action='store_true',
+            help='Delete all existing genetics and dictionary data first (required if the database is not empty)'
+        )
+
+    def handle(self, *args, **options):
+        models = (
+            GeneticSample, Clan, Tribe, Ethnicity, City, Province, Country,
+            HistoricalPeriod, YDNATree, MTDNATree, Tag, BlogPost, Word,
+        )
+
+        with transaction.atomic():
+            if options['flush']:
+                for model in models:
+                    model.objects.all().delete()
+            elif any(model.objects.exists() for model in models):
+                raise CommandError('The database already holds data; run with --flush to replace it')
+
+            data = seed_dataset(
+                samples=options['samples'],
+                tree_depth=options['tree_depth'],
+                fan_out=options['fan_out'],
+                provinces=options['provinces'],
+                vertices=options['vertices'],
+                seed=options['seed'],
+            )
+            words = Word.objects.bulk_create(
+                [Word(word=word, english_translation=f'translation of {word}')
+                 for word in make_words(options['words'], random.Random(options['seed']))],
+                batch_size=1000,
+            )
+
+        # Bulk inserts send no signals: drop cached results of the previous data
+        cache.invalidate(cache.SAMPLES, cache.HAPLOGROUPS, cache.REFERENCE, cache.BLOG)
+
+        self.stdout.write(self.style.SUCCESS(
+            f"Created {len(data['samples'])} samples, {len(data['y_dna'])} Y-DNA and "
+            f"{len(data['mt_dna'])} mtDNA haplogroups, {len(data['provinces'])} provinces "
+            f"and {len(words)} words"
+        ))
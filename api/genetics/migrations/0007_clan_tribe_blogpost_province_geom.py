@@ -0,0 +1,139 @@
+# Generated by Django 5.2.7 on 2026-10-19 11:34
+#
+# Clan, Tribe, BlogPost and the province code and boundary were added to
+# the models without a migration, so some databases already have their
+# tables and columns (created by hand or with syncdb) and others do not.
+# The migration records them in the migration state and only creates
+# what the database is missing; existing tables are left as they are.
+
+import django.contrib.gis.db.models.fields
+import django.db.models.deletion
+from django.db import migrations, models
+
+
+# Tables the migration creates, and columns it adds to existing tables
+NEW_MODELS = ('Tribe', 'Clan', 'BlogPost')
+NEW_FIELDS = {'Province': ('code', 'geom'), 'GeneticSample': ('tribe', 'clan')}
+
+
+def create_missing_schema(apps, schema_editor):
+    introspection = schema_editor.connection.introspection
+    with schema_editor.connection.cursor() as cursor:
+        tables = set(introspection.table_names(cursor))
+        for name in NEW_MODELS:
+            model = apps.get_model('genetics', name)
+            if model._meta.db_table not in tables:
+                schema_editor.create_model(model)
+                continue
+            for field in model._meta.local_many_to_many:
+                if field.remote_field.through._meta.db_table not in tables:
+                    schema_editor.create_model(field.remote_field.through)
+
+        for name, field_names in NEW_FIELDS.items():
+            model = apps.get_model('genetics', name)
+            columns = {column.name for column in introspection.get_table_description(cursor, model._meta.db_table)}
+            for field_name in field_names:
+                field = model._meta.get_field(field_name)
+                if field.column not in columns:
+                    schema_editor.add_field(model, field)
+
+
+def drop_schema(apps, schema_editor):
+    for name, field_names in NEW_FIELDS.items():
+        model = apps.get_model('genetics', name)
+        for field_name in field_names:
+            schema_editor.remove_field(model, model._meta.get_field(field_name))
+    for name in reversed(NEW_MODELS):
+        schema_editor.delete_model(apps.get_model('genetics', name))
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('genetics', '0006_geneticsample_count_ethnicity_and_more'),
+    ]
+
+    operations = [
+        migrations.SeparateDatabaseAndState(state_operations=[
+            migrations.CreateModel(
+                name='Clan',
+                fields=[
+                    ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                    ('name', models.CharField(max_length=100)),
+                    ('common_ancestor', models.CharField(blank=True, help_text='Name of the legendary or historical common ancestor.', max_length=100)),
+                ],
+                options={
+                    'verbose_name': 'Clan',
+                    'verbose_name_plural': 'Clans',
+                },
+            ),
+            migrations.AddField(
+                model_name='province',
+                name='code',
+                field=models.CharField(blank=True, help_text='Province code (e.g., IR01, IR02)', max_length=10, null=True),
+            ),
+            migrations.AddField(
+                model_name='province',
+                name='geom',
+                field=django.contrib.gis.db.models.fields.MultiPolygonField(blank=True, help_text='Province boundary as GeoJSON (MultiPolygon)', null=True, srid=4326),
+            ),
+            migrations.CreateModel(
+                name='BlogPost',
+                fields=[
+                    ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                    ('title', models.CharField(db_index=True, max_length=200)),
+                    ('slug', models.SlugField(max_length=200, unique=True)),
+                    ('content', models.TextField(help_text='Blog post content in Markdown format')),
+                    ('excerpt', models.TextField(blank=True, help_text='Short summary of the blog post')),
+                    ('author', models.CharField(default='Admin', max_length=100)),
+                    ('status', models.CharField(choices=[('draft', 'Draft'), ('published', 'Published'), ('archived', 'Archived')], default='draft', max_length=20)),
+                    ('featured_image', models.URLField(blank=True, help_text='URL to featured image', null=True)),
+                    ('meta_description', models.CharField(blank=True, help_text='SEO meta description', max_length=160)),
+                    ('tags', models.CharField(blank=True, help_text='Comma-separated tags', max_length=200)),
+                    ('created_at', models.DateTimeField(auto_now_add=True)),
+                    ('updated_at', models.DateTimeField(auto_now=True)),
+                    ('published_at', models.DateTimeField(blank=True, null=True)),
+                    ('view_count', models.PositiveIntegerField(default=0)),
+                ],
+                options={
+                    'verbose_name': 'Blog Post',
+                    'verbose_name_plural': 'Blog Posts',
+                    'ordering': ['-created_at'],
+                    'indexes': [models.Index(fields=['-created_at'], name='genetics_bl_created_999d92_idx'), models.Index(fields=['status', '-published_at'], name='genetics_bl_status_d83aa2_idx')],
+                },
+            ),
+            migrations.AddField(
+                model_name='geneticsample',
+                name='clan',
+                field=models.ForeignKey(blank=True, help_text='The clan of the sampled individual.', null=True, on_delete=django.db.models.deletion.PROTECT, to='genetics.clan'),
+            ),
+            migrations.CreateModel(
+                name='Tribe',
+                fields=[
+                    ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                    ('name', models.CharField(max_length=100, unique=True)),
+                    ('historical_note', models.TextField(blank=True, help_text='A brief historical or cultural note about the tribe.')),
+                    ('ethnicities', models.ManyToManyField(blank=True, help_text='The ethnic groups this tribe belongs to.', related_name='tribes', to='genetics.ethnicity')),
+                ],
+                options={
+                    'verbose_name': 'Tribe',
+                    'verbose_name_plural': 'Tribes',
+                },
+            ),
+            migrations.AddField(
+                model_name='clan',
+                name='tribe',
+                field=models.ForeignKey(help_text='The tribe this clan belongs to.', on_delete=django.db.models.deletion.CASCADE, related_name='clans', to='genetics.tribe'),
+            ),
+            migrations.AddField(
+                model_name='geneticsample',
+                name='tribe',
+                field=models.ForeignKey(blank=True, help_text='The tribe of the sampled individual.', null=True, on_delete=django.db.models.deletion.PROTECT, to='genetics.tribe'),
+            ),
+            migrations.AlterUniqueTogether(
+                name='clan',
+                unique_together={('name', 'tribe')},
+            ),
+        ]),
+        migrations.RunPython(create_missing_schema, drop_schema),
+    ]
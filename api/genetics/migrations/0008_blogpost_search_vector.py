@@ -0,0 +1,35 @@
+# Generated by Django 5.2.7 on 2026-10-19 11:41
+
+import django.contrib.postgres.indexes
+import django.contrib.postgres.search
+from django.contrib.postgres.search import SearchVector
+from django.db import migrations
+
+
+def fill_search_vectors(apps, schema_editor):
+    BlogPost = apps.get_model('genetics', 'BlogPost')
+    BlogPost.objects.update(
+        search_vector=SearchVector('title', weight='A', config='english')
+        + SearchVector('excerpt', weight='B', config='english')
+        + SearchVector('content', weight='C', config='english')
+    )
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('genetics', '0007_clan_tribe_blogpost_province_geom'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='blogpost',
+            name='search_vector',
+            field=django.contrib.postgres.search.SearchVectorField(editable=False, null=True),
+        ),
+        migrations.AddIndex(
+            model_name='blogpost',
+            index=django.contrib.postgres.indexes.GinIndex(fields=['search_vector'], name='genetics_blogpost_search_idx'),
+        ),
+        migrations.RunPython(fill_search_vectors, migrations.RunPython.noop),
+    ]
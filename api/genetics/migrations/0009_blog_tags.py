@@ -0,0 +1,67 @@
+from django.db import migrations, models
+from django.utils.text import slugify
+
+
+def split_tags(apps, schema_editor):
+    """Create a Tag for every distinct comma-separated tag and link the posts to it"""
+    BlogPost = apps.get_model('genetics', 'BlogPost')
+    Tag = apps.get_model('genetics', 'Tag')
+
+    tags = {}
+    links = []
+    for post_id, tags_text in BlogPost.objects.values_list('id', 'tags_text'):
+        for name in (tags_text or '').split(','):
+            name = name.strip()[:50]
+            slug = slugify(name, allow_unicode=True)
+            if not slug:
+                continue
+            # Tags differing only in case or punctuation become one tag
+            if slug not in tags:
+                tags[slug] = Tag.objects.create(name=name, slug=slug)
+            links.append((post_id, tags[slug].id))
+
+    Through = BlogPost.tags.through
+    Through.objects.bulk_create(
+        [Through(blogpost_id=post_id, tag_id=tag_id) for post_id, tag_id in set(links)]
+    )
+
+
+def join_tags(apps, schema_editor):
+    BlogPost = apps.get_model('genetics', 'BlogPost')
+    for post in BlogPost.objects.prefetch_related('tags'):
+        post.tags_text = ', '.join(tag.name for tag in post.tags.all())[:200]
+        post.save(update_fields=['tags_text'])
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('genetics', '0008_blogpost_search_vector'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='Tag',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('name', models.CharField(max_length=50, unique=True)),
+                ('slug', models.SlugField(allow_unicode=True, max_length=60, unique=True)),
+            ],
+            options={
+                'verbose_name': 'Tag',
+                'verbose_name_plural': 'Tags',
+                'ordering': ['name'],
+            },
+        ),
+        migrations.RenameField(
+            model_name='blogpost',
+            old_name='tags',
+            new_name='tags_text',
+        ),
+        migrations.AddField(
+            model_name='blogpost',
+            name='tags',
+            field=models.ManyToManyField(blank=True, related_name='posts', to='genetics.tag'),
+        ),
+        migrations.RunPython(split_tags, join_tags),
+    ]
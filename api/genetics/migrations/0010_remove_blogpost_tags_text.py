@@ -0,0 +1,16 @@
+from django.db import migrations
+
+
+class Migration(migrations.Migration):
+    # Separate from 0009 so the column is dropped after the tag links are committed
+
+    dependencies = [
+        ('genetics', '0009_blog_tags'),
+    ]
+
+    operations = [
+        migrations.RemoveField(
+            model_name='blogpost',
+            name='tags_text',
+        ),
+    ]
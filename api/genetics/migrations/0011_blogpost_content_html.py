@@ -0,0 +1,89 @@
+# Generated by Django 5.2.7 on 2026-10-19 11:45
+
+import hashlib
+import html
+import math
+import re
+
+import markdown
+import nh3
+from django.db import migrations, models
+
+
+# The renderer of genetics.rendering at RENDERER_VERSION 1, frozen here so
+# later changes to it do not change what this migration writes. Posts
+# rendered here are re-rendered by `manage.py render_blog_posts` once the
+# renderer version is bumped.
+
+RENDERER_VERSION = 1
+
+ALLOWED_ATTRIBUTES = {
+    **nh3.ALLOWED_ATTRIBUTES,
+    'a': nh3.ALLOWED_ATTRIBUTES['a'] | {'title'},
+    'img': nh3.ALLOWED_ATTRIBUTES['img'] | {'title'},
+    'code': {'class'},
+}
+
+
+def derive(text):
+    text = (text or '').replace('\r\n', '\n').replace('\r', '\n')
+    rendered = nh3.clean(
+        markdown.markdown(text, extensions=['extra', 'sane_lists'], output_format='html'),
+        attributes=ALLOWED_ATTRIBUTES,
+        link_rel='noopener noreferrer',
+    )
+    plain = re.sub(r'\s+', ' ', html.unescape(nh3.clean(rendered, tags=set()))).strip()
+    excerpt = plain
+    if len(plain) > 200:
+        cut = plain[:201]
+        cut = cut.rsplit(' ', 1)[0] if ' ' in cut else plain[:200]
+        excerpt = cut.rstrip(' .,;:') + '…'
+    return {
+        'content': text,
+        'content_html': rendered,
+        'content_hash': hashlib.sha256(f'{RENDERER_VERSION}\n{text}'.encode('utf-8')).hexdigest(),
+        'derived_excerpt': excerpt,
+        'reading_time': max(1, math.ceil(len(plain.split()) / 200)),
+    }
+
+
+def render_posts(apps, schema_editor):
+    BlogPost = apps.get_model('genetics', 'BlogPost')
+    posts = list(BlogPost.objects.only('id', 'content'))
+    for post in posts:
+        for field, value in derive(post.content).items():
+            setattr(post, field, value)
+    BlogPost.objects.bulk_update(
+        posts, ['content', 'content_html', 'content_hash', 'derived_excerpt', 'reading_time'], batch_size=100
+    )
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('genetics', '0010_remove_blogpost_tags_text'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='blogpost',
+            name='content_hash',
+            field=models.CharField(blank=True, editable=False, max_length=64),
+        ),
+        migrations.AddField(
+            model_name='blogpost',
+            name='content_html',
+            field=models.TextField(blank=True, editable=False, help_text='Sanitized HTML rendered from content'),
+        ),
+        migrations.AddField(
+            model_name='blogpost',
+            name='derived_excerpt',
+            field=models.TextField(blank=True, editable=False, help_text='Start of the content, used when excerpt is empty'),
+        ),
+        migrations.AddField(
+            model_name='blogpost',
+            name='reading_time',
+            field=models.PositiveSmallIntegerField(default=1, editable=False, help_text='Minutes'),
+        ),
+        migrations.RunPython(render_posts, migrations.RunPython.noop),
+    ]
@@ -2,6 +2,12 @@
 from django.db import models
 from django.contrib.gis.db import models as gis_models
 from django.db.models import Q, UniqueConstraint
+from django.contrib.postgres.indexes import GinIndex
+from django.contrib.postgres.search import SearchVector, SearchVectorField
+from django.utils.text import slugify
+
+from . import rendering
+
 
 class Country(models.Model):
     name = models.CharField(max_length=100, unique=True)
@@ -219,6 +225,24 @@ class GeneticSample(models.Model):
         verbose_name_plural = "Genetic Samples"
 
 
+class Tag(models.Model):
+    name = models.CharField(max_length=50, unique=True)
+    slug = models.SlugField(max_length=60, unique=True, allow_unicode=True)
+
+    class Meta:
+        ordering = ['name']
+        verbose_name = "Tag"
+        verbose_name_plural = "Tags"
+
+    def __str__(self):
+        return self.name
+
+    def save(self, *args, **kwargs):
+        if not self.slug:
+            self.slug = slugify(self.name, allow_unicode=True)
+        super().save(*args, **kwargs)
+
+
 class BlogPost(models.Model):
     STATUS_CHOICES = [
         ('draft', 'Draft'),
@@ -236,7 +260,7 @@ class BlogPost(models.Model):
     
     # Metadata
     meta_description = models.CharField(max_length=160, blank=True, help_text="SEO meta description")
-    tags = models.CharField(max_length=200, blank=True, help_text="Comma-separated tags")
+    tags = models.ManyToManyField(Tag, related_name='posts', blank=True)
     
     # Timestamps
     created_at = models.DateTimeField(auto_now_add=True)
@@ -246,6 +270,18 @@ class BlogPost(models.Model):
     # Stats
     view_count = models.PositiveIntegerField(default=0)
     
+    # Derived from content on save (see rendering)
+    content_html = models.TextField(blank=True, editable=False, help_text="Sanitized HTML rendered from content")
+    content_hash = models.CharField(max_length=64, blank=True, editable=False)
+    derived_excerpt = models.TextField(blank=True, editable=False, help_text="Start of the content, used when excerpt is empty")
+    reading_time = models.PositiveSmallIntegerField(default=1, editable=False, help_text="Minutes")
+    
+    # Full-text search document, weighted title > excerpt > content; updated on save
+    search_vector = SearchVectorField(null=True, editable=False)
+    
+    # Text search configuration of the posts (stemming and stop words)
+    SEARCH_CONFIG = 'english'
+    
     class Meta:
         ordering = ['-created_at']
         verbose_name = "Blog Post"
@@ -253,7 +289,31 @@ class BlogPost(models.Model):
         indexes = [
             models.Index(fields=['-created_at']),
             models.Index(fields=['status', '-published_at']),
+            GinIndex(fields=['search_vector'], name='genetics_blogpost_search_idx'),
         ]
     
     def __str__(self):
-        return self.title
\ No newline at end of file
+        return self.title
+    
+    @classmethod
+    def search_vector_expression(cls):
+        return (
+            SearchVector('title', weight='A', config=cls.SEARCH_CONFIG)
+            + SearchVector('excerpt', weight='B', config=cls.SEARCH_CONFIG)
+            + SearchVector('content', weight='C', config=cls.SEARCH_CONFIG)
+        )
+    
+    def render_content(self):
+        """Render content into the derived fields unless it is unchanged; return whether it rendered"""
+        if rendering.content_hash(rendering.normalize(self.content)) == self.content_hash:
+            return False
+        for field, value in rendering.derive(self.content).items():
+            setattr(self, field, value)
+        return True
+    
+    def save(self, *args, **kwargs):
+        if self.render_content() and kwargs.get('update_fields') is not None:
+            kwargs['update_fields'] = {*kwargs['update_fields'], *rendering.DERIVED_FIELDS}
+        super().save(*args, **kwargs)
+        # Computed by PostgreSQL from the saved columns
+        BlogPost.objects.filter(pk=self.pk).update(search_vector=self.search_vector_expression())
\ No newline at end of file
@@ -0,0 +1,95 @@
+# rendering.py
+"""
+Server-side rendering of blog post Markdown.
+
+Posts are rendered once when saved (BlogPost.render_content) and the
+sanitized HTML is stored next to the Markdown, so reads serve stored
+text. RENDERER_VERSION is part of the content hash: bump it when the
+Markdown extensions or the sanitizer rules change and the next
+`manage.py render_blog_posts` re-renders every post.
+"""
+import hashlib
+import html
+import math
+import re
+
+import markdown
+import nh3
+
+
+RENDERER_VERSION = 1
+
+MARKDOWN_EXTENSIONS = ['extra', 'sane_lists']
+
+# nh3's defaults, plus the attributes the Markdown output relies on
+ALLOWED_ATTRIBUTES = {
+    **nh3.ALLOWED_ATTRIBUTES,
+    'a': nh3.ALLOWED_ATTRIBUTES['a'] | {'title'},
+    'img': nh3.ALLOWED_ATTRIBUTES['img'] | {'title'},
+    'code': {'class'},
+}
+
+EXCERPT_LENGTH = 200
+
+WORDS_PER_MINUTE = 200
+
+# Fields of BlogPost written by derive()
+DERIVED_FIELDS = ('content', 'content_html', 'content_hash', 'derived_excerpt', 'reading_time')
+
+
+def normalize(text):
+    """Markdown with \\n line endings"""
+    return (text or '').replace('\r\n', '\n').replace('\r', '\n')
+
+
+def content_hash(text):
+    """Hash of the Markdown and the renderer version that produced its HTML"""
+    return hashlib.sha256(f'{RENDERER_VERSION}\n{text}'.encode('utf-8')).hexdigest()
+
+
+def render_markdown(text):
+    """Markdown to HTML, with scripts, event handlers and unsafe URLs removed"""
+    rendered = markdown.markdown(text, extensions=MARKDOWN_EXTENSIONS, output_format='html')
+    return nh3.clean(rendered, attributes=ALLOWED_ATTRIBUTES, link_rel='noopener noreferrer')
+
+
+def plain_text(rendered):
+    """Text of rendered HTML, with whitespace collapsed"""
+    text = html.unescape(nh3.clean(rendered, tags=set()))
+    return re.sub(r'\s+', ' ', text).strip()
+
+
+def clean_headline(headline):
+    """
+    A search headline of the Markdown as safe HTML: raw HTML of the post is
+    removed, and only the <mark> tags of the highlights are kept
+    """
+    return nh3.clean(headline or '', tags={'mark'}, attributes={})
+
+
+def make_excerpt(text, length=EXCERPT_LENGTH):
+    """The first `length` characters of plain text, cut at a word boundary"""
+    if len(text) <= length:
+        return text
+    cut = text[:length + 1]
+    cut = cut.rsplit(' ', 1)[0] if ' ' in cut else text[:length]
+    return cut.rstrip(' .,;:') + '…'
+
+
+def reading_time(text):
+    """Minutes to read plain text, at least one"""
+    return max(1, math.ceil(len(text.split()) / WORDS_PER_MINUTE))
+
+
+def derive(text):
+    """The fields BlogPost stores for its Markdown content"""
+    text = normalize(text)
+    rendered = render_markdown(text)
+    plain = plain_text(rendered)
+    return {
+        'content': text,
+        'content_html': rendered,
+        'content_hash': content_hash(text),
+        'derived_excerpt': make_excerpt(plain),
+        'reading_time': reading_time(plain),
+    }
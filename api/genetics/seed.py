@@ -0,0 +1,170 @@
+# seed.py
+"""
+Synthetic genetics data for tests and benchmarks.
+
+seed_dataset() fills the database with a realistic shape of data: deep
+haplogroup trees, provinces with detailed boundary polygons, the
+ethnicity / tribe / clan hierarchy, historical periods, thousands of
+samples and published blog posts. Everything is created with bulk
+queries and a seeded random generator, so runs are reproducible.
+"""
+import math
+import random
+from datetime import timedelta
+
+from django.contrib.gis.geos import MultiPolygon, Polygon
+from django.utils import timezone
+
+from .models import (
+    BlogPost, City, Clan, Country, Ethnicity, GeneticSample, HistoricalPeriod,
+    MTDNATree, Province, Tag, Tribe, YDNATree,
+)
+
+
+Y_DNA_ROOTS = ('R', 'J', 'G', 'E', 'Q')
+MT_DNA_ROOTS = ('H', 'U', 'J', 'T', 'K')
+
+PERIODS = (
+    ('Bronze Age', -3300, -1200),
+    ('Iron Age', -1200, -550),
+    ('Achaemenid', -550, -330),
+    ('Sasanian', 224, 651),
+    ('Seljuk', 1037, 1194),
+    ('Safavid', 1501, 1736),
+    ('Modern', 1900, 2025),
+)
+
+
+def build_tree(model, roots, depth, fan_out):
+    """
+    Create a haplogroup tree: every root gets `fan_out` children per level,
+    down to `depth` levels below the root (R, R-1, R-1-2, ...). One INSERT
+    per level. Returns the created nodes.
+    """
+    level = model.objects.bulk_create([model(name=name) for name in roots])
+    nodes = list(level)
+    for _ in range(depth):
+        level = model.objects.bulk_create([
+            model(name=f'{parent.name}-{i}', parent=parent)
+            for parent in level
+            for i in range(1, fan_out + 1)
+        ])
+        nodes.extend(level)
+    return nodes
+
+
+def province_polygon(lon, lat, radius, vertices, rng):
+    """A star-shaped MultiPolygon around (lon, lat) with `vertices` points"""
+    ring = []
+    for i in range(vertices):
+        angle = 2 * math.pi * i / vertices
+        r = radius * rng.uniform(0.7, 1.0)
+        ring.append((lon + r * math.cos(angle), lat + r * math.sin(angle)))
+    ring.append(ring[0])
+    return MultiPolygon(Polygon(ring), srid=4326)
+
+
+def seed_dataset(samples=2000, tree_depth=6, fan_out=3, provinces=31, vertices=400,
+                 blog_posts=30, seed=0):
+    """Fill the database with synthetic data and return the created objects by kind"""
+    rng = random.Random(seed)
+
+    y_dna = build_tree(YDNATree, Y_DNA_ROOTS, tree_depth, fan_out)
+    mt_dna = build_tree(MTDNATree, MT_DNA_ROOTS, max(tree_depth - 2, 1), fan_out)
+
+    countries = Country.objects.bulk_create([Country(name='Iran'), Country(name='Azerbaijan')])
+    province_objects = Province.objects.bulk_create([
+        Province(
+            name=f'Province {number:02d}',
+            code=f'IR{number:02d}',
+            country=countries[number % len(countries)],
+            geom=province_polygon(
+                44 + (number % 8) * 2.5, 26 + (number // 8) * 3, 1.2, vertices, rng
+            ),
+        )
+        for number in range(1, provinces + 1)
+    ])
+    cities = City.objects.bulk_create([
+        City(name=f'City {province.code}-{i}', province=province)
+        for province in province_objects
+        for i in range(1, 4)
+    ])
+
+    ethnicities = Ethnicity.objects.bulk_create([
+        Ethnicity(name=name) for name in ('Azerbaijani', 'Persian', 'Kurd', 'Lur', 'Turkmen', 'Baloch')
+    ])
+    Ethnicity.provinces.through.objects.bulk_create([
+        Ethnicity.provinces.through(ethnicity=ethnicity, province=province)
+        for ethnicity in ethnicities
+        for province in rng.sample(province_objects, min(5, len(province_objects)))
+    ])
+
+    tribes = Tribe.objects.bulk_create([Tribe(name=f'Tribe {i}') for i in range(1, 13)])
+    Tribe.ethnicities.through.objects.bulk_create([
+        Tribe.ethnicities.through(tribe=tribe, ethnicity=ethnicity)
+        for tribe in tribes
+        for ethnicity in rng.sample(ethnicities, 2)
+    ])
+    clans = Clan.objects.bulk_create([
+        Clan(name=f'Clan {i}', tribe=tribe) for tribe in tribes for i in range(1, 4)
+    ])
+
+    periods = HistoricalPeriod.objects.bulk_create([
+        HistoricalPeriod(name=name, start_year=start, end_year=end) for name, start, end in PERIODS
+    ])
+
+    sample_objects = []
+    for i in range(samples):
+        city = rng.choice(cities)
+        clan = rng.choice(clans) if rng.random() < 0.6 else None
+        sample_objects.append(GeneticSample(
+            name=f'Sample {i:06d}',
+            country=city.province.country,
+            province=city.province,
+            city=city,
+            ethnicity=rng.choice(ethnicities),
+            tribe=clan.tribe if clan else None,
+            clan=clan,
+            y_dna=rng.choice(y_dna) if rng.random() < 0.9 else None,
+            mt_dna=rng.choice(mt_dna) if rng.random() < 0.8 else None,
+            historical_period=rng.choice(periods),
+            count=rng.randint(1, 5),
+        ))
+    sample_objects = GeneticSample.objects.bulk_create(sample_objects, batch_size=1000)
+
+    now = timezone.now()
+    posts = [
+        BlogPost(
+            title=f'Post {i}',
+            slug=f'post-{i}',
+            content=f'# Post {i}\n\n' + 'Lorem ipsum dolor sit amet. ' * 100,
+            status='published',
+            published_at=now - timedelta(days=i),
+        )
+        for i in range(1, blog_posts + 1)
+    ]
+    for post in posts:
+        post.render_content()
+    posts = BlogPost.objects.bulk_create(posts)
+    # bulk_create skips save(), which maintains the search vector
+    BlogPost.objects.filter(pk__in=[post.pk for post in posts]).update(
+        search_vector=BlogPost.search_vector_expression()
+    )
+    tags = Tag.objects.bulk_create([Tag(name=name, slug=name) for name in ('genetics', 'history')])
+    BlogPost.tags.through.objects.bulk_create([
+        BlogPost.tags.through(blogpost_id=post.pk, tag_id=tag.pk) for post in posts for tag in tags
+    ])
+
+    return {
+        'y_dna': y_dna,
+        'mt_dna': mt_dna,
+        'countries': countries,
+        'provinces': province_objects,
+        'cities': cities,
+        'ethnicities': ethnicities,
+        'tribes': tribes,
+        'clans': clans,
+        'periods': periods,
+        'samples': sample_objects,
+        'blog_posts': posts,
+    }
@@ -1,18 +1,27 @@
 # serializers.py
+import json
+
 from rest_framework import serializers
+
+from api.fieldsets import SparseFieldsetMixin
+from . import rendering
 from .models import (
     GeneticSample, HistoricalPeriod, Country, Province, City, 
-    Ethnicity, Tribe, Clan, YDNATree, BlogPost
+    Ethnicity, Tribe, Clan, YDNATree, BlogPost, Tag
 )
 
 
-class CountrySerializer(serializers.ModelSerializer):
+class CountrySerializer(SparseFieldsetMixin, serializers.ModelSerializer):
     class Meta:
         model = Country
         fields = ['name']
 
 
-class ProvinceSerializer(serializers.ModelSerializer):
+class ProvinceSerializer(SparseFieldsetMixin, serializers.ModelSerializer):
+    """
+    Reads the `centroid` and `geojson` annotations of geo.annotate_geometry.
+    With context['geometry'] == 'none' the geometry field is left out.
+    """
     country = serializers.CharField(source='country.name')
     latitude = serializers.SerializerMethodField()
     longitude = serializers.SerializerMethodField()
@@ -21,30 +30,28 @@ class ProvinceSerializer(serializers.ModelSerializer):
     class Meta:
         model = Province
         fields = ['name', 'country', 'latitude', 'longitude', 'geometry']
+        field_dependencies = {'latitude': ['centroid'], 'longitude': ['centroid'], 'geometry': ['geojson']}
+    
+    def get_fields(self):
+        fields = super().get_fields()
+        if self.context.get('geometry') == 'none':
+            fields.pop('geometry', None)
+        return fields
     
     def get_latitude(self, obj):
-        """Extract latitude from geometry centroid"""
-        if obj.geom:
-            centroid = obj.geom.centroid
-            return float(centroid.y)
-        return None
+        """Latitude of the geometry centroid"""
+        return float(obj.centroid.y) if obj.centroid else None
     
     def get_longitude(self, obj):
-        """Extract longitude from geometry centroid"""
-        if obj.geom:
-            centroid = obj.geom.centroid
-            return float(centroid.x)
-        return None
+        """Longitude of the geometry centroid"""
+        return float(obj.centroid.x) if obj.centroid else None
     
     def get_geometry(self, obj):
         """Return GeoJSON geometry"""
-        if obj.geom:
-            import json
-            return json.loads(obj.geom.geojson)
-        return None
+        return json.loads(obj.geojson) if obj.geojson else None
 
 
-class CitySerializer(serializers.ModelSerializer):
+class CitySerializer(SparseFieldsetMixin, serializers.ModelSerializer):
     province = serializers.CharField(source='province.name')
     
     class Meta:
@@ -52,45 +59,48 @@ class CitySerializer(serializers.ModelSerializer):
         fields = ['name', 'province']
 
 
-class EthnicitySerializer(serializers.ModelSerializer):
+class EthnicitySerializer(SparseFieldsetMixin, serializers.ModelSerializer):
     class Meta:
         model = Ethnicity
         fields = ['name']
         
-class TribeSerializer(serializers.ModelSerializer):
+class TribeSerializer(SparseFieldsetMixin, serializers.ModelSerializer):
     ethnicities = serializers.SerializerMethodField()
 
     class Meta:
         model = Tribe
         fields = ['name', 'ethnicities', 'historical_note']
+        field_dependencies = {'ethnicities': ['ethnicities__name']}
     
     def get_ethnicities(self, obj):
         """Returns list of ethnicity names."""
         return [ethnicity.name for ethnicity in obj.ethnicities.all()]
 
 
-class ClanSerializer(serializers.ModelSerializer):
+class ClanSerializer(SparseFieldsetMixin, serializers.ModelSerializer):
     tribe = serializers.CharField(source='tribe.name')
     ethnicities = serializers.SerializerMethodField()
 
     class Meta:
         model = Clan
         fields = ['name', 'tribe', 'ethnicities', 'common_ancestor']
+        field_dependencies = {'ethnicities': ['tribe__ethnicities__name']}
     
     def get_ethnicities(self, obj):
         """Returns list of ethnicity names from the tribe."""
         return [ethnicity.name for ethnicity in obj.tribe.ethnicities.all()]
 
 
-class HistoricalPeriodSerializer(serializers.ModelSerializer):
+class HistoricalPeriodSerializer(SparseFieldsetMixin, serializers.ModelSerializer):
     display = serializers.CharField(source='__str__', read_only=True)
 
     class Meta:
         model = HistoricalPeriod
         fields = ('name', 'start_year', 'end_year', 'display')
+        field_dependencies = {'display': ['name', 'start_year', 'end_year']}
 
 
-class YDNATreeSerializer(serializers.ModelSerializer):
+class YDNATreeSerializer(SparseFieldsetMixin, serializers.ModelSerializer):
     children = serializers.SerializerMethodField()
     root_haplogroup = serializers.SerializerMethodField()
     
@@ -128,7 +138,29 @@ class HaplogroupHeatmapSerializer(serializers.Serializer):
     haplogroup = serializers.CharField(required=False, allow_null=True)
 
 
-class GeneticSampleSerializer(serializers.ModelSerializer):
+class HeatmapSeriesSerializer(serializers.Serializer):
+    name = serializers.CharField()
+    dna = serializers.CharField()
+
+
+class HeatmapLocationSerializer(serializers.Serializer):
+    """Province with one sample count per requested haplogroup series"""
+    province = serializers.CharField()
+    country = serializers.CharField()
+    latitude = serializers.DecimalField(max_digits=9, decimal_places=6)
+    longitude = serializers.DecimalField(max_digits=9, decimal_places=6)
+    geometry = serializers.JSONField()
+    sample_count = serializers.IntegerField()
+    counts = serializers.ListField(child=serializers.IntegerField())
+
+
+class HaplogroupMultiHeatmapSerializer(serializers.Serializer):
+    """Serializer for multi-haplogroup heatmaps: series listed once, geometry sent once per province"""
+    series = HeatmapSeriesSerializer(many=True)
+    locations = HeatmapLocationSerializer(many=True)
+
+
+class GeneticSampleSerializer(SparseFieldsetMixin, serializers.ModelSerializer):
     country = serializers.CharField(source='country.name', allow_null=True)
     province = serializers.CharField(source='province.name', allow_null=True)
     city = serializers.CharField(source='city.name', allow_null=True)
@@ -156,22 +188,38 @@ class GeneticSampleSerializer(serializers.ModelSerializer):
             'count',
             'coordinates',
         )
+        field_dependencies = {
+            'coordinates': ['province_centroid'],
+            'y_dna': ['y_dna__name', 'y_dna__parent'],
+            'mt_dna': ['mt_dna__name', 'mt_dna__parent'],
+        }
     
     def get_coordinates(self, obj):
-        """Return coordinates from province geometry centroid if available"""
-        if obj.province and obj.province.geom:
-            centroid = obj.province.geom.centroid
+        """Coordinates of the province centroid, annotated as `province_centroid`"""
+        centroid = obj.province_centroid
+        if centroid:
             return {
                 'latitude': float(centroid.y),
                 'longitude': float(centroid.x)
             }
         return None
 
+    def get_root_haplogroup(self, node, dna_field):
+        """
+        Look up the root in the HaplogroupIndex passed as
+        context['haplogroup_indexes'][dna_field] when available, which avoids
+        one query per ancestor.
+        """
+        index = self.context.get('haplogroup_indexes', {}).get(dna_field)
+        if index is not None and node.id in index.names:
+            return index.names[index.root(node.id)]
+        return node.get_root_haplogroup()
+
     def get_y_dna(self, obj):
         if obj.y_dna:
             return {
                 'name': obj.y_dna.name,
-                'root_haplogroup': obj.y_dna.get_root_haplogroup(),
+                'root_haplogroup': self.get_root_haplogroup(obj.y_dna, 'y_dna'),
             }
         return None
 
@@ -179,15 +227,33 @@ class GeneticSampleSerializer(serializers.ModelSerializer):
         if obj.mt_dna:
             return {
                 'name': obj.mt_dna.name,
-                'root_haplogroup': obj.mt_dna.get_root_haplogroup(),
+                'root_haplogroup': self.get_root_haplogroup(obj.mt_dna, 'mt_dna'),
             }
         return None
 
 
-class BlogPostSerializer(serializers.ModelSerializer):
-    """Serializer for blog posts - read-only"""
+class TagSerializer(SparseFieldsetMixin, serializers.ModelSerializer):
+    post_count = serializers.IntegerField(read_only=True)
+    
+    class Meta:
+        model = Tag
+        fields = ['name', 'slug', 'post_count']
+        field_dependencies = {'post_count': []}
+
+
+CONTENT_FORMATS = ('markdown', 'html')
+
+
+class BlogPostSerializer(SparseFieldsetMixin, serializers.ModelSerializer):
+    """
+    Serializer for blog posts - read-only. Prefetch `tags` when listing posts.
+    `content` is the Markdown, or the rendered HTML when the context's
+    `content_format` is 'html'.
+    """
+    tags = serializers.SerializerMethodField()
     tags_list = serializers.SerializerMethodField()
     content = serializers.SerializerMethodField()
+    excerpt = serializers.SerializerMethodField()
     
     class Meta:
         model = BlogPost
@@ -205,21 +271,43 @@ class BlogPostSerializer(serializers.ModelSerializer):
             'created_at',
             'updated_at',
             'published_at',
-            'view_count'
+            'view_count',
+            'reading_time'
         ]
+        field_dependencies = {
+            'content': ['content', 'content_html'],
+            'excerpt': ['excerpt', 'derived_excerpt'],
+            'tags': ['tags__name'],
+            'tags_list': ['tags__name'],
+        }
     
     def get_content(self, obj):
-        """
-        Return content with normalized line endings.
-        Ensures consistent \n line breaks for proper Markdown rendering.
-        """
-        if obj.content:
-            # Normalize line endings: convert \r\n to \n
-            return obj.content.replace('\r\n', '\n').replace('\r', '\n')
-        return ''
+        """Content as rendered on save; line endings are normalized then too"""
+        if self.context.get('content_format') == 'html':
+            return obj.content_html
+        return obj.content
+    
+    def get_excerpt(self, obj):
+        """The author's excerpt, or the start of the content"""
+        return obj.excerpt or obj.derived_excerpt
     
     def get_tags_list(self, obj):
-        """Convert comma-separated tags to list"""
-        if obj.tags:
-            return [tag.strip() for tag in obj.tags.split(',')]
-        return []
\ No newline at end of file
+        """Tag names, sorted"""
+        return sorted(tag.name for tag in obj.tags.all())
+    
+    def get_tags(self, obj):
+        """Comma-separated tag names, as the field used to be stored"""
+        return ', '.join(self.get_tags_list(obj))
+
+class BlogPostSearchSerializer(BlogPostSerializer):
+    """Blog post search result with its relevance and a highlighted snippet"""
+    rank = serializers.FloatField(read_only=True)
+    headline = serializers.SerializerMethodField()
+    
+    class Meta(BlogPostSerializer.Meta):
+        fields = BlogPostSerializer.Meta.fields + ['rank', 'headline']
+        field_dependencies = {**BlogPostSerializer.Meta.field_dependencies, 'rank': [], 'headline': []}
+    
+    def get_headline(self, obj):
+        """Highlighted snippet of the content, as sanitized HTML"""
+        return rendering.clean_headline(obj.headline)
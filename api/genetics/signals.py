@@ -0,0 +1,51 @@
+# signals.py
+from django.db.models.signals import m2m_changed, post_delete, post_save
+from django.dispatch import receiver
+
+from . import cache, viewcounts
+from .models import (
+    BlogPost, City, Clan, Country, Ethnicity, GeneticSample, HistoricalPeriod,
+    MTDNATree, Province, Tag, Tribe, YDNATree
+)
+
+
+REFERENCE_MODELS = (Country, Province, City, Ethnicity, Tribe, Clan, HistoricalPeriod)
+HAPLOGROUP_MODELS = (YDNATree, MTDNATree)
+
+
+@receiver([post_save, post_delete], sender=GeneticSample)
+def invalidate_samples(sender, **kwargs):
+    cache.invalidate(cache.SAMPLES)
+
+
+@receiver([post_save, post_delete], sender=BlogPost)
+@receiver([post_save, post_delete], sender=Tag)
+def invalidate_blog(sender, **kwargs):
+    cache.invalidate(cache.BLOG)
+
+
+@receiver([post_save, post_delete], sender=BlogPost)
+def forget_view_count(sender, instance, **kwargs):
+    # The post is read from the database again, with its saved count
+    viewcounts.forget_view_count(instance.pk)
+
+
+@receiver(m2m_changed, sender=BlogPost.tags.through)
+def invalidate_blog_tags(sender, action, **kwargs):
+    if action.startswith('post_'):
+        cache.invalidate(cache.BLOG)
+
+
+@receiver([post_save, post_delete])
+def invalidate_reference_data(sender, **kwargs):
+    if sender in REFERENCE_MODELS:
+        cache.invalidate(cache.REFERENCE)
+    elif sender in HAPLOGROUP_MODELS:
+        cache.invalidate(cache.HAPLOGROUPS)
+
+
+@receiver(m2m_changed, sender=Ethnicity.provinces.through)
+@receiver(m2m_changed, sender=Tribe.ethnicities.through)
+def invalidate_reference_links(sender, action, **kwargs):
+    if action.startswith('post_'):
+        cache.invalidate(cache.REFERENCE)
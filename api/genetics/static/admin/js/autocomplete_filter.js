@@ -0,0 +1,14 @@
+// Reload the changelist when a value is picked in an autocomplete filter
+document.addEventListener('DOMContentLoaded', function() {
+    const $ = django.jQuery;
+
+    // select2 reports changes through jQuery events only
+    $('.autocomplete-filter select').on('change', function() {
+        const container = this.closest('.autocomplete-filter');
+        const params = new URLSearchParams(container.dataset.queryString);
+        if (this.value) {
+            params.set(container.dataset.lookup, this.value);
+        }
+        window.location.search = params.toString();
+    });
+});
@@ -1,3 +1,683 @@
-from django.test import TestCase
+import csv
+import gzip
+import io
+import os
+import tempfile
+from unittest import mock, skipUnless
 
-# Create your tests here.
+from django.contrib import admin
+from django.contrib.admin.helpers import ACTION_CHECKBOX_NAME
+from django.contrib.auth.models import Permission, User
+from django.core.cache import cache
+from django.db import connection
+from django.test import RequestFactory, SimpleTestCase, TestCase, override_settings
+from django.test.utils import CaptureQueriesContext
+from django.urls import reverse
+
+from . import bulk, export, rendering
+from . import cache as genetics_cache
+from .haplogroups import HaplogroupIndex
+from .models import BlogPost, City, Clan, Ethnicity, GeneticSample, Province, Tag, Tribe, YDNATree
+from .seed import seed_dataset
+from .views import BlogSearchPagination
+from .viewcounts import flush_view_counts
+
+
+@override_settings(
+    GENETICS_PARALLEL_QUERIES=False, DATABASE_REPLICAS=[], BLOG_VIEW_COUNT_FLUSH_INTERVAL=None
+)
+class QueryCountTests(TestCase):
+    """
+    Upper bounds on the SQL queries of every genetics endpoint, on a dataset
+    large enough for an N+1 query to blow well past them.
+    """
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.data = seed_dataset(samples=3000)
+
+    def setUp(self):
+        # Cached responses would hide the queries of the views
+        cache.clear()
+
+    def assertMaxQueries(self, max_queries, url_name, params=None, **kwargs):
+        url = reverse(url_name, kwargs=kwargs or None)
+        with CaptureQueriesContext(connection) as context:
+            response = self.client.get(url, params or {})
+        self.assertEqual(response.status_code, 200, response.content[:200])
+        self.assertLessEqual(
+            len(context),
+            max_queries,
+            f'{url} ran {len(context)} queries:\n'
+            + '\n'.join(query['sql'][:200] for query in context.captured_queries),
+        )
+        return response
+
+    def test_sample_list(self):
+        response = self.assertMaxQueries(3, 'sample-list')
+        self.assertEqual(len(response.json()), len(self.data['samples']))
+
+    def test_sample_list_filtered(self):
+        self.assertMaxQueries(3, 'sample-list', {
+            'country': 'Iran', 'haplogroup': 'R-1', 'mt_dna': 'H', 'tribe': 'Tribe 1',
+        })
+
+    def test_sample_list_sparse_fields(self):
+        response = self.assertMaxQueries(3, 'sample-list', {'fields': 'name,coordinates,y_dna'})
+        self.assertEqual(set(response.json()[0]), {'name', 'coordinates', 'y_dna'})
+        response = self.client.get(reverse('sample-list'), {'exclude': 'colour'})
+        self.assertEqual(response.status_code, 400)
+        self.assertIn('exclude', response.json())
+
+    def test_sample_facets(self):
+        self.assertMaxQueries(3, 'sample-facets', {'haplogroup': 'R', 'ethnicity': 'Kurd'})
+
+    def test_reference_lists(self):
+        self.assertMaxQueries(1, 'country-list')
+        self.assertMaxQueries(1, 'province-list')
+        self.assertMaxQueries(1, 'province-list', {'country': 'Iran'})
+        self.assertMaxQueries(1, 'province-list', {'bbox': '44,25,52,32', 'geometry': 'simplified'})
+        self.assertMaxQueries(1, 'city-list')
+        self.assertMaxQueries(1, 'ethnicity-list', {'country': 'Iran'})
+        self.assertMaxQueries(2, 'tribe-list')
+        self.assertMaxQueries(2, 'clan-list')
+        # Without the ethnicities there is nothing to prefetch
+        self.assertMaxQueries(1, 'tribe-list', {'fields': 'name'})
+        self.assertMaxQueries(1, 'clan-list', {'fields': 'name,tribe'})
+
+    def test_bootstrap(self):
+        self.assertMaxQueries(11, 'bootstrap')
+        # Served from the cache afterwards
+        self.assertMaxQueries(0, 'bootstrap')
+
+    def test_cached_province_list(self):
+        self.assertMaxQueries(1, 'province-list')
+        self.assertMaxQueries(0, 'province-list')
+
+    def test_haplogroup_count(self):
+        response = self.assertMaxQueries(2, 'haplogroup-count', {'name': 'R'})
+        self.assertEqual(response.json()['subclade_count'], 1092)
+
+    def test_haplogroup_tree(self):
+        response = self.assertMaxQueries(1, 'haplogroup-list')
+        self.assertEqual([root['name'] for root in response.json()], ['E', 'G', 'J', 'Q', 'R'])
+
+    def test_heatmap(self):
+        self.assertMaxQueries(2, 'haplogroup-heatmap')
+        self.assertMaxQueries(3, 'haplogroup-heatmap', {'haplogroup': 'R'})
+        self.assertMaxQueries(4, 'haplogroup-heatmap', {'haplogroup': 'R-1,J', 'mt_dna': 'H'})
+
+    def test_frequencies(self):
+        self.assertMaxQueries(2, 'haplogroup-frequencies', {'group_by': 'ethnicity', 'depth': 2})
+
+    def test_timeline(self):
+        self.assertMaxQueries(2, 'haplogroup-timeline')
+        self.assertMaxQueries(2, 'haplogroup-timeline', {'bin': 500, 'haplogroup': 'R,J-1'})
+
+    def test_population_distances(self):
+        self.assertMaxQueries(2, 'population-distances', {
+            'group_by': 'tribe', 'analysis': 'cluster,pca', 'metric': 'braycurtis',
+        })
+
+    def test_blog(self):
+        self.assertMaxQueries(3, 'blog-list')
+        self.assertMaxQueries(3, 'blog-list', {'tag': 'history', 'search': 'Lorem'})
+        self.assertMaxQueries(1, 'blog-tags')
+        response = self.assertMaxQueries(2, 'blog-list', {'fields': 'title,slug,excerpt'})
+        self.assertEqual(set(response.json()['results'][0]), {'title', 'slug', 'excerpt'})
+        response = self.assertMaxQueries(2, 'blog-detail', slug='post-1')
+        self.assertEqual(response.json()['view_count'], 1)
+        self.assertEqual(response.json()['tags_list'], ['genetics', 'history'])
+        response = self.assertMaxQueries(1, 'blog-detail', {'exclude': 'tags,tags_list,content'}, slug='post-1')
+        self.assertNotIn('content', response.json())
+        # The same visitor again, counted once
+        self.assertEqual(response.json()['view_count'], 1)
+        # The post is cached and the view is counted in the cache
+        self.assertMaxQueries(0, 'blog-detail', slug='post-1')
+
+
+class ProvinceListTests(TestCase):
+    """Map viewport filters and geometry detail of the province list"""
+
+    @classmethod
+    def setUpTestData(cls):
+        # Provinces 01-04 are stars of radius <= 1.2 around (46.5, 26), (49, 26), (51.5, 26), (54, 26)
+        seed_dataset(samples=0, tree_depth=1, fan_out=1, provinces=4, vertices=40, blog_posts=0)
+
+    def setUp(self):
+        cache.clear()
+
+    def get(self, **params):
+        response = self.client.get(reverse('province-list'), params)
+        self.assertEqual(response.status_code, 200, response.content[:200])
+        return response.json()
+
+    def test_bbox_and_within(self):
+        self.assertEqual([p['name'] for p in self.get(bbox='45,24,47.5,28')], ['Province 01'])
+        self.assertEqual(len(self.get(bbox='45,24,50,28')), 2)
+        self.assertEqual([p['name'] for p in self.get(within='45,24,48,28')], ['Province 01'])
+        self.assertEqual(self.get(within='46,24,48,28'), [])
+
+    def test_geometry_detail(self):
+        full = self.get()[0]
+        self.assertEqual(full['geometry']['type'], 'MultiPolygon')
+        self.assertAlmostEqual(full['longitude'], 46.5, delta=0.5)
+
+        none = self.get(geometry='none')[0]
+        self.assertNotIn('geometry', none)
+        self.assertEqual((none['latitude'], none['longitude']), (full['latitude'], full['longitude']))
+
+        simplified = self.get(geometry='simplified')[0]['geometry']
+        self.assertLessEqual(
+            len(simplified['coordinates'][0][0]), len(full['geometry']['coordinates'][0][0])
+        )
+
+    def test_invalid_parameters(self):
+        for params in ({'bbox': '1,2,3'}, {'within': '5,0,1,1'}, {'geometry': 'outline'}):
+            response = self.client.get(reverse('province-list'), params)
+            self.assertEqual(response.status_code, 400, params)
+            self.assertIn('error', response.json())
+
+
+class SampleExportTests(TestCase):
+    """The sample export is built once per data version and served from disk"""
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.data = seed_dataset(samples=50, tree_depth=3, fan_out=2, provinces=4, vertices=8, blog_posts=0)
+
+    def setUp(self):
+        cache.clear()
+        directory = tempfile.TemporaryDirectory()
+        self.addCleanup(directory.cleanup)
+        settings = override_settings(GENETICS_EXPORT_DIR=directory.name)
+        settings.enable()
+        self.addCleanup(settings.disable)
+
+    def download(self, **params):
+        response = self.client.get(reverse('sample-export'), params)
+        self.assertEqual(response.status_code, 200)
+        return b''.join(response.streaming_content)
+
+    def read_csv(self, body):
+        return list(csv.DictReader(io.StringIO(gzip.decompress(body).decode('utf-8'))))
+
+    def test_csv_export(self):
+        rows = self.read_csv(self.download())
+        self.assertEqual(len(rows), len(self.data['samples']))
+
+        sample = GeneticSample.objects.select_related('city', 'y_dna', 'historical_period').get(name=rows[0]['name'])
+        self.assertEqual(rows[0]['city'], sample.city.name)
+        self.assertEqual(rows[0]['period_start_year'], str(sample.historical_period.start_year))
+        if sample.y_dna:
+            path = HaplogroupIndex.load(YDNATree).path_names(sample.y_dna_id)
+            self.assertEqual(rows[0]['y_dna_path'], '/'.join(path))
+
+    def test_export_is_cached_until_samples_change(self):
+        first = self.download()
+        with CaptureQueriesContext(connection) as context:
+            response = self.client.get(reverse('sample-export'))
+            self.assertEqual(b''.join(response.streaming_content), first)
+        self.assertEqual(len(context), 0)
+
+        response = self.client.get(reverse('sample-export'), headers={'If-None-Match': response['ETag']})
+        self.assertEqual(response.status_code, 304)
+
+        GeneticSample.objects.filter(pk=self.data['samples'][0].pk).delete()
+        self.assertEqual(len(self.read_csv(self.download())), len(self.data['samples']) - 1)
+
+    def test_older_exports_are_removed_after_a_grace_period(self):
+        directory = export.export_dir()
+        recent, old = directory / 'samples-1.csv.gz', directory / 'samples-0.csv.gz'
+        directory.mkdir(parents=True, exist_ok=True)
+        for path in (recent, old):
+            path.write_bytes(b'')
+        os.utime(old, (0, 0))
+
+        response = self.client.get(reverse('sample-export'))
+        self.assertTrue(response['ETag'].startswith('W/"csv-'))
+        response.close()
+        self.assertTrue(recent.exists())
+        self.assertFalse(old.exists())
+
+    def test_invalid_format(self):
+        response = self.client.get(reverse('sample-export'), {'format': 'xlsx'})
+        self.assertEqual(response.status_code, 400)
+
+    @skipUnless(export.pyarrow, 'pyarrow is not installed')
+    def test_parquet_export(self):
+        import pyarrow.parquet
+
+        table = pyarrow.parquet.read_table(io.BytesIO(self.download(format='parquet')))
+        self.assertEqual(table.num_rows, len(self.data['samples']))
+        self.assertEqual(table.column_names, list(export.COLUMNS))
+
+
+@override_settings(
+    DATABASE_REPLICAS=[], BLOG_VIEW_COUNT_FLUSH_INTERVAL=None, BLOG_VIEW_COUNT_DEDUPE=None
+)
+class BlogViewCountTests(TestCase):
+    @classmethod
+    def setUpTestData(cls):
+        cls.post = BlogPost.objects.create(
+            title='Post', slug='post', content='Text', status='published', view_count=10
+        )
+
+    def setUp(self):
+        cache.clear()
+        self.url = reverse('blog-detail', kwargs={'slug': 'post'})
+
+    def test_views_are_buffered_until_flushed(self):
+        for expected in (11, 12, 13):
+            self.assertEqual(self.client.get(self.url).json()['view_count'], expected)
+        self.post.refresh_from_db()
+        self.assertEqual(self.post.view_count, 10)
+
+        self.assertEqual(flush_view_counts(), 3)
+        self.post.refresh_from_db()
+        self.assertEqual(self.post.view_count, 13)
+        self.assertEqual(self.client.get(self.url).json()['view_count'], 14)
+        self.assertEqual(flush_view_counts(), 1)
+
+    def test_flush_only_reads_viewed_posts_and_keeps_the_cache(self):
+        with self.assertNumQueries(0):
+            self.assertEqual(flush_view_counts(), 0)
+        version = genetics_cache.get_version(genetics_cache.BLOG)
+        self.client.get(self.url)
+        self.assertEqual(flush_view_counts(), 1)
+        self.assertEqual(genetics_cache.get_version(genetics_cache.BLOG), version)
+        # Served from the cached post, with the flushed count
+        with self.assertNumQueries(0):
+            self.assertEqual(self.client.get(self.url).json()['view_count'], 12)
+
+    @override_settings(BLOG_VIEW_COUNT_DEDUPE=60)
+    def test_repeated_views_of_a_visitor_count_once(self):
+        self.client.get(self.url)
+        self.client.get(self.url)
+        self.client.get(self.url, REMOTE_ADDR='10.0.0.2')
+        self.assertEqual(flush_view_counts(), 2)
+
+    def test_unpublished_posts_are_not_found(self):
+        BlogPost.objects.filter(pk=self.post.pk).update(status='draft')
+        self.assertEqual(self.client.get(self.url).status_code, 404)
+
+
+@override_settings(DATABASE_REPLICAS=[])
+class BlogSearchTests(TestCase):
+    @classmethod
+    def setUpTestData(cls):
+        BlogPost.objects.create(
+            title='Haplogroup R1a in the Caucasus', slug='r1a', status='published',
+            content='Samples from the Caucasus.',
+        )
+        BlogPost.objects.create(
+            title='Ancient migrations', slug='migrations', status='published',
+            content='Several samples belong to haplogroup R1a, others to J2.',
+        )
+        BlogPost.objects.create(
+            title='Haplogroup R1a draft', slug='draft', status='draft', content='Not published.',
+        )
+
+    def test_results_are_ranked_and_highlighted(self):
+        response = self.client.get(reverse('blog-list'), {'search': 'haplogroup'})
+        results = response.json()['results']
+        self.assertEqual([post['slug'] for post in results], ['r1a', 'migrations'])
+        self.assertGreater(results[0]['rank'], results[1]['rank'])
+        self.assertIn('<mark>haplogroup</mark>', results[1]['headline'])
+
+    def test_headlines_drop_raw_html_of_the_post(self):
+        BlogPost.objects.create(
+            title='Scripted', slug='scripted', status='published',
+            content='Haplogroup <script>alert(1)</script> <b onclick="x()">J2</b> samples.',
+        )
+        results = self.client.get(reverse('blog-list'), {'search': 'J2'}).json()['results']
+        headline = next(post['headline'] for post in results if post['slug'] == 'scripted')
+        self.assertIn('<mark>J2</mark>', headline)
+        self.assertNotIn('script', headline)
+        self.assertNotIn('onclick', headline)
+
+    def test_search_is_paginated_with_a_cursor(self):
+        data = self.client.get(reverse('blog-list'), {'search': 'haplogroup'}).json()
+        self.assertNotIn('count', data)
+        self.assertEqual(set(data), {'next', 'previous', 'results'})
+
+    def test_pages_of_tied_ranks_neither_repeat_nor_skip_posts(self):
+        for number in range(7):
+            BlogPost.objects.create(
+                title=f'Note {number}', slug=f'note-{number}', status='published',
+                content='Haplogroup J2 ' * (1 + number % 2),
+            )
+        expected = set(BlogPost.objects.filter(status='published').values_list('slug', flat=True))
+
+        slugs = []
+        url = f'{reverse("blog-list")}?search=haplogroup'
+        with mock.patch.object(BlogSearchPagination, 'page_size', 2):
+            while url:
+                data = self.client.get(url).json()
+                slugs += [post['slug'] for post in data['results']]
+                url = data['next']
+        self.assertEqual(len(slugs), len(set(slugs)))
+        self.assertEqual(set(slugs), expected)
+
+    def test_vector_follows_edits(self):
+        post = BlogPost.objects.get(slug='migrations')
+        post.title = 'Bronze Age migrations'
+        post.save()
+        response = self.client.get(reverse('blog-list'), {'search': 'bronze'})
+        self.assertEqual([p['slug'] for p in response.json()['results']], ['migrations'])
+
+
+@override_settings(DATABASE_REPLICAS=[])
+class BlogTagTests(TestCase):
+    @classmethod
+    def setUpTestData(cls):
+        art = Tag.objects.create(name='Art')
+        heart = Tag.objects.create(name='Heart disease')
+        cls.draft_tag = Tag.objects.create(name='Unused')
+        BlogPost.objects.create(title='Art', slug='art', status='published', content='.').tags.add(art)
+        BlogPost.objects.create(title='Heart', slug='heart', status='published', content='.').tags.add(heart, art)
+        BlogPost.objects.create(title='Draft', slug='draft', status='draft', content='.').tags.add(cls.draft_tag)
+
+    def setUp(self):
+        cache.clear()
+
+    def test_tag_filter_matches_whole_tags(self):
+        response = self.client.get(reverse('blog-list'), {'tag': 'heart disease'})
+        self.assertEqual([post['slug'] for post in response.json()['results']], ['heart'])
+        response = self.client.get(reverse('blog-list'), {'tag': 'art'})
+        self.assertEqual({post['slug'] for post in response.json()['results']}, {'art', 'heart'})
+
+    def test_tags_are_serialized_by_name(self):
+        post = self.client.get(reverse('blog-detail', kwargs={'slug': 'heart'})).json()
+        self.assertEqual(post['tags_list'], ['Art', 'Heart disease'])
+        self.assertEqual(post['tags'], 'Art, Heart disease')
+
+    def test_tag_counts_skip_unpublished_posts(self):
+        response = self.client.get(reverse('blog-tags'))
+        self.assertEqual(response.json(), [
+            {'name': 'Art', 'slug': 'art', 'post_count': 2},
+            {'name': 'Heart disease', 'slug': 'heart-disease', 'post_count': 1},
+        ])
+
+    def test_tag_counts_follow_tagging(self):
+        self.client.get(reverse('blog-tags'))
+        BlogPost.objects.get(slug='draft').tags.add(Tag.objects.get(slug='art'))
+        BlogPost.objects.filter(slug='draft').update(status='published')
+        BlogPost.objects.get(slug='art').tags.clear()
+        counts = {tag['slug']: tag['post_count'] for tag in self.client.get(reverse('blog-tags')).json()}
+        self.assertEqual(counts, {'art': 2, 'heart-disease': 1, 'unused': 1})
+
+
+class MarkdownRenderingTests(SimpleTestCase):
+    def test_search_headlines_only_keep_highlights(self):
+        headline = rendering.clean_headline(
+            '<script>alert(1)</script> <mark>R1a</mark> & <img src=x onerror="x()"> <a href="javascript:x">J2'
+        )
+        self.assertEqual(headline, ' <mark>R1a</mark> &amp;  J2')
+
+    def test_html_is_sanitized(self):
+        html = rendering.render_markdown(
+            '# Title\n\n<script>alert(1)</script> <b onclick="x()">bold</b> [link](javascript:alert(1))'
+        )
+        self.assertIn('<h1>Title</h1>', html)
+        self.assertIn('<b>bold</b>', html)
+        self.assertNotIn('script', html)
+        self.assertNotIn('onclick', html)
+        self.assertNotIn('javascript', html)
+
+    def test_derived_fields(self):
+        derived = rendering.derive('# Title\r\n\r\n' + 'word ' * 450)
+        self.assertNotIn('\r', derived['content'])
+        self.assertEqual(derived['reading_time'], 3)
+        self.assertTrue(derived['derived_excerpt'].startswith('Title word word'))
+        self.assertLessEqual(len(derived['derived_excerpt']), rendering.EXCERPT_LENGTH + 1)
+
+
+@override_settings(DATABASE_REPLICAS=[], BLOG_VIEW_COUNT_FLUSH_INTERVAL=None)
+class BlogContentFormatTests(TestCase):
+    @classmethod
+    def setUpTestData(cls):
+        cls.post = BlogPost.objects.create(
+            title='Post', slug='post', status='published', content='Some *emphasis*.\r\n\r\nMore.',
+        )
+
+    def setUp(self):
+        cache.clear()
+        self.url = reverse('blog-detail', kwargs={'slug': 'post'})
+
+    def test_content_is_rendered_on_save(self):
+        self.assertEqual(self.post.content, 'Some *emphasis*.\n\nMore.')
+        self.assertEqual(self.post.content_html, '<p>Some <em>emphasis</em>.</p>\n<p>More.</p>')
+        self.assertEqual(self.post.derived_excerpt, 'Some emphasis. More.')
+
+        content_hash = self.post.content_hash
+        self.post.title = 'Renamed'
+        self.assertFalse(self.post.render_content())
+        self.post.content = 'Other'
+        self.post.save(update_fields=['content'])
+        self.post.refresh_from_db()
+        self.assertNotEqual(self.post.content_hash, content_hash)
+        self.assertEqual(self.post.content_html, '<p>Other</p>')
+
+    def test_content_format(self):
+        self.assertEqual(self.client.get(self.url).json()['content'], 'Some *emphasis*.\n\nMore.')
+        html = self.client.get(self.url, {'content_format': 'html'}).json()
+        self.assertEqual(html['content'], self.post.content_html)
+        self.assertEqual(html['excerpt'], 'Some emphasis. More.')
+        self.assertEqual(html['reading_time'], 1)
+        listed = self.client.get(reverse('blog-list'), {'content_format': 'html'}).json()['results']
+        self.assertEqual(listed[0]['content'], self.post.content_html)
+
+    def test_unknown_content_format(self):
+        self.assertEqual(self.client.get(self.url, {'content_format': 'pdf'}).status_code, 400)
+        self.assertEqual(self.client.get(reverse('blog-list'), {'content_format': 'pdf'}).status_code, 400)
+
+
+@override_settings(DATABASE_REPLICAS=[])
+class AdminQueryCountTests(TestCase):
+    """
+    Admin changelists and autocomplete lookups run the same number of
+    queries whatever the number of rows, so a __str__ that follows a
+    relation cannot turn into one query per row.
+    """
+    CHANGELISTS = (
+        'country', 'province', 'city', 'ethnicity', 'tribe', 'clan', 'ydnatree', 'mtdnatree',
+        'historicalperiod', 'geneticsample', 'tag', 'blogpost',
+    )
+    AUTOCOMPLETES = (
+        ('geneticsample', 'city'),
+        ('geneticsample', 'ethnicity'),
+        ('geneticsample', 'tribe'),
+        ('geneticsample', 'clan'),
+        ('city', 'province'),
+        ('clan', 'tribe'),
+    )
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.data = seed_dataset(samples=40, tree_depth=2, fan_out=2, provinces=4, vertices=8, blog_posts=3)
+        cls.user = User.objects.create_superuser('admin', 'admin@example.com', 'password')
+
+    def setUp(self):
+        self.client.force_login(self.user)
+
+    def add_rows(self, count):
+        """Add `count` rows to every related table and samples pointing at them"""
+        country = self.data['countries'][0]
+        ethnicities = Ethnicity.objects.bulk_create([Ethnicity(name=f'Extra {i}') for i in range(count)])
+        provinces = Province.objects.bulk_create([
+            Province(name=f'Extra {i}', country=country) for i in range(count)
+        ])
+        cities = City.objects.bulk_create([City(name=f'Extra {i}', province=p) for i, p in enumerate(provinces)])
+        tribes = Tribe.objects.bulk_create([Tribe(name=f'Extra {i}') for i in range(count)])
+        Tribe.ethnicities.through.objects.bulk_create([
+            Tribe.ethnicities.through(tribe_id=tribe.pk, ethnicity_id=ethnicity.pk)
+            for tribe, ethnicity in zip(tribes, ethnicities)
+        ])
+        clans = Clan.objects.bulk_create([Clan(name=f'Extra {i}', tribe=t) for i, t in enumerate(tribes)])
+        GeneticSample.objects.bulk_create([
+            GeneticSample(
+                name=f'Extra {i}', country=country, province=city.province, city=city,
+                ethnicity=ethnicity, tribe=clan.tribe, clan=clan,
+                y_dna=self.data['y_dna'][i % len(self.data['y_dna'])],
+                mt_dna=self.data['mt_dna'][i % len(self.data['mt_dna'])],
+                historical_period=self.data['periods'][i % len(self.data['periods'])],
+            )
+            for i, (city, ethnicity, clan) in enumerate(zip(cities, ethnicities, clans))
+        ])
+
+    def count_queries(self, url, params=None):
+        with CaptureQueriesContext(connection) as context:
+            response = self.client.get(url, params or {})
+        self.assertEqual(response.status_code, 200, url)
+        return len(context)
+
+    def count_all(self):
+        counts = {}
+        for model in self.CHANGELISTS:
+            url = reverse(f'admin:genetics_{model}_changelist')
+            counts[url] = self.count_queries(url)
+        for model, field in self.AUTOCOMPLETES:
+            url = reverse('admin:autocomplete')
+            params = {'app_label': 'genetics', 'model_name': model, 'field_name': field}
+            counts[f'{url}?{model}.{field}'] = self.count_queries(url, params)
+        return counts
+
+    def test_query_counts_do_not_grow_with_rows(self):
+        before = self.count_all()
+        self.add_rows(30)
+        self.assertEqual(self.count_all(), before)
+
+    def test_large_tables_are_filtered_with_autocomplete(self):
+        url = reverse('admin:genetics_geneticsample_changelist')
+        response = self.client.get(url)
+        self.assertNotContains(response, 'y_dna__id__exact=')
+        self.assertNotContains(response, 'tribe__id__exact=')
+        self.assertContains(response, 'data-field-name="y_dna"')
+
+        tribe = self.data['tribes'][0]
+        response = self.client.get(url, {'tribe__id__exact': tribe.pk})
+        self.assertEqual(
+            response.context['cl'].result_count, GeneticSample.objects.filter(tribe=tribe).count()
+        )
+
+    def test_haplogroup_filter_includes_subclades(self):
+        root = YDNATree.objects.get(name='R')
+        subclades = HaplogroupIndex.load(YDNATree).descendant_ids(root.pk)
+        response = self.client.get(
+            reverse('admin:genetics_geneticsample_changelist'), {'y_dna__subtree': root.pk}
+        )
+        self.assertEqual(
+            response.context['cl'].result_count,
+            GeneticSample.objects.filter(y_dna__in=subclades).count(),
+        )
+        self.assertGreater(len(subclades), 1)
+
+
+@override_settings(
+    GENETICS_PARALLEL_QUERIES=False, DATABASE_REPLICAS=[], BLOG_VIEW_COUNT_FLUSH_INTERVAL=None
+)
+class AdminBulkActionTests(TestCase):
+    """
+    Bulk actions change any number of rows with the same queries and
+    invalidate each cache namespace once.
+    """
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.data = seed_dataset(samples=40, tree_depth=2, fan_out=2, provinces=4, vertices=8, blog_posts=0)
+        cls.user = User.objects.create_superuser('admin', 'admin@example.com', 'password')
+
+    def setUp(self):
+        cache.clear()
+        self.client.force_login(self.user)
+
+    def post_action(self, model, action, selected, query=None, **data):
+        url = reverse(f'admin:genetics_{model}_changelist')
+        if query:
+            url = f'{url}?{query}'
+        return self.client.post(url, {
+            'action': action, 'index': 0, ACTION_CHECKBOX_NAME: [obj.pk for obj in selected], **data,
+        })
+
+    def test_deferred_invalidation_invalidates_once(self):
+        before = genetics_cache.get_version(genetics_cache.SAMPLES)
+        with genetics_cache.deferred_invalidation():
+            genetics_cache.invalidate(genetics_cache.SAMPLES)
+            genetics_cache.invalidate(genetics_cache.SAMPLES)
+            self.assertEqual(genetics_cache.get_version(genetics_cache.SAMPLES), before)
+        self.assertEqual(genetics_cache.get_version(genetics_cache.SAMPLES), before + 1)
+
+    def test_reassign_runs_fixed_queries(self):
+        province, tribe = self.data['provinces'][1], self.data['tribes'][1]
+        samples = self.data['samples']
+        counts = []
+        for selected in (samples[:2], samples[2:]):
+            queryset = GeneticSample.objects.filter(pk__in=[sample.pk for sample in selected])
+            with CaptureQueriesContext(connection) as context:
+                updated = bulk.reassign_samples(queryset, province=province, tribe=tribe)
+            self.assertEqual(updated, len(selected))
+            counts.append(len(context))
+        self.assertEqual(counts[0], counts[1])
+
+        for sample in GeneticSample.objects.select_related('city', 'clan'):
+            self.assertEqual((sample.province_id, sample.country_id), (province.pk, province.country_id))
+            self.assertIn(sample.city and sample.city.province_id, (None, province.pk))
+            self.assertIn(sample.clan and sample.clan.tribe_id, (None, tribe.pk))
+
+    def test_reassign_action_applies_to_filtered_selection(self):
+        tribe, ethnicity = self.data['tribes'][0], self.data['ethnicities'][-1]
+        sample = GeneticSample.objects.filter(tribe=tribe).first()
+        response = self.post_action('geneticsample', 'reassign_selected', [sample])
+        self.assertContains(response, 'name="apply"')
+
+        version = genetics_cache.get_version(genetics_cache.SAMPLES)
+        response = self.post_action(
+            'geneticsample', 'reassign_selected', [sample], query=f'tribe__id__exact={tribe.pk}',
+            select_across=1, apply=1, ethnicity=ethnicity.pk,
+        )
+        self.assertEqual(response.status_code, 302)
+        self.assertEqual(genetics_cache.get_version(genetics_cache.SAMPLES), version + 1)
+        self.assertFalse(GeneticSample.objects.filter(tribe=tribe).exclude(ethnicity=ethnicity).exists())
+        self.assertTrue(GeneticSample.objects.exclude(tribe=tribe).exclude(ethnicity=ethnicity).exists())
+
+    def test_merge_ethnicities(self):
+        target, other = self.data['ethnicities'][:2]
+        moved = set(GeneticSample.objects.filter(ethnicity=other).values_list('pk', flat=True))
+        tribes = set(other.tribes.values_list('pk', flat=True)) | set(target.tribes.values_list('pk', flat=True))
+
+        response = self.post_action('ethnicity', 'merge_selected', [target, other], apply=1, target=target.pk)
+        self.assertEqual(response.status_code, 302)
+        self.assertFalse(Ethnicity.objects.filter(pk=other.pk).exists())
+        self.assertTrue(moved <= set(GeneticSample.objects.filter(ethnicity=target).values_list('pk', flat=True)))
+        self.assertEqual(set(target.tribes.values_list('pk', flat=True)), tribes)
+
+    def test_merge_needs_change_and_delete_permissions(self):
+        user = User.objects.create_user('editor', is_staff=True)
+        user.user_permissions.add(*Permission.objects.filter(codename__in=['view_tribe', 'delete_tribe']))
+        request = RequestFactory().get('/')
+        request.user = User.objects.get(pk=user.pk)
+        model_admin = admin.site.get_model_admin(Tribe)
+        self.assertNotIn('merge_selected', model_admin.get_actions(request))
+
+        user.user_permissions.add(Permission.objects.get(codename='change_tribe'))
+        request.user = User.objects.get(pk=user.pk)
+        self.assertIn('merge_selected', model_admin.get_actions(request))
+
+    def test_merge_tribes_folds_clans_with_the_same_name(self):
+        target = Tribe.objects.create(name='Target')
+        other = Tribe.objects.create(name='Duplicate')
+        kept = Clan.objects.create(name='Shared', tribe=target)
+        shared = Clan.objects.create(name='Shared', tribe=other)
+        unique = Clan.objects.create(name='Unique', tribe=other)
+        sample = GeneticSample.objects.create(name='Merged sample', tribe=other, clan=shared)
+
+        version = genetics_cache.get_version(genetics_cache.REFERENCE)
+        self.assertEqual(bulk.merge_tribes(target, [other]), 1)
+        self.assertEqual(genetics_cache.get_version(genetics_cache.REFERENCE), version + 1)
+
+        sample.refresh_from_db()
+        self.assertEqual((sample.tribe_id, sample.clan_id), (target.pk, kept.pk))
+        self.assertFalse(Clan.objects.filter(pk=shared.pk).exists())
+        self.assertEqual(Clan.objects.get(pk=unique.pk).tribe_id, target.pk)
+        self.assertFalse(Tribe.objects.filter(pk=other.pk).exists())
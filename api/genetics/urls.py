@@ -4,17 +4,24 @@ from . import views
 
 urlpatterns = [
     path('samples/', views.SampleListView.as_view(), name='sample-list'),
+    path('samples/facets/', views.SampleFacetView.as_view(), name='sample-facets'),
+    path('samples/export/', views.SampleExportView.as_view(), name='sample-export'),
     path('countries/', views.CountryListView.as_view(), name='country-list'),
     path('provinces/', views.ProvinceListView.as_view(), name='province-list'),
     path('cities/', views.CityListView.as_view(), name='city-list'),
     path('ethnicities/', views.EthnicityListView.as_view(), name='ethnicity-list'),
     path('tribes/', views.TribeListView.as_view(), name='tribe-list'),
     path('clans/', views.ClanListView.as_view(), name='clan-list'),
+    path('bootstrap/', views.BootstrapView.as_view(), name='bootstrap'),
     path('haplogroup/', views.HaplogroupCountView.as_view(), name='haplogroup-count'),
     path('haplogroup/all/', views.HaplogroupListView.as_view(), name='haplogroup-list'),
     path('haplogroup/heatmap/', views.HaplogroupHeatmapView.as_view(), name='haplogroup-heatmap'),
+    path('haplogroup/frequencies/', views.HaplogroupFrequencyView.as_view(), name='haplogroup-frequencies'),
+    path('haplogroup/timeline/', views.HaplogroupTimelineView.as_view(), name='haplogroup-timeline'),
+    path('populations/distances/', views.PopulationDistanceView.as_view(), name='population-distances'),
     
     # Blog endpoints - read-only
     path('blog/', views.BlogPostListView.as_view(), name='blog-list'),
+    path('blog/tags/', views.BlogTagListView.as_view(), name='blog-tags'),
     path('blog/<slug:slug>/', views.BlogPostDetailView.as_view(), name='blog-detail'),
 ]
\ No newline at end of file
@@ -0,0 +1,213 @@
+# viewcounts.py
+"""
+Buffered blog post view counts.
+
+Views are counted in the cache instead of with one UPDATE per page view,
+and the first view of a post since the last flush adds it to a set of
+posts with pending views. flush_view_counts() drains that set and moves
+the pending counts of its posts into BlogPost.view_count with a single
+UPDATE. It runs periodically from a background thread
+(BLOG_VIEW_COUNT_FLUSH_INTERVAL) or from `manage.py flush_view_counts`.
+The command needs a cache shared with the web workers (not LocMemCache).
+
+The flush does not invalidate the cached posts: it keeps the counts it
+wrote in the cache, and view_count() serves them over the count of a
+cached post.
+
+With BLOG_VIEW_COUNT_DEDUPE set, a visitor (IP address and user agent) is
+counted once per post within that many seconds.
+"""
+import hashlib
+import logging
+import threading
+import time
+from contextlib import contextmanager
+
+from django.conf import settings
+from django.core.cache import cache as django_cache
+from django.db import close_old_connections, transaction
+from django.db.models import Case, F, IntegerField, Value, When
+
+from .models import BlogPost
+
+
+logger = logging.getLogger(__name__)
+
+FLUSH_LOCK = 'genetics:views:flush-lock'
+
+# Ids of the posts with pending views, and the lock guarding the set:
+# the cache has no atomic set operations
+DIRTY_POSTS = 'genetics:views:dirty'
+DIRTY_LOCK = 'genetics:views:dirty-lock'
+DIRTY_LOCK_ATTEMPTS = 20
+
+_flusher = None
+_flusher_lock = threading.Lock()
+
+
+def _counter_key(post_id):
+    return f'genetics:views:{post_id}'
+
+
+def _listed_key(post_id):
+    return f'genetics:views:listed:{post_id}'
+
+
+def _flushed_key(post_id):
+    return f'genetics:views:flushed:{post_id}'
+
+
+def _visitor_key(request, post_id):
+    visitor = '|'.join((request.META.get('REMOTE_ADDR', ''), request.headers.get('User-Agent', '')))
+    return f'genetics:viewed:{post_id}:{hashlib.sha256(visitor.encode("utf-8")).hexdigest()}'
+
+
+def pending_views(post_id):
+    """Views of the post counted since the last flush"""
+    return django_cache.get(_counter_key(post_id)) or 0
+
+
+def view_count(post_id, cached_count, pending):
+    """
+    Current view count of a post: the count written by the last flush, or
+    `cached_count` (read from the database) before any, plus the pending views
+    """
+    return django_cache.get(_flushed_key(post_id), cached_count) + pending
+
+
+def forget_view_count(post_id):
+    """Drop the count written by the last flush, e.g. when the post is saved"""
+    django_cache.delete(_flushed_key(post_id))
+
+
+@contextmanager
+def _dirty_lock():
+    """Hold DIRTY_LOCK; yields False if it could not be taken"""
+    for _ in range(DIRTY_LOCK_ATTEMPTS):
+        if django_cache.add(DIRTY_LOCK, 1, timeout=5):
+            try:
+                yield True
+            finally:
+                django_cache.delete(DIRTY_LOCK)
+            return
+        time.sleep(0.005)
+    yield False
+
+
+def _mark_dirty(post_id):
+    """Add the post to DIRTY_POSTS, once until the next flush"""
+    listed = _listed_key(post_id)
+    if not django_cache.add(listed, 1, timeout=None):
+        return
+    with _dirty_lock() as locked:
+        if locked:
+            dirty = django_cache.get(DIRTY_POSTS) or set()
+            django_cache.set(DIRTY_POSTS, dirty | {post_id}, timeout=None)
+            return
+    # The next view of the post tries again
+    django_cache.delete(listed)
+
+
+def record_view(request, post_id):
+    """Count a view of the post and return the number of views pending a flush"""
+    interval = getattr(settings, 'BLOG_VIEW_COUNT_FLUSH_INTERVAL', 60)
+    if interval:
+        start_flusher(interval)
+
+    dedupe = getattr(settings, 'BLOG_VIEW_COUNT_DEDUPE', None)
+    if dedupe and not django_cache.add(_visitor_key(request, post_id), 1, timeout=dedupe):
+        return pending_views(post_id)
+
+    key = _counter_key(post_id)
+    django_cache.add(key, 0, timeout=None)
+    try:
+        pending = django_cache.incr(key)
+    except ValueError:
+        # The counter was evicted between add() and incr()
+        django_cache.set(key, 1, timeout=None)
+        pending = 1
+    _mark_dirty(post_id)
+    return pending
+
+
+def flush_view_counts():
+    """Add the pending view counts to the database; return the number of views flushed"""
+    # Only one flusher at a time, or concurrent flushers would apply the same counts twice
+    if not django_cache.add(FLUSH_LOCK, 1, timeout=300):
+        return 0
+
+    try:
+        with _dirty_lock() as locked:
+            if not locked:
+                return 0
+            post_ids = django_cache.get(DIRTY_POSTS) or set()
+            django_cache.delete(DIRTY_POSTS)
+        if not post_ids:
+            return 0
+
+        # Views from now on list their post again, for the next flush
+        django_cache.delete_many([_listed_key(post_id) for post_id in post_ids])
+        counters = django_cache.get_many([_counter_key(post_id) for post_id in post_ids])
+        pending = {
+            post_id: counters[_counter_key(post_id)]
+            for post_id in post_ids
+            if counters.get(_counter_key(post_id))
+        }
+        if not pending:
+            return 0
+
+        try:
+            with transaction.atomic():
+                BlogPost.objects.filter(pk__in=pending).update(
+                    view_count=F('view_count') + Case(
+                        *(When(pk=post_id, then=Value(count)) for post_id, count in pending.items()),
+                        default=Value(0),
+                        output_field=IntegerField(),
+                    )
+                )
+                flushed = dict(BlogPost.objects.filter(pk__in=pending).values_list('id', 'view_count'))
+        except BaseException:
+            for post_id in pending:
+                _mark_dirty(post_id)
+            raise
+
+        django_cache.set_many(
+            {_flushed_key(post_id): count for post_id, count in flushed.items()}, timeout=None
+        )
+        # Subtract what was written rather than resetting, keeping views counted meanwhile
+        for post_id, count in pending.items():
+            try:
+                django_cache.decr(_counter_key(post_id), count)
+            except ValueError:
+                pass
+
+        return sum(pending.values())
+    finally:
+        django_cache.delete(FLUSH_LOCK)
+
+
+def _flush_periodically(interval):
+    while True:
+        time.sleep(interval)
+        try:
+            flush_view_counts()
+        except Exception:
+            logger.exception('Flushing blog view counts failed')
+        finally:
+            close_old_connections()
+
+
+def start_flusher(interval):
+    """Start the background flush thread of this process, if not running yet"""
+    global _flusher
+    if _flusher is not None:
+        return
+    with _flusher_lock:
+        if _flusher is None:
+            _flusher = threading.Thread(
+                target=_flush_periodically,
+                args=(interval,),
+                name='blog-view-count-flusher',
+                daemon=True,
+            )
+            _flusher.start()
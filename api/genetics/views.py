@@ -1,15 +1,39 @@
 from rest_framework import generics, status
+from rest_framework.exceptions import ValidationError
+from rest_framework.pagination import CursorPagination
+from rest_framework.settings import api_settings
 from rest_framework.views import APIView
 from rest_framework.response import Response
-from django.db.models import Prefetch, Q, Sum, F
+from django.db.models import CharField, Count, FloatField, Prefetch, Q, Sum, F, Value
+from django.db.models.functions import Cast, Round
+from django.http import FileResponse, Http404, HttpResponseNotModified
+from django.views import View
+from django.utils.cache import patch_cache_control, patch_vary_headers
+from django.contrib.gis.db.models.functions import AsGeoJSON, Centroid
 from django.contrib.gis.geos import GEOSGeometry
+from django.contrib.postgres.search import SearchHeadline, SearchQuery, SearchRank
 from django.utils import timezone
+from django.utils.text import slugify
+from collections import defaultdict
+from functools import partial
 import json
+from api.fieldsets import SparseFieldsetViewMixin, parse_fieldset, project
+from api.instrumentation import TimedJSONRenderer, TimedJsonResponse
 from .models import (
     GeneticSample, Country, Province, City, Ethnicity, Tribe, Clan, 
-    YDNATree, BlogPost
+    YDNATree, MTDNATree, HistoricalPeriod, BlogPost, Tag
 )
+from . import cache, export, viewcounts
+from .aio import gather_queries, run_in_thread
+from .analytics import (
+    DISTANCE_METRICS, GROUP_FIELDS, frequency_matrix, leaf_order,
+    pairwise_distances, principal_components, timeline_matrix, upgma
+)
+from .cache import acached_response, cached_response, get_or_compute, make_key, precompressed_response
+from .geo import GEOMETRY_DETAILS, annotate_geometry, bounds_filters
+from .haplogroups import HAPLOGROUP_TREES, HaplogroupIndex
 from .serializers import (
+    CONTENT_FORMATS,
     GeneticSampleSerializer, 
     CountrySerializer, 
     ProvinceSerializer, 
@@ -17,18 +41,79 @@ from .serializers import (
     EthnicitySerializer,
     TribeSerializer,
     ClanSerializer,
-    YDNATreeSerializer,
+    HistoricalPeriodSerializer,
     HaplogroupCountSerializer,
     HaplogroupHeatmapSerializer,
-    BlogPostSerializer
+    HaplogroupMultiHeatmapSerializer,
+    BlogPostSerializer,
+    BlogPostSearchSerializer,
+    TagSerializer
 )
 
 
-class SampleListView(generics.ListAPIView):
-    serializer_class = GeneticSampleSerializer
-    pagination_class = None
+def filter_samples(queryset, params, indexes=None):
+    """
+    Apply the sample filters shared by the sample list and facet endpoints.
+    `params` is a QueryDict or plain dict of query parameters; `indexes` is an
+    optional dict used to reuse loaded haplogroup indexes across calls.
+    """
+    country = params.get('country')
+    province = params.get('province')
+    city = params.get('city')
+    ethnicity = params.get('ethnicity')
+    tribe = params.get('tribe') # Added
+    clan = params.get('clan') # Added
+    historical_period = params.get('historical_period')
 
-    def get_queryset(self):
+    # Cascade filtering: city > province > country
+    if city:
+        queryset = queryset.filter(city__name=city)
+    elif province:
+        queryset = queryset.filter(province__name=province)
+    elif country:
+        queryset = queryset.filter(country__name=country)
+
+    # Hierarchical filtering: clan > tribe
+    if clan:
+        queryset = queryset.filter(clan__name=clan)
+    elif tribe:
+        queryset = queryset.filter(tribe__name=tribe)
+    
+    if ethnicity:
+        queryset = queryset.filter(ethnicity__name=ethnicity)
+    
+    if historical_period:
+        queryset = queryset.filter(historical_period__name=historical_period)
+    
+    # Haplogroup filters include all subclades
+    for param, dna_field in (('haplogroup', 'y_dna'), ('mt_dna', 'mt_dna')):
+        name = params.get(param)
+        if name:
+            if indexes is None:
+                indexes = {}
+            if dna_field not in indexes:
+                indexes[dna_field] = HaplogroupIndex.load(HAPLOGROUP_TREES[dna_field])
+            index = indexes[dna_field]
+            node_id = index.get_id(name)
+            ids = index.descendant_ids(node_id) if node_id is not None else []
+            queryset = queryset.filter(**{f'{dna_field}__id__in': ids})
+        
+    return queryset
+
+
+class SampleListView(View):
+    """
+    Lists genetic samples, filtered with filter_samples().
+    
+    Async view: the haplogroup indexes used for subtree filters and root
+    haplogroups are loaded concurrently, then the samples are streamed
+    with the async ORM. Province centroids come from PostGIS, and the
+    response is serialized and encoded on a pool thread, off the event loop.
+    
+    A plain Django view rather than a DRF one: the response is always JSON,
+    without the browsable API.
+    """
+    async def get(self, request):
         queryset = GeneticSample.objects.select_related(
             'country',
             'province',
@@ -39,61 +124,216 @@ class SampleListView(generics.ListAPIView):
             'y_dna',
             'mt_dna',
             'historical_period'
-        ).all()
+        ).defer('province__geom').annotate(province_centroid=Centroid('province__geom'))
         
-        country = self.request.query_params.get('country')
-        province = self.request.query_params.get('province')
-        city = self.request.query_params.get('city')
-        ethnicity = self.request.query_params.get('ethnicity')
-        tribe = self.request.query_params.get('tribe') # Added
-        clan = self.request.query_params.get('clan') # Added
+        try:
+            queryset = project(queryset, GeneticSampleSerializer, request.GET)
+        except ValidationError as e:
+            return TimedJsonResponse(e.detail, status=400)
+        
+        y_dna_index, mt_dna_index = await gather_queries(
+            lambda: HaplogroupIndex.load(YDNATree),
+            lambda: HaplogroupIndex.load(MTDNATree),
+        )
+        indexes = {'y_dna': y_dna_index, 'mt_dna': mt_dna_index}
+        
+        samples = [sample async for sample in filter_samples(queryset, request.GET, indexes)]
+        serializer = GeneticSampleSerializer(
+            samples, many=True, context={'request': request, 'haplogroup_indexes': indexes}
+        )
+        return await run_in_thread(lambda: TimedJsonResponse(serializer.data, safe=False))
 
-        # Cascade filtering: city > province > country
-        if city:
-            queryset = queryset.filter(city__name=city)
-        elif province:
-            queryset = queryset.filter(province__name=province)
-        elif country:
-            queryset = queryset.filter(country__name=country)
 
-        # Hierarchical filtering: clan > tribe
-        if clan:
-            queryset = queryset.filter(clan__name=clan)
-        elif tribe:
-            queryset = queryset.filter(tribe__name=tribe)
+class SampleExportView(View):
+    """
+    The whole sample table, denormalized (see genetics.export), as a
+    gzipped CSV or a Parquet file for bulk downloads.
+    
+    The file is built once per version of the data and served from disk.
+    Its version is sent as the ETag, so clients can revalidate with
+    If-None-Match and get a 304.
+    
+    Usage: /samples/export/?format=csv (default) or ?format=parquet
+    """
+    def get(self, request):
+        file_format = request.GET.get('format', 'csv')
+        formats = export.available_formats()
+        if file_format not in formats:
+            return TimedJsonResponse({'error': f'format must be one of: {", ".join(formats)}'}, status=400)
         
-        if ethnicity:
-            queryset = queryset.filter(ethnicity__name=ethnicity)
-            
-        return queryset
+        version = export.version()
+        etag = f'W/"{file_format}-{version}"'
+        if etag in request.headers.get('If-None-Match', ''):
+            response = HttpResponseNotModified()
+        else:
+            extension, content_type, _ = export.FORMATS[file_format]
+            response = FileResponse(
+                export.get_export(file_format, version),
+                as_attachment=True,
+                filename=f'genetic-samples.{extension}',
+                content_type=content_type,
+            )
+        
+        response['ETag'] = etag
+        patch_cache_control(response, public=True, no_cache=True)
+        return response
+
 
+class SampleFacetView(APIView):
+    """
+    Returns the number of matching samples for every value of every filter.
+    
+    Query parameters: the same filters as the sample list (country, province,
+    city, ethnicity, tribe, clan, historical_period, haplogroup, mt_dna).
+    
+    Each facet is counted under all active filters except its own, so the
+    counts show how many samples every alternative value would return.
+    Haplogroup facets count subclades towards their ancestors.
+    
+    Usage:
+    - /samples/facets/
+    - /samples/facets/?country=Iran&ethnicity=Azerbaijani
+    """
+    # Facet name (= filter parameter) -> GeneticSample lookup of its value
+    FACETS = {
+        'country': 'country__name',
+        'province': 'province__name',
+        'city': 'city__name',
+        'ethnicity': 'ethnicity__name',
+        'tribe': 'tribe__name',
+        'clan': 'clan__name',
+        'historical_period': 'historical_period__name',
+        'haplogroup': 'y_dna__name',
+        'mt_dna': 'mt_dna__name',
+    }
+    HAPLOGROUP_FACETS = {'haplogroup': 'y_dna', 'mt_dna': 'mt_dna'}
+    
+    def get(self, request):
+        params = {key: value for key, value in request.query_params.items() if key in self.FACETS}
+        indexes = {}
+        
+        # One grouped query per facet, sent to the database as a single UNION ALL
+        total = filter_samples(GeneticSample.objects.all(), params, indexes).order_by().annotate(
+            facet=Value('', output_field=CharField()),
+            value=Value('', output_field=CharField()),
+        ).values('facet', 'value').annotate(total=Sum('count')).values_list('facet', 'value', 'total')
+        
+        queries = []
+        for facet, lookup in self.FACETS.items():
+            facet_params = {key: value for key, value in params.items() if key != facet}
+            queries.append(
+                filter_samples(GeneticSample.objects.all(), facet_params, indexes)
+                .filter(**{f'{lookup}__isnull': False})
+                .order_by()
+                .annotate(
+                    facet=Value(facet, output_field=CharField()),
+                    value=F(lookup),
+                )
+                .values('facet', 'value')
+                .annotate(total=Sum('count'))
+                .values_list('facet', 'value', 'total')
+            )
+        
+        counts = defaultdict(dict)
+        sample_total = 0
+        for facet, value, count in total.union(*queries, all=True):
+            if facet:
+                counts[facet][value] = count
+            else:
+                sample_total = count or 0
+        
+        facets = {}
+        for facet in self.FACETS:
+            if facet in self.HAPLOGROUP_FACETS:
+                facets[facet] = self.haplogroup_facet(
+                    self.HAPLOGROUP_FACETS[facet], counts[facet], indexes
+                )
+            else:
+                facets[facet] = [
+                    {'value': value, 'count': count} for value, count in counts[facet].items()
+                ]
+            facets[facet].sort(key=lambda item: (-item['count'], item['value']))
+        
+        return Response({'total': sample_total, 'facets': facets})
+    
+    def haplogroup_facet(self, dna_field, direct_counts, indexes):
+        """Roll direct counts up the tree so every haplogroup includes its subclades"""
+        if not direct_counts:
+            return []
+        
+        if dna_field not in indexes:
+            indexes[dna_field] = HaplogroupIndex.load(HAPLOGROUP_TREES[dna_field])
+        index = indexes[dna_field]
+        totals = defaultdict(int)
+        for name, count in direct_counts.items():
+            node_id = index.get_id(name)
+            for ancestor_id in index.path(node_id):
+                totals[ancestor_id] += count
+        
+        return [
+            {
+                'value': index.names[node_id],
+                'parent': index.names.get(index.parents[node_id]),
+                'count': count,
+            }
+            for node_id, count in totals.items()
+        ]
 
-class CountryListView(generics.ListAPIView):
+
+class CountryListView(SparseFieldsetViewMixin, generics.ListAPIView):
     queryset = Country.objects.all().order_by('name')
     serializer_class = CountrySerializer
     pagination_class = None
 
 
 class ProvinceListView(generics.ListAPIView):
+    """
+    Provinces with their centroid and boundary, computed by PostGIS (see geo).
+    Usage: /provinces/?country=Iran&bbox=44,25,52,32&geometry=simplified
+    """
     serializer_class = ProvinceSerializer
     pagination_class = None
     
+    @cached_response('provinces', (cache.REFERENCE,))
+    def get(self, request, *args, **kwargs):
+        self.geometry = request.query_params.get('geometry', 'full')
+        if self.geometry not in GEOMETRY_DETAILS:
+            return Response({'error': f'geometry must be one of: {", ".join(GEOMETRY_DETAILS)}'}, status=400)
+        try:
+            self.bounds = bounds_filters(request.query_params)
+        except ValueError as e:
+            return Response({'error': str(e)}, status=400)
+        return super().get(request, *args, **kwargs)
+    
     def get_queryset(self):
-        queryset = Province.objects.select_related('country').all()
+        queryset = Province.objects.select_related('country').filter(**self.bounds)
         
         country = self.request.query_params.get('country')
         if country:
             queryset = queryset.filter(country__name=country)
             
-        return queryset.order_by('name')
+        # Only compute the centroid and GeoJSON of the selected fields
+        fields = parse_fieldset(self.request.query_params, ProvinceSerializer.Meta.fields)
+        fields = fields or ProvinceSerializer.Meta.fields
+        queryset = annotate_geometry(
+            queryset,
+            self.geometry if 'geometry' in fields else 'none',
+            centroid='latitude' in fields or 'longitude' in fields,
+        )
+        # Projected last, once the annotations it may read exist
+        return project(queryset.order_by('name'), self.get_serializer_class(), self.request.query_params)
+    
+    def get_serializer_context(self):
+        return {**super().get_serializer_context(), 'geometry': self.geometry}
 
 
-class CityListView(generics.ListAPIView):
+class CityListView(SparseFieldsetViewMixin, generics.ListAPIView):
+    queryset = City.objects.select_related('province__country')
     serializer_class = CitySerializer
     pagination_class = None
     
     def get_queryset(self):
-        queryset = City.objects.select_related('province__country').all()
+        queryset = super().get_queryset()
         
         province = self.request.query_params.get('province')
         if province:
@@ -102,12 +342,13 @@ class CityListView(generics.ListAPIView):
         return queryset.order_by('name')
 
 
-class EthnicityListView(generics.ListAPIView):
+class EthnicityListView(SparseFieldsetViewMixin, generics.ListAPIView):
+    queryset = Ethnicity.objects.all()
     serializer_class = EthnicitySerializer
     pagination_class = None
 
     def get_queryset(self):
-        queryset = Ethnicity.objects.all().order_by('name')
+        queryset = super().get_queryset()
         
         province = self.request.query_params.get('province')
         if province:
@@ -122,12 +363,13 @@ class EthnicityListView(generics.ListAPIView):
         return queryset.order_by('name')
 
 
-class TribeListView(generics.ListAPIView):
+class TribeListView(SparseFieldsetViewMixin, generics.ListAPIView):
+    queryset = Tribe.objects.prefetch_related('ethnicities')
     serializer_class = TribeSerializer
     pagination_class = None
 
     def get_queryset(self):
-        queryset = Tribe.objects.prefetch_related('ethnicities').all()
+        queryset = super().get_queryset()
         
         ethnicity = self.request.query_params.get('ethnicity')
         if ethnicity:
@@ -136,12 +378,13 @@ class TribeListView(generics.ListAPIView):
         return queryset.order_by('name')
 
 
-class ClanListView(generics.ListAPIView):
+class ClanListView(SparseFieldsetViewMixin, generics.ListAPIView):
+    queryset = Clan.objects.select_related('tribe').prefetch_related('tribe__ethnicities')
     serializer_class = ClanSerializer
     pagination_class = None
 
     def get_queryset(self):
-        queryset = Clan.objects.select_related('tribe').prefetch_related('tribe__ethnicities').all()
+        queryset = super().get_queryset()
         
         tribe = self.request.query_params.get('tribe')
         if tribe:
@@ -154,75 +397,128 @@ class ClanListView(generics.ListAPIView):
         return queryset.order_by('name')
 
 
-class HaplogroupCountView(APIView):
+class BootstrapView(APIView):
     """
-    Returns the total count of samples for a haplogroup including all its subclades.
-    Usage: /haplogroup?name=R
+    Returns all reference data the map UI needs on page load in one document:
+    countries, provinces (with geometry), cities, ethnicities, tribes, clans,
+    historical periods and both haplogroup trees.
+    
+    The document is built and compressed once per version of the reference
+    data and kept in the cache. Its version is sent as the ETag, so clients
+    can revalidate with If-None-Match and get a 304.
+    
+    Usage: /bootstrap/
     """
+    NAMESPACES = (cache.REFERENCE, cache.HAPLOGROUPS)
+    
     def get(self, request):
-        haplogroup_name = request.query_params.get('name')
+        version = '-'.join(str(cache.get_version(namespace)) for namespace in self.NAMESPACES)
+        etag = f'W/"{version}"'
         
-        if not haplogroup_name:
-            return Response({'error': 'name parameter is required'}, status=400)
+        if etag in request.headers.get('If-None-Match', ''):
+            response = HttpResponseNotModified()
+            patch_vary_headers(response, ('Accept-Encoding',))
+        else:
+            key = make_key('bootstrap', {}, self.NAMESPACES)
+            body = get_or_compute('bootstrap', {}, self.NAMESPACES, lambda: self.build(version))
+            response = precompressed_response(request, key, body)
         
-        try:
-            haplogroup = YDNATree.objects.get(name=haplogroup_name)
-        except YDNATree.DoesNotExist:
-            return Response({'error': f'Haplogroup {haplogroup_name} not found'}, status=404)
+        response['ETag'] = etag
+        patch_cache_control(response, public=True, no_cache=True)
+        return response
+    
+    def build(self, version):
+        data = {
+            'version': version,
+            'countries': CountrySerializer(Country.objects.order_by('name'), many=True).data,
+            'provinces': ProvinceSerializer(
+                annotate_geometry(Province.objects.select_related('country')).order_by('name'), many=True
+            ).data,
+            'cities': CitySerializer(City.objects.select_related('province').order_by('name'), many=True).data,
+            'ethnicities': EthnicitySerializer(Ethnicity.objects.order_by('name'), many=True).data,
+            'tribes': TribeSerializer(
+                Tribe.objects.prefetch_related('ethnicities').order_by('name'), many=True
+            ).data,
+            'clans': ClanSerializer(
+                Clan.objects.select_related('tribe').prefetch_related('tribe__ethnicities').order_by('name'),
+                many=True
+            ).data,
+            'historical_periods': HistoricalPeriodSerializer(HistoricalPeriod.objects.all(), many=True).data,
+            'haplogroups': {
+                'y_dna': HaplogroupIndex.load(YDNATree).tree(),
+                'mt_dna': HaplogroupIndex.load(MTDNATree).tree(),
+            },
+        }
+        return TimedJSONRenderer().render(data)
+
+
+class HaplogroupCountView(View):
+    """
+    Returns the total count of samples for a haplogroup including all its subclades.
+    Usage: /haplogroup?name=R
+    """
+    async def get(self, request):
+        haplogroup_name = request.GET.get('name')
         
-        # Get all descendant haplogroups
-        def get_all_descendants(node):
-            descendants = [node]
-            for child in node.children.all():
-                descendants.extend(get_all_descendants(child))
-            return descendants
+        if not haplogroup_name:
+            return TimedJsonResponse({'error': 'name parameter is required'}, status=400)
         
-        all_haplogroups = get_all_descendants(haplogroup)
-        haplogroup_ids = [h.id for h in all_haplogroups]
-        subclade_names = [h.name for h in all_haplogroups if h.id != haplogroup.id]
+        # Resolve the haplogroup and all its descendants with one query
+        index = await HaplogroupIndex.aload(YDNATree)
+        haplogroup_id = index.get_id(haplogroup_name)
+        if haplogroup_id is None:
+            return TimedJsonResponse({'error': f'Haplogroup {haplogroup_name} not found'}, status=404)
         
-        # Get total count from all samples (including subclades) using the count field
-        all_samples = GeneticSample.objects.filter(y_dna__id__in=haplogroup_ids)
-        total_count = all_samples.aggregate(total=Sum('count'))['total'] or 0
+        haplogroup_ids = index.descendant_ids(haplogroup_id)
+        subclade_names = [index.names[i] for i in haplogroup_ids if i != haplogroup_id]
         
-        # Count samples with this haplogroup directly
-        direct_samples = GeneticSample.objects.filter(y_dna=haplogroup)
-        direct_count = direct_samples.aggregate(total=Sum('count'))['total'] or 0
+        # Total (including subclades) and direct counts from the count field, in one query
+        counts = await GeneticSample.objects.aaggregate(
+            total=Sum('count', filter=Q(y_dna__id__in=haplogroup_ids)),
+            direct=Sum('count', filter=Q(y_dna__id=haplogroup_id)),
+        )
         
         # Subclade count is the number of unique subclades (not sample count)
         subclade_count = len(subclade_names)
         
         data = {
             'haplogroup': haplogroup_name,
-            'total_count': total_count,
-            'direct_count': direct_count,
+            'total_count': counts['total'] or 0,
+            'direct_count': counts['direct'] or 0,
             'subclade_count': subclade_count,
             'subclades': subclade_names
         }
         
         serializer = HaplogroupCountSerializer(data)
-        return Response(serializer.data)
+        return TimedJsonResponse(serializer.data)
 
 
-class HaplogroupListView(generics.ListAPIView):
+class HaplogroupListView(APIView):
     """
     Lists all haplogroups in hierarchical structure.
     Usage: /haplogroup/all
     """
-    serializer_class = YDNATreeSerializer
-    pagination_class = None
     
-    def get_queryset(self):
-        # Return only root haplogroups (those without parents)
-        return YDNATree.objects.filter(parent__isnull=True).order_by('name')
+    @cached_response('haplogroup-tree', (cache.HAPLOGROUPS,))
+    def get(self, request):
+        # Build the nested tree from one query instead of walking it node by node
+        return Response(HaplogroupIndex.load(YDNATree).tree())
+
 
+def split_names(value):
+    """Split a comma-separated query parameter into a list of non-empty names"""
+    if not value:
+        return []
+    return [name.strip() for name in value.split(',') if name.strip()]
 
-class HaplogroupHeatmapView(APIView):
+
+class HaplogroupHeatmapView(View):
     """
     Returns aggregated sample counts by location with coordinates for heatmap visualization.
     
     Query parameters:
-    - haplogroup: Filter by specific Y-DNA haplogroup (optional)
+    - haplogroup: Filter by Y-DNA haplogroup(s), comma-separated (optional)
+    - mt_dna: Filter by mtDNA haplogroup(s), comma-separated (optional)
     - country: Filter by country (optional)
     - ethnicity: Filter by ethnicity (optional)
     
@@ -230,40 +526,56 @@ class HaplogroupHeatmapView(APIView):
     - /haplogroup/heatmap/ (all samples)
     - /haplogroup/heatmap/?haplogroup=R (samples with R haplogroup and subclades)
     - /haplogroup/heatmap/?country=Iran (samples from Iran)
+    - /haplogroup/heatmap/?haplogroup=R1a,R1b&mt_dna=H (one series per haplogroup)
+    
+    A single Y-DNA haplogroup returns the flat list of locations. Several
+    haplogroups return every province once, with one count per series.
+    
+    Async view: the haplogroup trees, the grouped sample counts and the
+    province geometries are fetched concurrently.
     """
-    def get(self, request):
-        haplogroup_name = request.query_params.get('haplogroup')
-        country = request.query_params.get('country')
-        ethnicity = request.query_params.get('ethnicity')
+    @acached_response('heatmap', (cache.SAMPLES, cache.HAPLOGROUPS, cache.REFERENCE))
+    async def get(self, request):
+        y_dna_names = split_names(request.GET.get('haplogroup'))
+        mt_dna_names = split_names(request.GET.get('mt_dna'))
+        country = request.GET.get('country')
+        ethnicity = request.GET.get('ethnicity')
         
-        # Start with all samples
-        queryset = GeneticSample.objects.select_related(
-            'province__country',
-            'y_dna',
-            'country',
-            'ethnicity'
-        ).filter(
+        # Resolve every requested haplogroup to its subtree, loading the trees concurrently
+        requested = [
+            (dna_field, names)
+            for dna_field, names in (('y_dna', y_dna_names), ('mt_dna', mt_dna_names))
+            if names
+        ]
+        indexes = await gather_queries(*(
+            partial(HaplogroupIndex.load, HAPLOGROUP_TREES[dna_field]) for dna_field, _ in requested
+        ))
+        
+        series = []
+        for (dna_field, names), index in zip(requested, indexes):
+            for name in names:
+                node_id = index.get_id(name)
+                if node_id is None:
+                    return TimedJsonResponse({'error': f'Haplogroup {name} not found'}, status=404)
+                series.append({
+                    'name': name,
+                    'dna': dna_field,
+                    'ids': set(index.descendant_ids(node_id)),
+                })
+        
+        queryset = GeneticSample.objects.filter(
             province__isnull=False,
             province__geom__isnull=False
         )
         
-        # Filter by haplogroup (including subclades)
-        if haplogroup_name:
-            try:
-                haplogroup = YDNATree.objects.get(name=haplogroup_name)
-                
-                # Get all descendant haplogroups
-                def get_all_descendants(node):
-                    descendants = [node]
-                    for child in node.children.all():
-                        descendants.extend(get_all_descendants(child))
-                    return descendants
-                
-                all_haplogroups = get_all_descendants(haplogroup)
-                haplogroup_ids = [h.id for h in all_haplogroups]
-                queryset = queryset.filter(y_dna__id__in=haplogroup_ids)
-            except YDNATree.DoesNotExist:
-                return Response({'error': f'Haplogroup {haplogroup_name} not found'}, status=404)
+        # Only keep samples that belong to at least one series
+        if series:
+            series_filter = Q()
+            for dna_field in ('y_dna', 'mt_dna'):
+                ids = set().union(*(s['ids'] for s in series if s['dna'] == dna_field))
+                if ids:
+                    series_filter |= Q(**{f'{dna_field}__id__in': ids})
+            queryset = queryset.filter(series_filter)
         
         # Filter by country
         if country:
@@ -273,91 +585,492 @@ class HaplogroupHeatmapView(APIView):
         if ethnicity:
             queryset = queryset.filter(ethnicity__name=ethnicity)
         
-        # Aggregate by province
-        from django.db.models import Sum
-        from collections import defaultdict
-        
-        location_data = defaultdict(lambda: {'count': 0, 'province': None, 'country': None, 'lat': None, 'lng': None})
-        
-        for sample in queryset:
-            key = (sample.province.id, sample.province.name)
-            location_data[key]['count'] += sample.count
-            location_data[key]['province'] = sample.province.name
-            location_data[key]['country'] = sample.province.country.name
-            # Extract coordinates from geometry centroid and store geometry
-            if sample.province.geom:
-                centroid = sample.province.geom.centroid
-                location_data[key]['lat'] = float(centroid.y)
-                location_data[key]['lng'] = float(centroid.x)
-                # Store geometry as GeoJSON
-                location_data[key]['geometry'] = json.loads(sample.province.geom.geojson)
-        
-        # Format data for response
-        heatmap_data = []
-        for (province_id, province_name), data in location_data.items():
-            heatmap_data.append({
-                'province': data['province'],
-                'country': data['country'],
-                'latitude': data['lat'],
-                'longitude': data['lng'],
-                'geometry': data.get('geometry'),
-                'sample_count': data['count'],
-                'haplogroup': haplogroup_name if haplogroup_name else None
+        # Aggregate by province and haplogroup in the database
+        rows_query = (
+            queryset.order_by()
+            .values('province_id', 'y_dna_id', 'mt_dna_id')
+            .annotate(total=Sum('count'))
+            .values_list('province_id', 'y_dna_id', 'mt_dna_id', 'total')
+        )
+        
+        # Fetch each matching province geometry once, with centroid and GeoJSON computed by PostGIS
+        provinces_query = Province.objects.filter(
+            id__in=queryset.order_by().values('province_id')
+        ).annotate(
+            centroid=Centroid('geom'),
+            geojson=AsGeoJSON('geom'),
+        ).values_list('id', 'name', 'country__name', 'centroid', 'geojson')
+        
+        rows, provinces = await gather_queries(
+            lambda: list(rows_query),
+            lambda: list(provinces_query),
+        )
+        
+        totals = defaultdict(int)
+        series_counts = defaultdict(lambda: [0] * len(series))
+        for province_id, y_dna_id, mt_dna_id, total in rows:
+            totals[province_id] += total
+            for i, s in enumerate(series):
+                node_id = y_dna_id if s['dna'] == 'y_dna' else mt_dna_id
+                if node_id in s['ids']:
+                    series_counts[province_id][i] += total
+        
+        locations = []
+        for province_id, name, country_name, centroid, geojson in provinces:
+            locations.append({
+                'province': name,
+                'country': country_name,
+                'latitude': float(centroid.y),
+                'longitude': float(centroid.x),
+                'geometry': json.loads(geojson),
+                'sample_count': totals[province_id],
+                'counts': series_counts[province_id],
             })
         
         # Sort by sample count descending
-        heatmap_data.sort(key=lambda x: x['sample_count'], reverse=True)
+        locations.sort(key=lambda x: x['sample_count'], reverse=True)
+        
+        if len(series) <= 1 and not mt_dna_names:
+            haplogroup_name = y_dna_names[0] if y_dna_names else None
+            for location in locations:
+                location['haplogroup'] = haplogroup_name
+            serializer = HaplogroupHeatmapSerializer(locations, many=True)
+            return TimedJsonResponse(serializer.data, safe=False)
+        
+        serializer = HaplogroupMultiHeatmapSerializer({
+            'series': series,
+            'locations': locations,
+        })
+        return TimedJsonResponse(serializer.data)
+
+
+def parse_frequency_params(query_params, default_group_by):
+    """
+    Read the parameters shared by the haplogroup frequency endpoints.
+    Raises ValueError with a user-facing message on invalid input.
+    """
+    group_by = query_params.get('group_by', default_group_by)
+    dna = query_params.get('dna', 'y_dna')
+    
+    if group_by not in GROUP_FIELDS:
+        raise ValueError(f'group_by must be one of: {", ".join(GROUP_FIELDS)}')
+    if dna not in HAPLOGROUP_TREES:
+        raise ValueError(f'dna must be one of: {", ".join(HAPLOGROUP_TREES)}')
+    
+    try:
+        depth = int(query_params.get('depth', 0))
+    except ValueError:
+        raise ValueError('depth must be an integer')
+    if depth < 0:
+        raise ValueError('depth must be zero or positive')
+    
+    return {
+        'group_by': group_by,
+        'dna': dna,
+        'depth': depth,
+        'country': query_params.get('country'),
+        'ethnicity': query_params.get('ethnicity'),
+    }
+
+
+class HaplogroupFrequencyView(APIView):
+    """
+    Returns haplogroup frequencies (share of each region's total) as one matrix.
+    
+    Query parameters:
+    - group_by: province (default), country, ethnicity or tribe
+    - depth: Haplogroup tree depth to aggregate on, 0 = top-level (default 0)
+    - dna: y_dna (default) or mt_dna
+    - confidence: Confidence level for the Wilson intervals (default 0.95)
+    - country: Filter by country (optional)
+    - ethnicity: Filter by ethnicity (optional)
+    
+    Usage:
+    - /haplogroup/frequencies/ (top-level Y-DNA haplogroups per province)
+    - /haplogroup/frequencies/?group_by=ethnicity&depth=1
+    
+    Rows of `counts`, `frequencies`, `ci_lower` and `ci_upper` follow `regions`,
+    columns follow `haplogroups`.
+    """
+    def get(self, request):
+        try:
+            params = parse_frequency_params(request.query_params, default_group_by='province')
+        except ValueError as e:
+            return Response({'error': str(e)}, status=400)
+        
+        try:
+            confidence = float(request.query_params.get('confidence', 0.95))
+        except ValueError:
+            return Response({'error': 'confidence must be a number'}, status=400)
+        
+        if not 0 < confidence < 1:
+            return Response({'error': 'confidence must be between 0 and 1'}, status=400)
+        
+        group_by, depth, dna = params['group_by'], params['depth'], params['dna']
+        country, ethnicity = params['country'], params['ethnicity']
+        
+        queryset = GeneticSample.objects.all()
+        if country:
+            queryset = queryset.filter(country__name=country)
+        if ethnicity:
+            queryset = queryset.filter(ethnicity__name=ethnicity)
+        
+        index = HaplogroupIndex.load(HAPLOGROUP_TREES[dna])
+        matrix = frequency_matrix(queryset, group_by, dna, index, depth=depth)
+        ci_lower, ci_upper = matrix.confidence_intervals(confidence)
         
-        serializer = HaplogroupHeatmapSerializer(heatmap_data, many=True)
-        return Response(serializer.data)
+        return Response({
+            'dna': dna,
+            'group_by': group_by,
+            'depth': depth,
+            'confidence': confidence,
+            'haplogroups': matrix.haplogroups,
+            'regions': matrix.regions,
+            'totals': matrix.totals.tolist(),
+            'counts': matrix.counts.tolist(),
+            'frequencies': matrix.shares().round(4).tolist(),
+            'ci_lower': ci_lower.round(4).tolist(),
+            'ci_upper': ci_upper.round(4).tolist(),
+        })
+
+
+class HaplogroupTimelineView(APIView):
+    """
+    Returns haplogroup counts and shares per historical period or year bucket.
+    
+    Query parameters:
+    - bin: period (default) or a bucket width in years, e.g. 500
+    - haplogroup: Comma-separated haplogroups to track, subclades included (optional).
+      Without it every haplogroup is reported, collapsed at `depth`.
+    - depth: Haplogroup tree depth used without `haplogroup`, 0 = top-level (default 0)
+    - dna: y_dna (default) or mt_dna
+    - country: Filter by country (optional)
+    - ethnicity: Filter by ethnicity (optional)
+    
+    Usage:
+    - /haplogroup/timeline/ (top-level Y-DNA haplogroups per historical period)
+    - /haplogroup/timeline/?bin=500&haplogroup=R1a,R1b,J2
+    
+    Results are cached per parameter set until samples or reference data change.
+    """
+    def get(self, request):
+        bin_param = request.query_params.get('bin', 'period')
+        dna = request.query_params.get('dna', 'y_dna')
+        haplogroup_names = split_names(request.query_params.get('haplogroup'))
+        
+        if dna not in HAPLOGROUP_TREES:
+            return Response(
+                {'error': f'dna must be one of: {", ".join(HAPLOGROUP_TREES)}'}, status=400
+            )
+        
+        try:
+            depth = int(request.query_params.get('depth', 0))
+            bin_width = None if bin_param == 'period' else int(bin_param)
+        except ValueError:
+            return Response({'error': 'depth must be an integer and bin "period" or a number of years'}, status=400)
+        
+        if depth < 0:
+            return Response({'error': 'depth must be zero or positive'}, status=400)
+        if bin_width is not None and bin_width <= 0:
+            return Response({'error': 'bin must be a positive number of years'}, status=400)
+        
+        params = {
+            'bin': bin_width or 'period',
+            'dna': dna,
+            'depth': depth,
+            'haplogroups': haplogroup_names,
+            'country': request.query_params.get('country'),
+            'ethnicity': request.query_params.get('ethnicity'),
+        }
+        
+        def compute():
+            index = HaplogroupIndex.load(HAPLOGROUP_TREES[dna])
+            series = None
+            if haplogroup_names:
+                series = []
+                for name in haplogroup_names:
+                    node_id = index.get_id(name)
+                    if node_id is None:
+                        return {'error': f'Haplogroup {name} not found'}
+                    series.append((name, set(index.descendant_ids(node_id))))
+            
+            queryset = GeneticSample.objects.all()
+            if params['country']:
+                queryset = queryset.filter(country__name=params['country'])
+            if params['ethnicity']:
+                queryset = queryset.filter(ethnicity__name=params['ethnicity'])
+            
+            matrix = timeline_matrix(
+                queryset, dna, index, depth=depth, series=series, bin_width=bin_width
+            )
+            return {
+                'dna': dna,
+                'bin': params['bin'],
+                'depth': depth if series is None else None,
+                'haplogroups': matrix.haplogroups,
+                'bins': matrix.regions,
+                'totals': matrix.totals.tolist(),
+                'counts': matrix.counts.tolist(),
+                'frequencies': matrix.shares().round(4).tolist(),
+            }
+        
+        data = get_or_compute(
+            'haplogroup-timeline',
+            params,
+            (cache.SAMPLES, cache.HAPLOGROUPS, cache.REFERENCE),
+            compute,
+        )
+        if 'error' in data:
+            return Response(data, status=404)
+        return Response(data)
+
+
+class PopulationDistanceView(APIView):
+    """
+    Compares populations by their haplogroup frequency vectors.
+    
+    Query parameters:
+    - group_by: ethnicity (default), tribe, province or country
+    - depth: Haplogroup tree depth the vectors are built on, 0 = top-level (default 0)
+    - dna: y_dna (default) or mt_dna
+    - metric: fst (default), euclidean or braycurtis
+    - analysis: Comma-separated extra analyses: cluster (UPGMA), pca (optional)
+    - min_samples: Skip populations with fewer samples (default 1)
+    - country: Filter by country (optional)
+    - ethnicity: Filter by ethnicity (optional)
+    
+    Usage:
+    - /populations/distances/ (Fst-like distances between ethnicities)
+    - /populations/distances/?group_by=tribe&metric=braycurtis&analysis=cluster,pca
+    
+    Results are cached per parameter set until samples or reference data change.
+    """
+    def get(self, request):
+        try:
+            params = parse_frequency_params(request.query_params, default_group_by='ethnicity')
+        except ValueError as e:
+            return Response({'error': str(e)}, status=400)
+        
+        try:
+            min_samples = int(request.query_params.get('min_samples', 1))
+        except ValueError:
+            return Response({'error': 'min_samples must be an integer'}, status=400)
+        
+        metric = request.query_params.get('metric', 'fst')
+        if metric not in DISTANCE_METRICS:
+            return Response(
+                {'error': f'metric must be one of: {", ".join(DISTANCE_METRICS)}'}, status=400
+            )
+        
+        analysis = split_names(request.query_params.get('analysis'))
+        unknown = set(analysis) - {'cluster', 'pca'}
+        if unknown:
+            return Response({'error': f'Unknown analysis: {", ".join(sorted(unknown))}'}, status=400)
+        
+        params.update(metric=metric, analysis=sorted(analysis), min_samples=min_samples)
+        data = get_or_compute(
+            'population-distances',
+            params,
+            (cache.SAMPLES, cache.HAPLOGROUPS, cache.REFERENCE),
+            lambda: self.compare_populations(params),
+        )
+        return Response(data)
+    
+    def compare_populations(self, params):
+        queryset = GeneticSample.objects.all()
+        if params['country']:
+            queryset = queryset.filter(country__name=params['country'])
+        if params['ethnicity']:
+            queryset = queryset.filter(ethnicity__name=params['ethnicity'])
+        
+        index = HaplogroupIndex.load(HAPLOGROUP_TREES[params['dna']])
+        matrix = frequency_matrix(
+            queryset, params['group_by'], params['dna'], index, depth=params['depth']
+        )
+        
+        keep = matrix.totals >= params['min_samples']
+        populations = [name for name, kept in zip(matrix.regions, keep) if kept]
+        frequencies = matrix.shares()[keep]
+        distances = pairwise_distances(frequencies, params['metric'])
+        
+        data = {
+            'dna': params['dna'],
+            'group_by': params['group_by'],
+            'depth': params['depth'],
+            'metric': params['metric'],
+            'populations': populations,
+            'totals': matrix.totals[keep].tolist(),
+            'haplogroups': matrix.haplogroups,
+            'frequencies': frequencies.round(4).tolist(),
+            'distances': distances.round(4).tolist(),
+        }
+        
+        if 'cluster' in params['analysis']:
+            linkage = upgma(distances)
+            data['clustering'] = {
+                'method': 'upgma',
+                'linkage': [
+                    [int(a), int(b), round(float(height), 4), int(size)]
+                    for a, b, height, size in linkage
+                ],
+                'order': leaf_order(linkage, len(populations)),
+            }
+        
+        if 'pca' in params['analysis']:
+            coordinates, explained = principal_components(frequencies)
+            data['pca'] = {
+                'coordinates': coordinates.round(4).tolist(),
+                'explained_variance': explained.round(4).tolist(),
+            }
+        
+        return data
 
 
 # Blog Views
-class BlogPostListView(generics.ListAPIView):
+# Decimals of the search rank, which blog search pages by
+RANK_PRECISION = 6
+
+
+class BlogSearchPagination(CursorPagination):
+    """Cursor pagination over search results, most relevant first"""
+    ordering = ('-rank', '-id')
+
+
+class BlogContentFormatMixin:
+    """
+    Serves post content as stored Markdown or as its pre-rendered HTML,
+    picked with ?content_format=markdown|html (`format` is taken by DRF's
+    format suffix override). Only the requested representation is loaded.
+    """
+    
+    @property
+    def content_format(self):
+        return self.request.query_params.get('content_format', 'markdown')
+    
+    def invalid_content_format(self):
+        if self.content_format not in CONTENT_FORMATS:
+            return Response(
+                {'error': f'content_format must be one of: {", ".join(CONTENT_FORMATS)}'}, status=400
+            )
+        return None
+    
+    def get_serializer_context(self):
+        return {**super().get_serializer_context(), 'content_format': self.content_format}
+    
+    def get_queryset(self):
+        unused = 'content' if self.content_format == 'html' else 'content_html'
+        return BlogPost.objects.filter(status='published').prefetch_related('tags').defer(unused)
+
+
+class BlogPostListView(SparseFieldsetViewMixin, BlogContentFormatMixin, generics.ListAPIView):
     """
     List all published blog posts.
     Query parameters:
     - tag: Filter by tag
-    - search: Search in title and content
+    - content_format: markdown (default) or html
+    - search: Full-text search in title, excerpt and content (web search
+      syntax: "quoted phrases", -excluded, or). Results are ranked by
+      relevance, carry a highlighted `headline` snippet and are paginated
+      with a cursor (`next`/`previous` links) instead of page numbers.
     """
-    serializer_class = BlogPostSerializer
+    
+    @property
+    def search(self):
+        return self.request.query_params.get('search', '').strip()
+    
+    @property
+    def pagination_class(self):
+        if self.search:
+            return BlogSearchPagination
+        return api_settings.DEFAULT_PAGINATION_CLASS
+    
+    def get_serializer_class(self):
+        return BlogPostSearchSerializer if self.search else BlogPostSerializer
+    
+    def list(self, request, *args, **kwargs):
+        return self.invalid_content_format() or super().list(request, *args, **kwargs)
     
     def get_queryset(self):
         # Only show published posts
-        queryset = BlogPost.objects.filter(status='published')
+        queryset = super().get_queryset()
         
-        # Filter by tag
+        # Filter by tag: exact match on the tag's slug
         tag = self.request.query_params.get('tag')
         if tag:
-            queryset = queryset.filter(tags__icontains=tag)
-        
-        # Search in title and content
-        search = self.request.query_params.get('search')
-        if search:
-            queryset = queryset.filter(
-                Q(title__icontains=search) | 
-                Q(content__icontains=search) |
-                Q(excerpt__icontains=search)
+            queryset = queryset.filter(tags__slug=slugify(tag, allow_unicode=True))
+        
+        # Full-text search through the GIN-indexed search vector
+        if self.search:
+            query = SearchQuery(self.search, search_type='websearch', config=BlogPost.SEARCH_CONFIG)
+            return queryset.filter(search_vector=query).annotate(
+                # Rounded and cast to double precision, so the cursor stores exactly the value the query orders by
+                rank=Cast(Round(SearchRank(F('search_vector'), query), RANK_PRECISION), FloatField()),
+                headline=SearchHeadline(
+                    'content',
+                    query,
+                    config=BlogPost.SEARCH_CONFIG,
+                    start_sel='<mark>',
+                    stop_sel='</mark>',
+                    max_words=35,
+                    min_words=15,
+                ),
             )
         
         return queryset.order_by('-published_at', '-created_at')
 
 
-class BlogPostDetailView(generics.RetrieveAPIView):
+class BlogTagListView(SparseFieldsetViewMixin, generics.ListAPIView):
     """
-    Get a single blog post by slug and increment view count.
+    Lists the tags of published posts with the number of posts per tag.
+    Usage: /blog/tags/
+    """
+    queryset = (
+        Tag.objects.annotate(post_count=Count('posts', filter=Q(posts__status='published')))
+        .filter(post_count__gt=0)
+        .order_by('-post_count', 'name')
+    )
+    serializer_class = TagSerializer
+    pagination_class = None
+    
+    @cached_response('blog-tags', (cache.BLOG,))
+    def get(self, request, *args, **kwargs):
+        return super().get(request, *args, **kwargs)
+
+
+class BlogPostDetailView(SparseFieldsetViewMixin, BlogContentFormatMixin, generics.RetrieveAPIView):
+    """
+    Get a single blog post by slug and count the view.
+    
+    The serialized post is cached until the post changes. Views are counted
+    in the cache and written to the database in batches (see viewcounts),
+    so a request runs at most two queries (the post and its tags) and never locks the post's row.
     """
     serializer_class = BlogPostSerializer
     lookup_field = 'slug'
     
-    def get_queryset(self):
-        return BlogPost.objects.filter(status='published')
-    
     def retrieve(self, request, *args, **kwargs):
-        instance = self.get_object()
-        # Increment view count
-        BlogPost.objects.filter(pk=instance.pk).update(view_count=F('view_count') + 1)
-        # Refresh instance to get updated view_count
-        instance.refresh_from_db()
-        serializer = self.get_serializer(instance)
-        return Response(serializer.data)
+        invalid = self.invalid_content_format()
+        if invalid:
+            return invalid
+        slug = kwargs[self.lookup_field]
+        
+        def compute():
+            post = self.get_queryset().filter(slug=slug).first()
+            return {'id': post.pk, 'data': dict(self.get_serializer(post).data)} if post else None
+        
+        params = {
+            'slug': slug,
+            'content_format': self.content_format,
+            'fields': request.query_params.get('fields'),
+            'exclude': request.query_params.get('exclude'),
+        }
+        cached = get_or_compute('blog-post', params, (cache.BLOG,), compute)
+        if cached is None:
+            raise Http404('No blog post matches the given query.')
+        
+        pending = viewcounts.record_view(request, cached['id'])
+        data = cached['data']
+        if 'view_count' in data:
+            # The cached count is not refreshed by flushes, and the pending views are not in the database yet
+            data = {**data, 'view_count': viewcounts.view_count(cached['id'], data['view_count'], pending)}
+        return Response(data)
@@ -0,0 +1,29 @@
+"""
+Gunicorn configuration for serving the project over ASGI.
+
+The async genetics views (sample list, haplogroup count, heatmap) only
+free their worker while waiting on the database when run by an ASGI
+server. Start with:
+
+    gunicorn -c gunicorn_asgi.conf.py
+
+Every worker is a uvicorn event loop; GUNICORN_WORKERS and GUNICORN_BIND
+override the defaults below. For /metrics to aggregate all workers, export
+PROMETHEUS_MULTIPROC_DIR pointing at an empty directory (cleared on every
+deploy) before starting gunicorn.
+"""
+import multiprocessing
+import os
+
+wsgi_app = 'api.asgi:application'
+worker_class = 'uvicorn_worker.UvicornWorker'
+workers = int(os.environ.get('GUNICORN_WORKERS', multiprocessing.cpu_count() * 2 + 1))
+bind = os.environ.get('GUNICORN_BIND', '127.0.0.1:8000')
+keepalive = 5
+
+
+def child_exit(server, worker):
+    # Drop the live-gauge files of workers that exited (PROMETHEUS_MULTIPROC_DIR)
+    if 'PROMETHEUS_MULTIPROC_DIR' in os.environ:
+        from prometheus_client import multiprocess
+        multiprocess.mark_process_dead(worker.pid)
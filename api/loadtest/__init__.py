@@ -0,0 +1,13 @@
+"""
+Load-testing harness that replays the traffic of the web UI.
+
+Virtual users run scenarios modelled on the UI: typeahead dictionary
+search, live transliteration and filter changes on the map page. They
+send their requests to a running server over keep-alive connections,
+using only asyncio. Latency percentiles and throughput are reported per
+endpoint.
+
+    python -m loadtest --base-url http://127.0.0.1:8000 --users 50 --duration 60
+
+See `python -m loadtest --help` for the scenario mix and other options.
+"""
@@ -0,0 +1,94 @@
+import argparse
+import asyncio
+import json
+import random
+import sys
+import time
+
+from .scenarios import SCENARIOS, VirtualUser
+from .stats import Recorder, format_summary
+
+
+def parse_mix(value):
+    """Parse 'typeahead=5,transliterate=3,map=2' into {scenario: weight}"""
+    mix = {}
+    for part in value.split(','):
+        name, _, weight = part.partition('=')
+        name = name.strip()
+        if name not in SCENARIOS:
+            raise argparse.ArgumentTypeError(f'unknown scenario {name!r}; choose from {", ".join(SCENARIOS)}')
+        try:
+            mix[name] = float(weight) if weight else 1.0
+        except ValueError:
+            raise argparse.ArgumentTypeError(f'invalid weight for {name}: {weight!r}')
+    return mix
+
+
+async def run_user(scenario, user, start_delay):
+    await asyncio.sleep(start_delay)
+    try:
+        await scenario(user)
+    finally:
+        await user.close()
+
+
+async def run(options):
+    recorder = Recorder()
+    rng = random.Random(options.seed)
+    names = list(options.mix)
+    weights = [options.mix[name] for name in names]
+
+    started = time.monotonic()
+    deadline = started + options.ramp_up + options.duration
+    users = []
+    for number in range(options.users):
+        scenario = rng.choices(names, weights)[0]
+        user = VirtualUser(options.base_url, recorder, random.Random(rng.random()), deadline, options.timeout)
+        delay = options.ramp_up * number / options.users
+        users.append((scenario, run_user(SCENARIOS[scenario], user, delay)))
+
+    counts = {name: sum(1 for scenario, _ in users if scenario == name) for name in names}
+    print(f'{options.users} users ({", ".join(f"{n} {name}" for name, n in counts.items())}) '
+          f'for {options.ramp_up + options.duration:.0f}s against {options.base_url}', file=sys.stderr)
+
+    await asyncio.gather(*(coroutine for _, coroutine in users))
+    return recorder, time.monotonic() - started
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(prog='python -m loadtest', description='Replay UI traffic against a running server and report latency per endpoint.')
+    parser.add_argument('--base-url', default='http://127.0.0.1:8000', help='Server to test (default: %(default)s)')
+    parser.add_argument('--users', type=int, default=20, help='Concurrent virtual users (default: %(default)s)')
+    parser.add_argument('--duration', type=float, default=60, help='Seconds of full load after ramp-up (default: %(default)s)')
+    parser.add_argument('--ramp-up', type=float, default=10, help='Seconds over which users start (default: %(default)s)')
+    parser.add_argument(
+        '--mix',
+        type=parse_mix,
+        default=parse_mix('typeahead=5,transliterate=3,map=2'),
+        help='Scenario weights, e.g. typeahead=5,transliterate=3,map=2 (default)',
+    )
+    parser.add_argument('--timeout', type=float, default=30, help='Request timeout in seconds (default: %(default)s)')
+    parser.add_argument('--seed', type=int, default=0, help='Random seed (default: %(default)s)')
+    parser.add_argument('--output', help='Also write the statistics to this JSON file')
+    options = parser.parse_args(argv)
+
+    if options.users < 1:
+        parser.error('--users must be at least 1')
+
+    recorder, elapsed = asyncio.run(run(options))
+    rows = recorder.summary(elapsed)
+    print(format_summary(rows))
+
+    if options.output:
+        with open(options.output, 'w', encoding='utf-8') as f:
+            json.dump({
+                'base_url': options.base_url,
+                'users': options.users,
+                'duration_s': round(elapsed, 1),
+                'mix': options.mix,
+                'endpoints': rows,
+            }, f, indent=2)
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,121 @@
+"""
+Minimal asyncio HTTP/1.1 client: GET requests over one keep-alive
+connection per virtual user, like a browser tab.
+"""
+import asyncio
+import gzip
+import json
+import ssl
+import time
+from urllib.parse import urlencode, urlsplit
+
+
+class Response:
+    def __init__(self, status, headers, body, elapsed):
+        self.status = status
+        self.headers = headers
+        self.body = body
+        self.elapsed = elapsed
+
+    def json(self):
+        body = self.body
+        if self.headers.get('content-encoding') == 'gzip':
+            body = gzip.decompress(body)
+        return json.loads(body)
+
+
+class HTTPClient:
+    def __init__(self, base_url, timeout=30.0):
+        parts = urlsplit(base_url)
+        self.host = parts.hostname
+        self.secure = parts.scheme == 'https'
+        self.port = parts.port or (443 if self.secure else 80)
+        self.prefix = parts.path.rstrip('/')
+        self.timeout = timeout
+        self.reader = None
+        self.writer = None
+
+    async def connect(self):
+        self.reader, self.writer = await asyncio.open_connection(
+            self.host, self.port, ssl=ssl.create_default_context() if self.secure else None
+        )
+
+    async def close(self):
+        if self.writer is not None:
+            self.writer.close()
+            try:
+                await self.writer.wait_closed()
+            except (ConnectionError, ssl.SSLError):
+                pass
+        self.reader = self.writer = None
+
+    async def get(self, path, params=None):
+        """Send a GET request and return the Response once its body is read"""
+        target = self.prefix + path + (f'?{urlencode(params)}' if params else '')
+        request = (
+            f'GET {target} HTTP/1.1\r\n'
+            f'Host: {self.host}:{self.port}\r\n'
+            'Accept: application/json\r\n'
+            'Accept-Encoding: gzip\r\n'
+            'Connection: keep-alive\r\n'
+            '\r\n'
+        ).encode('ascii')
+
+        # A kept-alive connection may have been closed by the server: retry once on a new one
+        for attempt in range(2):
+            reused = self.writer is not None
+            if not reused:
+                await self.connect()
+            start = time.perf_counter()
+            try:
+                self.writer.write(request)
+                await self.writer.drain()
+                status, headers, body = await asyncio.wait_for(self.read_response(), self.timeout)
+                break
+            except (ConnectionError, asyncio.IncompleteReadError):
+                await self.close()
+                if not reused or attempt:
+                    raise
+            except BaseException:
+                await self.close()
+                raise
+        elapsed = time.perf_counter() - start
+
+        if headers.get('connection', '').lower() == 'close':
+            await self.close()
+        return Response(status, headers, body, elapsed)
+
+    async def read_response(self):
+        status_line = await self.reader.readuntil(b'\r\n')
+        status = int(status_line.split()[1])
+
+        headers = {}
+        while True:
+            line = await self.reader.readuntil(b'\r\n')
+            if line == b'\r\n':
+                break
+            name, _, value = line.decode('latin-1').partition(':')
+            headers[name.strip().lower()] = value.strip()
+
+        if headers.get('transfer-encoding', '').lower() == 'chunked':
+            chunks = []
+            while True:
+                size = int((await self.reader.readuntil(b'\r\n')).split(b';')[0], 16)
+                if size == 0:
+                    # Skip trailers up to the final empty line
+                    while await self.reader.readuntil(b'\r\n') != b'\r\n':
+                        pass
+                    break
+                chunks.append(await self.reader.readexactly(size))
+                await self.reader.readexactly(2)
+            body = b''.join(chunks)
+        elif 'content-length' in headers:
+            body = await self.reader.readexactly(int(headers['content-length']))
+        elif status in (204, 304):
+            body = b''
+        else:
+            # No length: the body runs until the server closes the connection
+            body = await self.reader.read()
+            headers['connection'] = 'close'
+
+        return status, headers, body
@@ -0,0 +1,175 @@
+"""
+User behaviour modelled on the UI.
+
+Both UI tabs send their request 300 ms after the last keystroke
+(DictionaryTab.tsx, TransliteratorTab.tsx). Requests therefore go out
+whenever the user pauses typing, without waiting for earlier responses.
+The map page loads its reference data once, then reloads the samples,
+facets and heatmap together whenever a filter changes.
+"""
+import asyncio
+import time
+
+from .client import HTTPClient
+
+
+# Delay between the last keystroke and the request in the UI
+DEBOUNCE = 0.3
+
+# Parallel connections a browser opens to one host
+MAX_CONNECTIONS = 6
+
+WORDS = (
+    'salam', 'kitab', 'dəniz', 'ürək', 'yol', 'göz', 'şəhər', 'ana', 'ata', 'qardaş',
+    'bacı', 'dost', 'ev', 'su', 'çörək', 'gün', 'gecə', 'ay', 'ulduz', 'torpaq',
+    'dağ', 'meşə', 'çay', 'külək', 'yağış', 'qar', 'insan', 'dil', 'söz', 'tarix',
+    'xalq', 'mahnı', 'həyat', 'sevgi', 'vətən', 'azadlıq', 'məktəb', 'müəllim', 'uşaq', 'bahar',
+)
+
+
+class VirtualUser:
+    """One browser tab: up to MAX_CONNECTIONS keep-alive connections and a clock"""
+
+    def __init__(self, base_url, recorder, rng, deadline, timeout=30.0):
+        self.base_url = base_url
+        self.recorder = recorder
+        self.rng = rng
+        self.deadline = deadline
+        self.timeout = timeout
+        self.idle = []
+        self.slots = asyncio.Semaphore(MAX_CONNECTIONS)
+        self.pending = set()
+
+    @property
+    def running(self):
+        return time.monotonic() < self.deadline
+
+    async def get(self, path, params=None):
+        """Send a request and record it under its path; returns None on failure"""
+        async with self.slots:
+            client = self.idle.pop() if self.idle else HTTPClient(self.base_url, self.timeout)
+            try:
+                response = await client.get(path, params)
+            except (OSError, ValueError, asyncio.TimeoutError, asyncio.IncompleteReadError):
+                self.recorder.record_error(path)
+                await client.close()
+                return None
+            self.idle.append(client)
+        self.recorder.record(path, response)
+        return response
+
+    def fire(self, path, params=None):
+        """Send a request in the background, like a fetch() the UI does not wait for"""
+        task = asyncio.create_task(self.get(path, params))
+        self.pending.add(task)
+        task.add_done_callback(self.pending.discard)
+        return task
+
+    async def settle(self):
+        """Wait for the background requests"""
+        if self.pending:
+            await asyncio.gather(*self.pending)
+
+    async def pause(self, seconds):
+        await asyncio.sleep(max(0.0, min(seconds, self.deadline - time.monotonic())))
+
+    async def think(self, low, high):
+        await self.pause(self.rng.uniform(low, high))
+
+    async def close(self):
+        await self.settle()
+        for client in self.idle:
+            await client.close()
+        self.idle.clear()
+
+    async def type_text(self, text, send):
+        """
+        Type text key by key. Whenever the user stops for longer than the
+        debounce delay, and after the last key, `send(typed_so_far)` fires.
+        """
+        for i in range(1, len(text) + 1):
+            if not self.running:
+                return
+            # Mostly steady typing, with occasional hesitations
+            if self.rng.random() < 0.15:
+                delay = self.rng.uniform(0.35, 1.2)
+            else:
+                delay = self.rng.uniform(0.06, 0.22)
+
+            if i == len(text) or delay > DEBOUNCE:
+                await self.pause(DEBOUNCE)
+                send(text[:i])
+                await self.pause(delay - DEBOUNCE)
+            else:
+                await self.pause(delay)
+
+
+async def typeahead_search(user):
+    """Look words up in the dictionary, one search per typing pause"""
+    while user.running:
+        word = user.rng.choice(WORDS)
+        await user.type_text(word, lambda typed: user.fire('/api/dict/search/', {'text': typed}))
+        await user.settle()
+        await user.think(1, 5)
+
+
+async def transliteration_bursts(user):
+    """Type sentences into the transliterator, or paste whole paragraphs at once"""
+    def convert(text):
+        user.fire('/api/convert/', {'text': text, 'source': 'latin', 'target': 'arabic'})
+
+    while user.running:
+        if user.rng.random() < 0.2:
+            paragraph = ' '.join(user.rng.choice(WORDS) for _ in range(user.rng.randint(50, 300)))
+            await user.pause(DEBOUNCE)
+            convert(paragraph)
+        else:
+            sentence = ' '.join(user.rng.choice(WORDS) for _ in range(user.rng.randint(3, 12)))
+            await user.type_text(sentence, convert)
+        await user.settle()
+        await user.think(2, 8)
+
+
+async def map_filters(user):
+    """Load the map page, then keep changing its filters"""
+    response = await user.get('/genetics/bootstrap/')
+    await asyncio.gather(
+        user.get('/genetics/samples/'),
+        user.get('/genetics/haplogroup/heatmap/'),
+    )
+    if response is None or response.status != 200:
+        return
+
+    data = response.json()
+    choices = {
+        'country': [item['name'] for item in data['countries']],
+        'province': [item['name'] for item in data['provinces']],
+        'ethnicity': [item['name'] for item in data['ethnicities']],
+        'tribe': [item['name'] for item in data['tribes']],
+        'haplogroup': [node['name'] for node in data['haplogroups']['y_dna']]
+        + [child['name'] for node in data['haplogroups']['y_dna'] for child in node['children']],
+    }
+    choices = {name: values for name, values in choices.items() if values}
+
+    filters = {}
+    while user.running and choices:
+        await user.think(2, 6)
+        name = user.rng.choice(list(choices))
+        if name in filters and user.rng.random() < 0.3:
+            del filters[name]
+        else:
+            filters[name] = user.rng.choice(choices[name])
+
+        heatmap_filters = {k: v for k, v in filters.items() if k in ('haplogroup', 'country', 'ethnicity')}
+        await asyncio.gather(
+            user.get('/genetics/samples/', filters),
+            user.get('/genetics/samples/facets/', filters),
+            user.get('/genetics/haplogroup/heatmap/', heatmap_filters),
+        )
+
+
+SCENARIOS = {
+    'typeahead': typeahead_search,
+    'transliterate': transliteration_bursts,
+    'map': map_filters,
+}
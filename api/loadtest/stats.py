@@ -0,0 +1,70 @@
+"""Latency and throughput statistics per endpoint"""
+import math
+from collections import defaultdict
+
+
+def percentile(sorted_values, p):
+    """Nearest-rank percentile of an already sorted list"""
+    if not sorted_values:
+        return None
+    rank = max(1, math.ceil(p / 100 * len(sorted_values)))
+    return sorted_values[rank - 1]
+
+
+class Recorder:
+    def __init__(self):
+        self.latencies = defaultdict(list)
+        self.errors = defaultdict(int)
+        self.bytes = defaultdict(int)
+
+    def record(self, endpoint, response):
+        self.latencies[endpoint].append(response.elapsed)
+        self.bytes[endpoint] += len(response.body)
+        if response.status >= 400:
+            self.errors[endpoint] += 1
+
+    def record_error(self, endpoint):
+        """A request that got no response (connection error or timeout)"""
+        self.errors[endpoint] += 1
+
+    def summary(self, duration):
+        """Statistics per endpoint plus an 'all' row; latencies in milliseconds"""
+        rows = {}
+        endpoints = sorted(set(self.latencies) | set(self.errors))
+        for endpoint in endpoints + ['all']:
+            if endpoint == 'all':
+                latencies = sorted(l for values in self.latencies.values() for l in values)
+                errors = sum(self.errors.values())
+                size = sum(self.bytes.values())
+            else:
+                latencies = sorted(self.latencies[endpoint])
+                errors = self.errors[endpoint]
+                size = self.bytes[endpoint]
+
+            def ms(value):
+                return round(value * 1000, 2) if value is not None else None
+
+            rows[endpoint] = {
+                'requests': len(latencies),
+                'errors': errors,
+                'throughput_rps': round(len(latencies) / duration, 2) if duration else None,
+                'p50_ms': ms(percentile(latencies, 50)),
+                'p95_ms': ms(percentile(latencies, 95)),
+                'p99_ms': ms(percentile(latencies, 99)),
+                'max_ms': ms(latencies[-1] if latencies else None),
+                'bytes': size,
+            }
+        return rows
+
+
+def format_summary(rows):
+    header = f'{"endpoint":<32} {"reqs":>7} {"errs":>5} {"rps":>8} {"p50 ms":>9} {"p95 ms":>9} {"p99 ms":>9} {"max ms":>9}'
+    lines = [header, '-' * len(header)]
+    for endpoint, row in rows.items():
+        def cell(value):
+            return f'{value:>9.1f}' if value is not None else f'{"-":>9}'
+        lines.append(
+            f'{endpoint:<32} {row["requests"]:>7} {row["errors"]:>5} {row["throughput_rps"] or 0:>8.1f} '
+            f'{cell(row["p50_ms"])} {cell(row["p95_ms"])} {cell(row["p99_ms"])} {cell(row["max_ms"])}'
+        )
+    return '\n'.join(lines)